@@ -0,0 +1,107 @@
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from .config import settings
+from .metrics import emit
+
+
+def cache_path() -> Path:
+    """The cache lives in data/index, next to the vector index."""
+    return Path(settings.STORAGE_DIR) / "index" / "summary_cache.sqlite"
+
+
+def make_key(*parts) -> str:
+    """Stable key from JSON-serialisable parts (content hash, query, model params...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk LRU cache of generated text in SQLite, shared by the API and the
+    Streamlit app. Reads refresh an entry's last-use time; writes evict the
+    least recently used entries beyond max_entries or max_bytes.
+    Keys must capture everything the value depends on (see make_key), so
+    stale entries are never read, only aged out.
+    """
+    def __init__(self, path: Path, max_entries: int = 5000, max_bytes: int = 64 << 20):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, kind TEXT, value TEXT,"
+                         " size INTEGER, created REAL, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache(last_used)")
+        self._db.commit()
+
+    def get(self, key: str, kind: str = "") -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._db.execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        emit("cache", kind=kind, hit=int(row is not None), miss=int(row is None))
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, kind: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, kind, value, len(value.encode("utf-8")), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        drop = []
+        for key, size in self._db.execute("SELECT key, size FROM cache ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            drop.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM cache WHERE key = ?", drop)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        lookups = self.hits + self.misses
+        return {"path": str(self.path), "entries": count, "bytes": total,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
+
+# ======= process-wide cache =======
+_CACHE: Optional[ResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache() -> Optional[ResultCache]:
+    """The shared cache, or None when SUMMARY_CACHE_ENABLED is off."""
+    global _CACHE
+    if not settings.SUMMARY_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResultCache(cache_path(), max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+                                 max_bytes=int(settings.SUMMARY_CACHE_MAX_MB * (1 << 20)))
+        return _CACHE
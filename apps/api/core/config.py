@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     # Models (CPU-friendly)
     HF_EMBED_MODEL: str = Field(default="sentence-transformers/all-MiniLM-L6-v2")
     HF_SUMMARIZER_MODEL: str = Field(default="t5-base")  # tighter than BART
+    EMBED_BACKEND: str = "torch"            # torch | int8 (dynamic int8 quantization) | onnx (ONNX Runtime)
+    SUMMARY_BACKEND: str = "torch"          # torch | int8 | onnx (exported once to data/models/)
+    MODEL_WARMUP: bool = True               # load both models at API startup and run a short input through each
 
     # Retrieval knobs
     BM25_WEIGHT: float = 0.5
@@ -19,6 +22,53 @@ class Settings(BaseSettings):
     MMR_LAMBDA: float = 0.6           # 0..1 (higher = more relevance, lower = more diversity)
     MAX_SENTENCES_FOR_ANSWER: int = 6
 
+    # Shared retrieval store
+    STORE_PRELOAD: bool = True              # build the store at API startup instead of first /ask
+    STORE_HOT_RELOAD: bool = True           # rebuild when data/parsed changes
+    STORE_RELOAD_CHECK_SECONDS: float = 2.0 # how often to re-scan data/parsed
+    STORE_SNAPSHOT: bool = True             # keep a memory-mapped snapshot in data/index/store for fast restarts
+    STORE_SNAPSHOT_DELAY_SECONDS: float = 30.0  # hot-reload patches within this window share one snapshot save
+    EMBED_INDEX_DTYPE: str = "float32"      # on-disk sentence vectors: float32 | float16 | int8
+    ANN_ENABLED: bool = False               # add IVF nearest-neighbour candidates to the BM25 shortlist
+    ANN_TOPN: int = 100                     # dense candidates per query
+    ANN_NLIST: int = 0                      # IVF lists (0 = ~sqrt(sentences))
+    ANN_NPROBE: int = 16                    # lists scanned per query (recall vs latency)
+    ANN_MIN_TRAIN: int = 1000               # below this many sentences the dense path is an exact scan
+    STORE_SHARDS: int = 1                   # >1 splits the store by paper into this many shards (data/index/shards)
+    STORE_SHARD_BY: str = "paper"           # paper (balanced placement, minimal moves) | hash (crc32 of paper_id)
+    SHARD_WORKERS: int = 0                  # processes searching shards (0 = one per CPU core, 1 = in-process)
+
+    # Summarization
+    SUMMARY_CHUNK_WORDS: int = 600          # words per summarizer input chunk
+    SUMMARY_BATCH_SIZE: int = 4             # chunks per pipeline call (1 = one at a time)
+    SUMMARY_TORCH_THREADS: int = 0          # torch intra-op threads (0 = torch default)
+    SUMMARY_MAP_REDUCE: bool = False        # re-summarize the joined chunk summaries of long texts
+    SUMMARY_REDUCE_MIN_CHUNKS: int = 4      # ...when they came from at least this many chunks
+    SUMMARY_CACHE_ENABLED: bool = True      # reuse summaries/answers from data/index/summary_cache.sqlite
+    SUMMARY_CACHE_MAX_ENTRIES: int = 5000   # least recently used entries are evicted beyond this...
+    SUMMARY_CACHE_MAX_MB: float = 64.0      # ...or beyond this much stored text
+
+    # Inference (API)
+    INFERENCE_WORKERS: int = 2              # model calls (embed + summarize) running at once
+    INFERENCE_QUEUE_SIZE: int = 8           # calls waiting for a worker before routes answer 503
+    EMBED_MICROBATCH: bool = True           # merge concurrent query encodes into one forward pass
+    EMBED_BATCH_MAX: int = 32               # texts per merged forward pass
+    EMBED_BATCH_WAIT_MS: float = 2.0        # how long a batch waits for more callers
+    ASK_BATCH_MAX_QUERIES: int = 64         # questions per POST /ask/batch (more is rejected with 422)
+
+    # Observability
+    SLOW_QUERY_SECONDS: float = 2.0         # /ask and /summarize calls slower than this are logged
+    SLOW_QUERY_LOG_SIZE: int = 20           # slowest calls kept for GET /metrics/slow
+
+    # Ingest
+    INGEST_WORKERS: int = 0                 # PDF parser processes (0 = one per CPU core, 1 = serial)
+    INGEST_MAX_TASKS_PER_CHILD: int = 25    # recycle parser processes to bound their memory (0 = never)
+    PARSE_LAYOUT_HEADINGS: bool = False     # headings from font size / bold too (slower "dict" text pass)
+    INGEST_QUEUE_SIZE: int = 8              # pending background ingest jobs before POST /ingest returns 503
+    INGEST_JOB_HISTORY: int = 100           # finished jobs kept for GET /ingest/{job_id}
+    UPLOAD_MAX_MB: float = 200.0            # larger uploads are rejected (413) while streaming (0 = no limit)
+    UPLOAD_CHUNK_KB: int = 1024             # uploads are written to disk in pieces of this size
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore", case_sensitive=False)
 
 settings = Settings()
\ No newline at end of file
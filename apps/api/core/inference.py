@@ -0,0 +1,218 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from .config import settings
+from .metrics import current_timings, emit, observe
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every inference worker is busy and the wait queue is full."""
+
+
+_DONE = object()
+
+
+def _percentiles(values) -> Dict:
+    if not values:
+        return {"avg_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    v = sorted(values)
+    at = lambda q: round(1000 * v[min(len(v) - 1, int(q * len(v)))], 1)
+    return {"avg_ms": round(1000 * sum(v) / len(v), 1), "p50_ms": at(0.5), "p95_ms": at(0.95), "max_ms": at(1.0)}
+
+
+class InferenceExecutor:
+    """
+    Bounded pool for model calls (embedding, summarization), awaitable from
+    async routes so the event loop stays free for /health and friends.
+
+    At most `workers` calls run at once (threads: torch releases the GIL and
+    the models are loaded once per process); up to `max_queue` more wait.
+    Beyond that, run() raises ExecutorSaturated at once instead of letting
+    requests pile up. Wait and service times cover the last `window` calls.
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 8, window: int = 512, name: str = "inference"):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait = deque(maxlen=window)
+        self._service = deque(maxlen=window)
+
+    # ---- admission ----
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self._running} running, {self._admitted - self._running} queued")
+            self._admitted += 1
+
+    def _release(self, _fut: Optional[Future] = None) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+    def _timed(self, name: str, submitted: float, fn: Callable, *args, **kwargs):
+        """Wraps fn on the worker thread: records wait (queued) and service (running) time."""
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait.append(started - submitted)
+        observe("inference_wait_seconds", started - submitted, task=name)
+        timings = current_timings()
+        if timings is not None:
+            timings["queue_wait"] = timings.get("queue_wait", 0.0) + started - submitted
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            service = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._service.append(service)
+                self.completed += ok
+                self.failed += not ok
+            observe("inference_service_seconds", service, task=name)
+            emit("inference", task=name, wait_seconds=started - submitted, service_seconds=service, ok=ok)
+
+    # ---- public ----
+    async def run(self, fn: Callable, *args, name: str = "", **kwargs):
+        """Runs fn(*args, **kwargs) on the pool, in a copy of the caller's context, and awaits its result."""
+        self._admit()
+        ctx = contextvars.copy_context()  # e.g. the request's metrics.collect_timings()
+        fut = self._pool.submit(ctx.run, self._timed, name or fn.__name__, time.perf_counter(), fn, *args, **kwargs)
+        fut.add_done_callback(self._release)  # also fires if a queued call is cancelled
+        return await asyncio.wrap_future(fut)
+
+    def stream(self, gen_fn: Callable[..., Iterator], *args, name: str = "", **kwargs) -> AsyncIterator:
+        """
+        Iterates gen_fn(*args, **kwargs) on one worker; returns an async
+        iterator over its items as they are produced. Admission happens
+        here, so callers can still answer 503, but the generator is only
+        handed to a worker on the first read: a response dropped before
+        its body starts (client gone) releases the slot without running
+        anything. Once started, the worker stays busy until the generator
+        ends or the reader stops.
+        """
+        self._admit()
+        return _Stream(self, name or gen_fn.__name__, gen_fn, args, kwargs)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            running = self._running
+            queued = self._admitted - running
+            wait, service = list(self._wait), list(self._service)
+            counts = {"completed": self.completed, "failed": self.failed, "rejected": self.rejected}
+        return {"workers": self.workers, "max_queue": self.max_queue, "running": running,
+                "queue_depth": queued, **counts,
+                "wait": _percentiles(wait), "service": _percentiles(service)}
+
+
+class _Stream:
+    """InferenceExecutor.stream()'s iterator: admitted when created, submitted on the first __anext__."""
+    def __init__(self, executor: InferenceExecutor, name: str, gen_fn: Callable[..., Iterator], args, kwargs):
+        self._executor, self._name = executor, name
+        self._gen = lambda: gen_fn(*args, **kwargs)
+        self._ctx = contextvars.copy_context()  # e.g. the request's metrics.collect_timings()
+        self._items: Optional[asyncio.Queue] = None
+        self._fut: Optional[Future] = None
+        self._stop = threading.Event()
+        self._closed = False
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        items = self._items = asyncio.Queue()
+        stop, gen = self._stop, self._gen
+
+        def drain():
+            try:
+                for item in gen():
+                    if stop.is_set():  # reader went away
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except BaseException as e:
+                loop.call_soon_threadsafe(items.put_nowait, e)
+                raise
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, _DONE)
+
+        ex = self._executor
+        self._fut = ex._pool.submit(self._ctx.run, ex._timed, self._name, time.perf_counter(), drain)
+        self._fut.add_done_callback(ex._release)
+
+    def __aiter__(self) -> "_Stream":
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if self._fut is None:
+            self._start()
+        try:
+            item = await self._items.get()
+        except BaseException:  # cancelled: the client went away
+            self.close()
+            raise
+        if item is _DONE or isinstance(item, BaseException):
+            self.close()
+            if item is _DONE:
+                raise StopAsyncIteration
+            raise item
+        return item
+
+    def close(self) -> None:
+        """Stops the worker at its next item, or gives the admission back if it never started."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._fut is None:
+            self._executor._release()
+        else:
+            self._stop.set()
+            self._fut.cancel()
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def __del__(self):  # dropped without being closed, e.g. a response whose body never started
+        self.close()
+
+
+# ======= process-wide executor =======
+_EXECUTOR: Optional[InferenceExecutor] = None
+_QUERY_EXECUTOR: Optional[InferenceExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def get_executor() -> InferenceExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = InferenceExecutor(settings.INFERENCE_WORKERS, settings.INFERENCE_QUEUE_SIZE)
+        return _EXECUTOR
+
+def get_query_executor() -> InferenceExecutor:
+    """
+    Admission for /ask query encodes. With EMBED_MICROBATCH its threads
+    only wait for the batcher's shared forward pass, so one batch worth
+    (EMBED_BATCH_MAX) runs at once and as many more may queue before /ask
+    answers 503; the merged batch is not capped at INFERENCE_WORKERS.
+    Without micro-batching every encode is a forward pass of its own and
+    takes a slot of get_executor().
+    """
+    global _QUERY_EXECUTOR
+    if not settings.EMBED_MICROBATCH:
+        return get_executor()
+    with _EXECUTOR_LOCK:
+        if _QUERY_EXECUTOR is None:
+            _QUERY_EXECUTOR = InferenceExecutor(settings.EMBED_BATCH_MAX, settings.EMBED_BATCH_MAX, name="query-embed")
+        return _QUERY_EXECUTOR
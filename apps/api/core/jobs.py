@@ -0,0 +1,116 @@
+import copy
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when the bounded queue has no room."""
+
+
+class JobManager:
+    """
+    In-process background jobs: a bounded FIFO drained by one worker thread.
+    Jobs run one at a time (ingest already fans out to its own process pool,
+    and two ingests over the same folder would race on its manifest).
+
+    A job is fn(update) -> result, where update(name, status, info) records
+    per-item progress. Submitting a key that is already queued returns the
+    queued job instead of adding a duplicate.
+    """
+    def __init__(self, maxsize: int = 8, history: int = 100):
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=maxsize)
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._fns: Dict[str, Callable] = {}
+        self._history = history
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- public ----
+    def submit(self, key: str, fn: Callable[[Callable], Dict], params: Optional[Dict] = None) -> Tuple[Dict, bool]:
+        """Queues fn; returns (job snapshot, created). created is False for a deduplicated submission."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["key"] == key and job["status"] == "queued":
+                    return copy.deepcopy(job), False
+            job_id = uuid.uuid4().hex[:12]
+            job = {"job_id": job_id, "key": key, "params": params or {}, "status": "queued",
+                   "submitted_at": time.time(), "started_at": None, "finished_at": None, "seconds": None,
+                   "progress": {"total": 0, "done": 0, "unchanged": 0}, "files": {}, "result": None, "error": None}
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                raise JobQueueFull(f"{self._queue.maxsize} jobs already queued") from None
+            self._jobs[job_id] = job
+            self._fns[job_id] = fn
+            self._trim()
+            self._ensure_worker()
+            return copy.deepcopy(job), True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def recent(self) -> list:
+        with self._lock:
+            return [{k: j[k] for k in ("job_id", "status", "submitted_at", "seconds", "progress")}
+                    for j in reversed(self._jobs.values())]
+
+    # ---- worker ----
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+            self._thread.start()
+
+    def _trim(self) -> None:
+        """Forgets the oldest finished jobs beyond the history limit."""
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for jid in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[jid]
+
+    def _update(self, job_id: str, name: str, status: str, info: Dict) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            if status == "unchanged":  # counted, not listed: a library can hold thousands
+                job["progress"]["unchanged"] += 1
+                return
+            prev = job["files"].get(name)
+            if prev is None:
+                job["progress"]["total"] += 1
+            if status != "queued" and (prev is None or prev["status"] == "queued"):
+                job["progress"]["done"] += 1
+            entry = {"status": status}
+            if "seconds" in info:
+                entry["seconds"] = round(info["seconds"], 3)
+            if "pages" in info:
+                entry["pages"] = info["pages"]
+            if info.get("error"):
+                entry["error"] = info["error"]
+            job["files"][name] = entry
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                fn = self._fns.pop(job_id)
+                job["status"] = "running"
+                job["started_at"] = time.time()
+            try:
+                result = fn(lambda name, status, info: self._update(job_id, name, status, info))
+                status, error = "done", None
+            except Exception as e:
+                traceback.print_exc()
+                result, status, error = None, "failed", f"{type(e).__name__}: {e}"
+            with self._lock:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finished_at"] = time.time()
+                job["seconds"] = round(job["finished_at"] - job["started_at"], 3)
+            self._queue.task_done()
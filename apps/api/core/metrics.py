@@ -0,0 +1,249 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import settings
+
+# A hook receives (event, fields), e.g. ("summarize", {"seconds": 1.2, ...}).
+Hook = Callable[[str, Dict], None]
+
+_HOOKS: List[Hook] = []
+_TOTALS: Dict[str, Dict[str, float]] = {}
+_LOCK = threading.Lock()
+
+
+def add_hook(fn: Hook) -> None:
+    """Registers fn to receive every emitted measurement."""
+    with _LOCK:
+        if fn not in _HOOKS:
+            _HOOKS.append(fn)
+
+
+def remove_hook(fn: Hook) -> None:
+    with _LOCK:
+        if fn in _HOOKS:
+            _HOOKS.remove(fn)
+
+
+def emit(event: str, **fields) -> None:
+    """
+    Records one measurement: numeric fields are added to the running totals
+    for `event` (see snapshot()) and every hook is called. A failing hook is
+    ignored so metrics never break the request that reports them.
+    """
+    with _LOCK:
+        totals = _TOTALS.setdefault(event, {"count": 0})
+        totals["count"] += 1
+        for k, v in fields.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                totals[k] = totals.get(k, 0) + v
+        hooks = list(_HOOKS)
+    for fn in hooks:
+        try:
+            fn(event, fields)
+        except Exception:
+            pass
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """Running totals per event: {"count": n, "<field>": sum, ...}."""
+    with _LOCK:
+        return {event: dict(totals) for event, totals in _TOTALS.items()}
+
+
+def reset() -> None:
+    with _LOCK:
+        _TOTALS.clear()
+        _HISTOGRAMS.clear()
+
+
+def print_hook(event: str, fields: Dict) -> None:
+    """Console hook for scripts: add_hook(print_hook)."""
+    shown = ", ".join(f"{k}={round(v, 3) if isinstance(v, float) else v}" for k, v in fields.items())
+    print(f"📈 {event}: {shown}")
+
+
+# ======= stage timers & histograms =======
+# Seconds; the usual Prometheus latency ladder stretched to model calls.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_HISTOGRAMS: Dict[str, Dict[Tuple, List[float]]] = {}   # name -> labels -> [bucket counts..., sum, count]
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Adds one observation to histogram `name` (one series per label set)."""
+    key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+    with _LOCK:
+        series = _HISTOGRAMS.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            h = series[key] = [0.0] * (len(BUCKETS) + 2)
+        i = bisect_left(BUCKETS, seconds)   # first bucket with le >= seconds
+        if i < len(BUCKETS):
+            h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times a block: observed in the stage_seconds histogram and, inside
+    collect_timings(), added to that request's breakdown (repeated stages sum).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        observe("stage_seconds", seconds, stage=name)
+        timings = _TIMINGS.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """
+    Collects stage() timings of this context (and of work it hands to the
+    inference executor, which copies the context) into the yielded dict.
+    """
+    timings: Dict[str, float] = {}
+    token = _TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _TIMINGS.reset(token)
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    """The dict being filled by the enclosing collect_timings(), if any."""
+    return _TIMINGS.get()
+
+
+def rounded(timings: Dict[str, float]) -> Dict[str, float]:
+    """Timings for a response body: milliseconds, 0.1 ms resolution."""
+    return {k: round(v * 1000, 1) for k, v in sorted(timings.items())}
+
+
+# ======= startup milestones =======
+_STARTED = time.perf_counter()   # about when the API began importing (this module loads early)
+_STARTUP: Dict[str, float] = {}
+
+
+def mark_startup(name: str) -> Optional[float]:
+    """
+    Records seconds from _STARTED to the first time `name` is reached
+    ("imported", "ready", "first_ask"). Later calls do nothing and return None.
+    """
+    with _LOCK:
+        if name in _STARTUP:
+            return None
+        seconds = _STARTUP[name] = time.perf_counter() - _STARTED
+    emit(f"startup_{name}", seconds=seconds)
+    return seconds
+
+
+def startup_times() -> Dict[str, float]:
+    with _LOCK:
+        return {k: round(v, 3) for k, v in _STARTUP.items()}
+
+
+# ======= Prometheus text export =======
+def _labels(pairs) -> str:
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def _metric_name(s: str) -> str:
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in s)
+
+
+def render_prometheus(prefix: str = "medsum", gauges: Optional[Dict[str, float]] = None) -> str:
+    """
+    Text exposition format: every histogram (as <prefix>_<name> with
+    _bucket / _sum / _count), emit() totals as counters
+    (<prefix>_events_total{event}, <prefix>_event_field_total{event,field})
+    and the given point-in-time gauges.
+    """
+    with _LOCK:
+        hists = {n: {k: list(v) for k, v in s.items()} for n, s in _HISTOGRAMS.items()}
+        totals = {e: dict(t) for e, t in _TOTALS.items()}
+    lines = []
+    for name, series in sorted(hists.items()):
+        m = f"{prefix}_{_metric_name(name)}"
+        lines.append(f"# TYPE {m} histogram")
+        for key, h in sorted(series.items()):
+            cum = 0.0
+            for le, n in zip(BUCKETS, h):
+                cum += n
+                lines.append(f"{m}_bucket{_labels(key + (('le', repr(le)),))} {cum:g}")
+            lines.append(f"{m}_bucket{_labels(key + (('le', '+Inf'),))} {h[-1]:g}")
+            lines.append(f"{m}_sum{_labels(key)} {h[-2]:.6f}")
+            lines.append(f"{m}_count{_labels(key)} {h[-1]:g}")
+    lines.append(f"# TYPE {prefix}_events_total counter")
+    for event, t in sorted(totals.items()):
+        lines.append(f"{prefix}_events_total{_labels((('event', event),))} {t['count']:g}")
+    lines.append(f"# TYPE {prefix}_event_field_total counter")
+    for event, t in sorted(totals.items()):
+        for field, v in sorted(t.items()):
+            if field != "count":
+                lines.append(f"{prefix}_event_field_total{_labels((('event', event), ('field', field)))} {v:g}")
+    for name, v in sorted((gauges or {}).items()):
+        if v is not None:
+            lines.append(f"# TYPE {prefix}_{_metric_name(name)} gauge")
+            lines.append(f"{prefix}_{_metric_name(name)} {v:g}")
+    return "\n".join(lines) + "\n"
+
+
+# ======= slow-query log =======
+class SlowLog:
+    """
+    Keeps the `size` slowest requests seen (with their stage breakdown);
+    each one over `threshold` seconds is also emitted as a "slow_query"
+    event and printed.
+    """
+    def __init__(self, threshold: float = 2.0, size: int = 20):
+        self.threshold = threshold
+        self.size = size
+        self._heap: List[Tuple[float, int, Dict]] = []   # min-heap on seconds
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float, detail: Dict, timings: Optional[Dict[str, float]] = None) -> None:
+        entry = {"kind": kind, "seconds": round(seconds, 4), **detail,
+                 "timings_ms": rounded(timings or {}), "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with self._lock:
+            self._seq += 1
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, (seconds, self._seq, entry))
+            elif seconds > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (seconds, self._seq, entry))
+        if seconds >= self.threshold:
+            emit("slow_query", kind=kind, seconds=seconds)
+            slowest = max(entry["timings_ms"].items(), key=lambda kv: kv[1], default=None)
+            print(f"🐢 slow {kind} ({seconds:.2f}s, slowest stage {slowest}): {detail}")
+
+    def top(self) -> List[Dict]:
+        with self._lock:
+            return [e for _, _, e in sorted(self._heap, key=lambda x: -x[0])]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+_SLOW_LOG: Optional[SlowLog] = None
+
+def get_slow_log() -> SlowLog:
+    """Process-wide slow-query log (SLOW_QUERY_SECONDS, SLOW_QUERY_LOG_SIZE)."""
+    global _SLOW_LOG
+    with _LOCK:
+        if _SLOW_LOG is None:
+            _SLOW_LOG = SlowLog(settings.SLOW_QUERY_SECONDS, settings.SLOW_QUERY_LOG_SIZE)
+        return _SLOW_LOG
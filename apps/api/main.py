@@ -1,10 +1,61 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from .core.config import settings
+from .core.inference import get_executor, get_query_executor
+from .core.metrics import get_slow_log, mark_startup, observe, render_prometheus, startup_times
 from .routes import upload, ingest, ask, summarize
-app = FastAPI(title="Medical Research Summarizer (HF)", version="1.0.0")
+from .rag.models import warm_up
+from .rag.retrieve import flush_snapshots, get_store, peek_store
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.MODEL_WARMUP:
+        warm_up()
+    if settings.STORE_PRELOAD:
+        get_store()
+    mark_startup("ready")
+    yield
+    flush_snapshots()  # hot-reload patches still waiting for their coalesced save
+app = FastAPI(title="Medical Research Summarizer (HF)", version="1.0.0", lifespan=lifespan)
+def _route_label(request: Request) -> str:
+    """The matched route as a template (/ingest/{job_id}), so ids do not explode label cardinality."""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # routers included lazily (newer FastAPI) leave route.path without the prefix; the effective route has it
+    effective = (request.scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(effective, "path", None) or route.path
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """http_request_seconds histogram per route (time to response headers for streams)."""
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    observe("http_request_seconds", time.perf_counter() - t0, method=request.method,
+            route=_route_label(request), status=response.status_code)
+    return response
 app.include_router(upload.router, prefix="/upload", tags=["upload"])
 app.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
 app.include_router(ask.router, prefix="/ask", tags=["ask"])
 app.include_router(summarize.router, prefix="/summarize", tags=["summarize"])
 @app.get("/health")
 def health():
-    return {"status":"ok"}
+    store = peek_store()
+    return {"status":"ok", "store": store.stats() if store else None, "inference": get_executor().stats(),
+            "query_embed": get_query_executor().stats(), "startup": startup_times()}
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: stage / request / inference histograms, event counters, store and pool gauges."""
+    store, pool = peek_store(), get_executor().stats()
+    gauges = {"inference_running": pool["running"], "inference_queue_depth": pool["queue_depth"],
+              "inference_rejected": pool["rejected"],
+              "store_papers": len(store.fingerprint) if store else None,
+              "store_sentences": len(store) if store else None}
+    gauges.update({f"startup_{k}_seconds": v for k, v in startup_times().items()})
+    return PlainTextResponse(render_prometheus(gauges=gauges), media_type="text/plain; version=0.0.4")
+@app.get("/metrics/slow")
+def slow_queries():
+    """The slowest /ask and /summarize calls so far, with their stage breakdown."""
+    log = get_slow_log()
+    return {"threshold_seconds": log.threshold, "slowest": log.top()}
+mark_startup("imported")
@@ -0,0 +1,168 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CORPUS_NAME = "corpus.sqlite"
+
+
+def corpus_path_for(parsed_dir: Path) -> Path:
+    """The corpus replaces the per-paper JSON files in data/parsed."""
+    return Path(parsed_dir) / CORPUS_NAME
+
+
+def _header(doc: Dict, body: bytes, source: str) -> Tuple:
+    sections = doc.get("sections", [])
+    return (str(doc.get("paper_id")), source, str(doc.get("title", doc.get("paper_id"))), len(sections),
+            int(doc.get("pages", 0) or 0), hashlib.sha256(body).hexdigest(), len(body), time.time())
+
+
+class Corpus:
+    """
+    All parsed papers in one SQLite file.
+
+    `papers` holds a small header per paper (title, section count, content
+    hash...) so listings and change detection never touch the text;
+    `bodies` holds each paper's JSON document as the exact bytes that used
+    to be written to data/parsed/<paper_id>.json, so content hashes (and
+    the vector / summary caches keyed by them) are unchanged by migration.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.created = not self.path.exists()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS papers (paper_id TEXT PRIMARY KEY, source TEXT, title TEXT,"
+                         " n_sections INTEGER, pages INTEGER, sha256 TEXT, size INTEGER, updated REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bodies (paper_id TEXT PRIMARY KEY, body BLOB)")
+        self._db.commit()
+
+    # ---- writing ----
+    def put_raw(self, body: bytes, source: Optional[str] = None) -> Tuple[str, str]:
+        """Stores one paper's JSON bytes as-is; returns (paper_id, sha256)."""
+        doc = json.loads(body.decode("utf-8"))
+        if "paper_id" not in doc:
+            raise ValueError("parsed document has no paper_id")
+        head = _header(doc, body, source or f"{doc['paper_id']}.json")
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", head)
+            self._db.execute("INSERT OR REPLACE INTO bodies VALUES (?, ?)", (head[0], body))
+        return head[0], head[5]
+
+    def put(self, doc: Dict, source: Optional[str] = None) -> Tuple[str, str]:
+        """Stores a parsed document (serialized like the former per-paper JSON)."""
+        return self.put_raw(json.dumps(doc, ensure_ascii=False).encode("utf-8"), source)
+
+    def put_many(self, docs: Iterable[Dict]) -> int:
+        """Stores many parsed documents in one transaction (bulk loads); returns how many."""
+        rows = []
+        for doc in docs:
+            body = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+            rows.append((_header(doc, body, f"{doc['paper_id']}.json"), body))
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [h for h, _ in rows])
+            self._db.executemany("INSERT OR REPLACE INTO bodies VALUES (?, ?)", [(h[0], b) for h, b in rows])
+        return len(rows)
+
+    def remove(self, paper_id: str) -> bool:
+        with self._lock, self._db:
+            cur = self._db.execute("DELETE FROM papers WHERE paper_id = ?", (paper_id,))
+            self._db.execute("DELETE FROM bodies WHERE paper_id = ?", (paper_id,))
+        return cur.rowcount > 0
+
+    # ---- reading ----
+    def has(self, paper_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM papers WHERE paper_id = ?", (paper_id,)).fetchone() is not None
+
+    def get_raw(self, paper_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT body FROM bodies WHERE paper_id = ?", (paper_id,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def get(self, paper_id: str) -> Optional[Dict]:
+        raw = self.get_raw(paper_id)
+        return json.loads(raw.decode("utf-8")) if raw is not None else None
+
+    def header(self, paper_id: str) -> Optional[Dict]:
+        rows = self._headers("WHERE paper_id = ?", (paper_id,))
+        return rows[0] if rows else None
+
+    def list(self) -> List[Dict]:
+        """Header of every paper (no text), ordered by paper_id."""
+        return self._headers("ORDER BY paper_id", ())
+
+    def fingerprint(self) -> Dict[str, str]:
+        """paper_id -> content hash; what the retrieval store diffs against."""
+        with self._lock:
+            return dict(self._db.execute("SELECT paper_id, sha256 FROM papers ORDER BY paper_id"))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def _headers(self, where: str, args: Tuple) -> List[Dict]:
+        cols = ("paper_id", "source", "title", "n_sections", "pages", "sha256", "size", "updated")
+        with self._lock:
+            rows = self._db.execute(f"SELECT {', '.join(cols)} FROM papers {where}", args).fetchall()
+        return [dict(zip(cols, r)) for r in rows]
+
+    # ---- migration / export ----
+    def import_json_dir(self, parsed_dir: Path, replace: bool = False) -> Dict:
+        """Imports data/parsed/*.json (the previous format); existing papers are kept unless replace."""
+        imported, skipped, failed = [], [], {}
+        for jf in sorted(Path(parsed_dir).glob("*.json")):
+            try:
+                body = jf.read_bytes()
+                pid = json.loads(body.decode("utf-8")).get("paper_id")
+                if pid is None:
+                    raise ValueError("no paper_id")
+                if not replace and self.has(pid):
+                    skipped.append(jf.name)
+                    continue
+                self.put_raw(body, source=jf.name)
+                imported.append(jf.name)
+            except (OSError, ValueError) as e:
+                failed[jf.name] = f"{type(e).__name__}: {e}"
+        return {"imported": len(imported), "skipped": len(skipped), "failed": failed}
+
+    def export_json(self, out_dir: Path, paper_ids: Optional[Iterable[str]] = None) -> int:
+        """Writes papers back out as <paper_id>.json files (byte-identical to what was stored)."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        n = 0
+        for pid in (list(paper_ids) if paper_ids is not None else [h["paper_id"] for h in self.list()]):
+            raw = self.get_raw(pid)
+            if raw is None:
+                continue
+            tmp = out_dir / f"{pid}.json.tmp"
+            tmp.write_bytes(raw)
+            os.replace(tmp, out_dir / f"{pid}.json")
+            n += 1
+        return n
+
+
+# ======= process-wide corpora =======
+_CORPORA: Dict[Path, Corpus] = {}
+_CORPORA_LOCK = threading.Lock()
+
+def get_corpus(parsed_dir: Path) -> Corpus:
+    """
+    The shared Corpus for a parsed dir. On first creation, JSON files
+    already in that dir are imported (one-time migration).
+    """
+    path = corpus_path_for(parsed_dir).resolve()
+    with _CORPORA_LOCK:
+        corpus = _CORPORA.get(path)
+        if corpus is None:
+            corpus = _CORPORA[path] = Corpus(path)
+            if corpus.created and any(Path(parsed_dir).glob("*.json")):
+                rep = corpus.import_json_dir(parsed_dir)
+                print(f"🔹 Migrated parsed JSON into {path.name}: {rep}")
+        return corpus
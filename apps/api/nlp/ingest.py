@@ -0,0 +1,233 @@
+from pathlib import Path
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import observe, stage
+from ..rag.vectors import remove_paper_vectors, vectors_dir_for
+from .corpus import Corpus, get_corpus
+
+MANIFEST_NAME = "ingest_manifest.json"
+
+# ======= manifest =======
+def manifest_path_for(out_dir: Path) -> Path:
+    """The manifest lives in data/index, next to the vector index."""
+    return Path(out_dir).parent / "index" / MANIFEST_NAME
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(path: Path) -> Dict[str, Dict]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path: Path, files: Dict[str, Dict]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": 1, "files": files}, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _same_stat(entry: Optional[Dict], st: os.stat_result) -> bool:
+    return bool(entry) and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+def _remove_outputs(entry: Dict, corpus: Corpus, out_dir: Path) -> None:
+    corpus.remove(entry["paper_id"])
+    remove_paper_vectors(vectors_dir_for(out_dir), entry["paper_id"])
+
+# ======= parsing (runs in worker processes) =======
+def _parse_one(pdf_path: str) -> Dict:
+    """
+    Parses one PDF. The document goes back to the parent already
+    serialized, which is the only process writing to the corpus.
+    """
+    from .parse_pdf import parse_pdf_to_sections  # PyMuPDF loads in the parser processes, not with the API
+    t0 = time.perf_counter()
+    try:
+        doc = parse_pdf_to_sections(Path(pdf_path))
+        body = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    except Exception as e:  # isolate per-file failures
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - t0}
+    return {"ok": True, "paper_id": doc["paper_id"], "pages": doc.get("pages", 0), "body": body,
+            "seconds": time.perf_counter() - t0}
+
+def _resolve_workers(workers: Optional[int]) -> int:
+    n = settings.INGEST_WORKERS if workers is None else workers
+    return max(1, n if n > 0 else (os.cpu_count() or 1))
+
+def _parse_many(jobs: List[Path], workers: int):
+    """
+    Yields (pdf, result) as files finish; at most 2*workers files in flight.
+    If a worker dies (e.g. MuPDF crashing on a malformed file) the pool is
+    replaced and the files that were in flight are retried one at a time,
+    so only the file that actually crashes is reported as failed.
+    """
+    if workers == 1 or len(jobs) <= 1:
+        for pdf in jobs:
+            yield pdf, _parse_one(str(pdf))
+        return
+    # spawn: never fork a parent that may hold torch threads
+    ctx = multiprocessing.get_context("spawn")
+    todo, suspects = deque(jobs), deque()
+    while todo or suspects:
+        isolate = not todo
+        queue_ = todo or suspects
+        with ProcessPoolExecutor(max_workers=1 if isolate else min(workers, len(todo)), mp_context=ctx,
+                                 max_tasks_per_child=settings.INGEST_MAX_TASKS_PER_CHILD or None) as pool:
+            pending = {}
+            broken = False
+            while (queue_ or pending) and not broken:
+                while queue_ and len(pending) < (1 if isolate else 2 * workers):
+                    pdf = queue_.popleft()
+                    try:
+                        pending[pool.submit(_parse_one, str(pdf))] = pdf
+                    except BrokenProcessPool:
+                        queue_.appendleft(pdf)
+                        broken = True
+                        break
+                if broken:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        res = fut.result()
+                    except BrokenProcessPool:
+                        broken = True  # fut stays in pending, handled below
+                        continue
+                    except Exception as e:
+                        res = {"ok": False, "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+                    pdf = pending.pop(fut)
+                    yield pdf, res
+            for pdf in pending.values():
+                if isolate:
+                    yield pdf, {"ok": False, "error": "parser process crashed", "seconds": 0.0}
+                else:
+                    suspects.append(pdf)
+
+# ======= ingest =======
+def ingest_pdfs(pdf_dir: Path, out_dir: Path, force: bool = False, workers: Optional[int] = None,
+                progress: Optional[Callable[[str, str, Dict], None]] = None) -> Dict:
+    """
+    Parses new or modified PDFs from pdf_dir into the corpus in out_dir
+    (data/parsed/corpus.sqlite), embeds them into the vector index and
+    removes the papers of deleted PDFs.
+    Unchanged PDFs (same content hash) are skipped unless force=True, and
+    a PDF with the same content as another one is recorded as its
+    duplicate instead of becoming a second paper.
+    Parsing runs in a pool of `workers` processes (INGEST_WORKERS; 0 = all
+    cores). A failing PDF is reported under "failed" and retried next run;
+    a modified one keeps its previous paper (and manifest entry) until then.
+    progress(name, status, info) is called as each file is resolved.
+    """
+    from ..rag.retrieve import index_paper
+
+    t0 = time.perf_counter()
+    pdf_dir, out_dir = Path(pdf_dir), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mpath = manifest_path_for(out_dir)
+    old = load_manifest(mpath)
+    corpus = get_corpus(out_dir)
+    vec_dir = vectors_dir_for(out_dir)
+    workers = _resolve_workers(workers)
+    report = progress or (lambda name, status, info: None)
+    files: Dict[str, Dict] = {}
+    parsed, unchanged, removed, duplicates = [], [], [], []
+    failed: Dict[str, str] = {}
+    todo: List[Path] = []
+    hashes: Dict[str, Tuple[str, os.stat_result]] = {}
+
+    scanned = []
+    with stage("ingest.scan"):
+        for pdf in sorted(pdf_dir.glob("*.pdf")):
+            entry = old.get(pdf.name)
+            st = pdf.stat()
+            current = not force and bool(entry) and bool(entry.get("paper_id")) and corpus.has(entry["paper_id"])
+            # size+mtime match skips hashing; otherwise the content hash decides
+            sha = entry["sha256"] if entry and _same_stat(entry, st) else file_sha256(pdf)
+            scanned.append((pdf, st, entry, sha, current and sha == entry["sha256"]))
+
+    # one paper per content hash: an already indexed file keeps it, otherwise the first name
+    primary: Dict[str, str] = {}
+    for pdf, _, _, sha, current in sorted(scanned, key=lambda s: not s[4]):
+        primary.setdefault(sha, pdf.name)
+
+    for pdf, st, entry, sha, current in scanned:
+        if primary[sha] != pdf.name:
+            files[pdf.name] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                               "duplicate_of": primary[sha]}
+            if entry and entry.get("paper_id"):
+                _remove_outputs(entry, corpus, out_dir)  # was a paper of its own before
+            duplicates.append(pdf.name)
+            report(pdf.name, "duplicate", {"duplicate_of": primary[sha]})
+            continue
+        if current:
+            files[pdf.name] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            unchanged.append(pdf.name)
+            report(pdf.name, "unchanged", {})
+            continue
+        hashes[pdf.name] = (sha, st)
+        todo.append(pdf)
+        report(pdf.name, "queued", {})
+
+    pages = 0
+    t_parse = time.perf_counter()
+    for pdf, res in _parse_many(todo, workers):
+        observe("stage_seconds", res["seconds"], stage="ingest.parse")  # in the worker, per file
+        if res["ok"]:
+            try:
+                with stage("ingest.index"):
+                    corpus.put_raw(res.pop("body"), source=f"{pdf.stem}.json")
+                    # embedding stays in this process, where the model is loaded once
+                    index_paper(corpus, res["paper_id"], vec_dir)
+            except Exception as e:
+                res = dict(res, ok=False, error=f"indexing failed: {type(e).__name__}: {e}")
+        if not res["ok"]:
+            failed[pdf.name] = res["error"]
+            if pdf.name in old:
+                # keep the previous entry (and paper) so a later deletion still removes it; its old hash
+                # no longer matches the file, so it is retried next run
+                files[pdf.name] = old[pdf.name]
+            elif res.get("paper_id") and corpus.has(res["paper_id"]):
+                _remove_outputs(res, corpus, out_dir)  # stored, then indexing failed: nothing tracks it
+            report(pdf.name, "failed", res)
+            continue
+        sha, st = hashes[pdf.name]
+        files[pdf.name] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                           "paper_id": res["paper_id"]}
+        parsed.append(pdf.name)
+        pages += res["pages"]
+        report(pdf.name, "parsed", res)
+    parse_s = time.perf_counter() - t_parse
+
+    for name, entry in old.items():
+        if name not in files:
+            if entry.get("paper_id"):
+                _remove_outputs(entry, corpus, out_dir)
+            removed.append(name)
+            report(name, "removed", {})
+
+    save_manifest(mpath, files)
+    fps = len(parsed) / parse_s if parse_s > 0 else 0.0
+    pps = pages / parse_s if parse_s > 0 else 0.0
+    if todo:
+        print(f"📄 Ingested {len(parsed)} file(s) / {pages} page(s) in {parse_s:.2f}s "
+              f"({fps:.2f} files/s, {pps:.1f} pages/s, {min(workers, len(todo))} worker(s), {len(failed)} failed)")
+    return {"ok": not failed, "parsed": len(parsed), "unchanged": len(unchanged), "removed": len(removed),
+            "duplicates": len(duplicates), "failed": failed,
+            "files": {"parsed": parsed, "removed": removed, "duplicates": duplicates},
+            "pages": pages, "workers": min(workers, max(1, len(todo))),
+            "files_per_second": round(fps, 3), "pages_per_second": round(pps, 2),
+            "seconds": round(time.perf_counter() - t0, 3)}
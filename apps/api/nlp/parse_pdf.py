@@ -1,7 +1,11 @@
 from pathlib import Path
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
 import re
 import fitz  # PyMuPDF
 
+from ..core.config import settings
+
 # ---- Config ----
 SECTION_HINTS = [
     "abstract", "introduction", "background", "methods", "materials",
@@ -20,69 +24,141 @@ BOILERPLATE_PATTERNS = [
     r"\bconflicts? of interest\b",
     r"\bfunding\b",
 ]
+
+HEADING_SIZE_RATIO = 1.15   # font this much larger than body text → heading
+HEADING_MAX_CHARS = 120     # longer lines are never headings
+HINT_MAX_CHARS = 40         # plain-font lines starting with a section hint must be this short
+CAPS_MAX_CHARS = 60         # plain-font ALL-CAPS lines up to this long are headings ("PATIENTS AND METHODS")
+BOLD_MAX_WORDS = 8          # body-size bold lines longer than this are emphasis, not headings
+
+# Compiled once; used for every line of every page.
 _BOILER_RE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+_HINT_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+)?(?:%s)" % "|".join(SECTION_HINTS), re.IGNORECASE)
+_SECTION_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+)?(?:%s)s?:?$" % "|".join(SECTION_HINTS), re.IGNORECASE)
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_NUMBERING_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s+)")
 
-# ---- Helpers ----
-def _looks_like_heading(line: str) -> bool:
-    s = line.strip()
-    if not s:
-        return False
-    low = s.lower()
-    if low in SECTION_HINTS:
-        return True
-    if any(low.startswith(h) for h in SECTION_HINTS):
-        return True
-    # ALL CAPS short line → likely a heading
-    if len(s) <= 60 and s.isupper():
-        return True
-    return False
+# plain-text extraction (no images: "dict" would otherwise carry their bytes)
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT
+_BOLD = fitz.TEXT_FONT_BOLD
+
+Line = Tuple[str, float, bool]  # (cleaned text, font size, bold)
 
+# ---- Helpers ----
 def _clean_line(line: str) -> str:
-    line = line.strip()
-    if not line:
-        return ""
     if _BOILER_RE.search(line):
         return ""
-    # collapse whitespace
-    line = re.sub(r"\s+", " ", line)
-    return line
+    return " ".join(line.split())  # strip + collapse whitespace
+
+def _page_text_lines(page) -> Iterator[Line]:
+    """Cleaned text lines of one page, without font information (plain get_text(), the fast path)."""
+    for raw in page.get_text(flags=_TEXT_FLAGS).splitlines():
+        text = _clean_line(raw)
+        if text:
+            yield text, 0.0, False
+
+def _page_lines(page) -> Iterator[Line]:
+    """Cleaned text lines of one page with their largest font size and whether they are all bold."""
+    for block in page.get_text("dict", flags=_TEXT_FLAGS)["blocks"]:
+        for ln in block.get("lines", ()):  # image blocks have none
+            spans = ln["spans"]
+            text = _clean_line(spans[0]["text"] if len(spans) == 1 else "".join(s["text"] for s in spans))
+            if not text:
+                continue
+            size, bold = 0.0, True
+            for s in spans:
+                if s["text"].strip():
+                    size = max(size, s["size"])
+                    bold = bold and bool(s["flags"] & _BOLD or "bold" in s["font"].lower())
+            yield text, size, bold
+
+class _BodySize:
+    """Running estimate of the body font size: the most common size, weighted by characters."""
+    def __init__(self):
+        self.chars = Counter()
+
+    def update(self, lines: List[Line]) -> None:
+        for text, size, _ in lines:
+            self.chars[round(size * 2) / 2] += len(text)
+
+    @property
+    def size(self) -> float:
+        return self.chars.most_common(1)[0][0] if self.chars else 0.0
+
+def _bold_heading(text: str) -> bool:
+    """A bold line at body size: only short, capitalized and not ending like a sentence or a list item."""
+    first = _NUMBERING_RE.sub("", text)[:1]
+    return (len(text.split()) <= BOLD_MAX_WORDS and first.isupper()
+            and not text.endswith((".", ",", ";")))
+
+def _is_heading(line: Line, body_size: float) -> bool:
+    text, size, bold = line
+    if len(text) > HEADING_MAX_CHARS:
+        return False
+    if body_size and size >= body_size * HEADING_SIZE_RATIO or bold and _bold_heading(text):
+        return _LETTER_RE.search(text) is not None  # not a page number or a figure label like "(2)"
+    # same font as the body: a short ALL-CAPS line (isupper() needs a letter), or one naming a usual section
+    if len(text) <= CAPS_MAX_CHARS and text.isupper():
+        return True
+    return len(text) <= HINT_MAX_CHARS and not text.endswith(".") and _HINT_RE.match(text) is not None
 
 # ---- Main ----
-def parse_pdf_to_sections(pdf_path: Path) -> dict:
-    doc = fitz.open(pdf_path)
-    lines = []
+def iter_sections(doc: fitz.Document, layout: bool = False) -> Iterator[Dict]:
+    """
+    Streams {"name", "text"} sections page by page: only the current page's
+    text and the section being filled are held in memory.
+    Without layout, headings are short ALL-CAPS lines and short lines
+    naming a usual section (SECTION_HINTS). With layout, PyMuPDF's "dict" pass also makes lines in
+    a larger or bold font than the running body size headings, and
+    consecutive heading lines of the same size (a wrapped heading) are
+    joined, unless the first one already names a usual section: then the
+    next line is a subheading, kept as text of that section.
+    """
+    body = _BodySize()
+    name, buf = "unknown", []
+    last_heading = None   # font size of the previous line if it was a heading (layout only)
+    orphans = []          # heading text kept only until the first section, for the fallback
+
     for page in doc:
-        # get_text() returns a string with newlines; split into lines
-        lines.extend(page.get_text().splitlines())
-
-    sections = []
-    current_name = "unknown"
-    current_buf = []
-
-    for raw in lines:
-        line = _clean_line(raw)
-        if not line:
-            continue
-
-        if _looks_like_heading(line):
-            # flush previous
-            if current_buf:
-                sections.append({"name": current_name, "text": " ".join(current_buf).strip()})
-                current_buf = []
-            current_name = line.strip().lower()
+        if layout:
+            lines = list(_page_lines(page))
+            body.update(lines)  # classify this page with its own sizes already counted
         else:
-            current_buf.append(line)
-
-    if current_buf:
-        sections.append({"name": current_name, "text": " ".join(current_buf).strip()})
+            lines = _page_text_lines(page)
+        body_size = body.size
+        for line in lines:
+            if _is_heading(line, body_size):
+                if buf:
+                    yield {"name": name, "text": " ".join(buf)}
+                    buf, orphans = [], None
+                if last_heading == line[1] and _SECTION_RE.match(name):
+                    buf.append(line[0])   # subheading right under a usual section: keep that name
+                    last_heading = None
+                    continue
+                heading = line[0].lower()
+                name = f"{name} {heading}" if last_heading == line[1] else heading
+                last_heading = line[1] if layout else None
+                if orphans is not None:
+                    orphans.append(line[0])
+            else:
+                buf.append(line[0])
+                last_heading = None
 
-    # Fallback to a single section if nothing segmented
-    if not sections:
-        cleaned = " ".join(_clean_line(l) for l in lines if _clean_line(l))
-        sections = [{"name": "full_text", "text": cleaned}]
+    if buf:
+        yield {"name": name, "text": " ".join(buf)}
+    elif orphans is not None:
+        # Fallback to a single section if nothing segmented
+        yield {"name": "full_text", "text": " ".join(orphans)}
 
+def parse_pdf_to_sections(pdf_path: Path, layout: Optional[bool] = None) -> dict:
+    """layout: font-based headings (PARSE_LAYOUT_HEADINGS when None); about 0.8x the pages per second."""
+    layout = settings.PARSE_LAYOUT_HEADINGS if layout is None else layout
+    with fitz.open(pdf_path) as doc:
+        sections = list(iter_sections(doc, layout))
+        pages = doc.page_count
     return {
         "paper_id": pdf_path.stem,
         "title": pdf_path.stem,
+        "pages": pages,
         "sections": sections
-    }
\ No newline at end of file
+    }
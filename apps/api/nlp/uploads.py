@@ -0,0 +1,107 @@
+from pathlib import Path
+import hashlib
+import os
+import threading
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from .ingest import _same_stat, file_sha256, load_manifest, manifest_path_for
+
+PART_SUFFIX = ".part"  # in-progress uploads; ingest only globs *.pdf
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+class InvalidUploadName(ValueError):
+    """Raised when an upload's file name is empty, only dots, or not a .pdf."""
+
+
+# (name, size, mtime_ns) -> sha256 of PDFs hashed here, so a batch does not re-hash the folder per file
+_HASHES: Dict[Tuple[str, int, int], str] = {}
+_COMMIT_LOCK = threading.Lock()
+
+def known_hashes(pdf_dir: Path, parsed_dir: Path) -> Dict[str, str]:
+    """
+    sha256 -> file name for every PDF in pdf_dir. Hashes come from the
+    ingest manifest when size and mtime still match; files not ingested yet
+    are hashed once per process.
+    """
+    manifest = load_manifest(manifest_path_for(parsed_dir))
+    out: Dict[str, str] = {}
+    for pdf in sorted(Path(pdf_dir).glob("*.pdf")):
+        st = pdf.stat()
+        entry = manifest.get(pdf.name)
+        if _same_stat(entry, st):
+            sha = entry["sha256"]
+        else:
+            key = (pdf.name, st.st_size, st.st_mtime_ns)
+            sha = _HASHES.get(key) or _HASHES.setdefault(key, file_sha256(pdf))
+        out.setdefault(sha, pdf.name)
+    return out
+
+
+class PdfUpload:
+    """
+    One upload written to disk chunk by chunk: the SHA-256 and size are
+    computed as bytes arrive and the upload is aborted as soon as it passes
+    max_bytes. commit() either moves it into pdf_dir or, when a PDF with the
+    same content is already there (under any name), drops it and points at
+    that file, so a paper is stored and indexed once.
+    """
+    def __init__(self, pdf_dir: Path, parsed_dir: Path, filename: str, max_bytes: int):
+        self.pdf_dir, self.parsed_dir = Path(pdf_dir), Path(parsed_dir)
+        self.name = Path(filename or "").name  # never a path outside pdf_dir
+        if not self.name.lower().endswith(".pdf") or not self.name[:-4].strip("."):
+            raise InvalidUploadName(f"not a PDF file name: {filename!r}")  # before anything is written
+        self.name = self.name[:-4] + ".pdf"  # ingest globs *.pdf
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha = hashlib.sha256()
+        self.pdf_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp: Optional[Path] = self.pdf_dir / f".{uuid.uuid4().hex}{PART_SUFFIX}"
+        self._f = self._tmp.open("wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.abort()
+            raise UploadTooLarge(f"{self.name} is larger than {self.max_bytes} bytes")
+        self._sha.update(chunk)
+        self._f.write(chunk)
+
+    def commit(self) -> Dict:
+        self._f.close()
+        sha = self._sha.hexdigest()
+        with _COMMIT_LOCK:
+            existing = known_hashes(self.pdf_dir, self.parsed_dir).get(sha)
+            if existing is not None:
+                self.abort()
+                return {"ok": True, "filename": self.name, "stored_as": str(self.pdf_dir / existing),
+                        "sha256": sha, "size": self.size, "duplicate_of": existing}
+            dest = self.pdf_dir / self.name
+            os.replace(self._tmp, dest)
+            self._tmp = None
+            st = dest.stat()
+            _HASHES[(dest.name, st.st_size, st.st_mtime_ns)] = sha
+        return {"ok": True, "filename": self.name, "stored_as": str(dest), "sha256": sha, "size": self.size,
+                "duplicate_of": None}
+
+    def abort(self) -> None:
+        """Removes the partial file; a no-op after commit()."""
+        self._f.close()
+        if self._tmp is not None:
+            self._tmp.unlink(missing_ok=True)
+            self._tmp = None
+
+
+def store_pdf(chunks: Iterable[bytes], filename: str, pdf_dir: Path, parsed_dir: Path, max_bytes: int) -> Dict:
+    """Writes an iterable of byte chunks as one upload (see PdfUpload)."""
+    up = PdfUpload(pdf_dir, parsed_dir, filename, max_bytes)
+    try:
+        for chunk in chunks:
+            up.write(chunk)
+        return up.commit()
+    finally:
+        up.abort()
@@ -0,0 +1,134 @@
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+def _normalize_rows(v: np.ndarray) -> np.ndarray:
+    return v / (np.linalg.norm(v, axis=1, keepdims=True) + 1e-12)
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, batch: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid for each row (batched to bound memory)."""
+    out = np.empty(len(x), dtype=np.int32)
+    for s in range(0, len(x), batch):
+        out[s:s + batch] = np.argmax(np.asarray(x[s:s + batch], dtype=np.float32) @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """k unit-norm centroids for unit-norm rows of x (cosine k-means)."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=k) == 0
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]  # re-seed empty clusters
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over the store's sentence vectors.
+
+    Rows are kept aligned with SimpleStore rows (append / slice out, like
+    BM25Index), each with its nearest k-means centroid; the per-centroid
+    lists are rebuilt lazily before a search. A query scans only the
+    nprobe lists whose centroids are closest to it.
+
+    Vectors may be held as float16 to halve memory: ANN results are only
+    candidates, their final cosine score comes from the embedding index.
+    """
+    def __init__(self, nlist: int = 0, nprobe: int = 16, min_train: int = 1000,
+                 retrain_growth: float = 4.0, seed: int = 0, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.nlist_setting = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_on = 0
+        self.vecs = np.zeros((0, 0), dtype=self.dtype)
+        self.assign = np.zeros(0, dtype=np.int32)
+        self._pending: List[np.ndarray] = []
+        self._lists = None
+
+    def __len__(self) -> int:
+        return len(self.assign) + sum(len(p) for p in self._pending)
+
+    @property
+    def nbytes(self) -> int:
+        c = self.centroids.nbytes if self.centroids is not None else 0
+        return int(self.vecs.nbytes + self.assign.nbytes + c)
+
+    # ---- building ----
+    def add(self, vecs: np.ndarray) -> None:
+        """Appends unit-norm rows; call commit() before searching."""
+        if len(vecs):
+            self._pending.append(np.asarray(vecs, dtype=self.dtype))
+
+    def remove(self, start: int, end: int) -> None:
+        """Drops rows [start, end); later rows shift down."""
+        self._flush()
+        self.vecs = np.concatenate([self.vecs[:start], self.vecs[end:]])
+        self.assign = np.concatenate([self.assign[:start], self.assign[end:]])
+        self._lists = None
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        new = np.concatenate(self._pending)
+        self._pending = []
+        self.vecs = new if not len(self.vecs) else np.concatenate([self.vecs, new])
+        fill = _nearest(new, self.centroids) if self.centroids is not None else np.full(len(new), -1, np.int32)
+        self.assign = np.concatenate([self.assign, fill])
+        self._lists = None
+
+    def commit(self) -> None:
+        """Assigns new rows; (re)trains centroids on first use or after large growth."""
+        self._flush()
+        n = len(self.assign)
+        if n < self.min_train:
+            self.centroids, self.trained_on = None, 0   # exact scan is cheaper than a tiny IVF
+            return
+        if self.centroids is None or n > self.retrain_growth * self.trained_on:
+            nlist = self.nlist_setting or int(np.clip(np.sqrt(n), 16, 4096))
+            rng = np.random.default_rng(self.seed)
+            sample = self.vecs[rng.choice(n, size=min(n, 32 * nlist), replace=False)]
+            self.centroids = spherical_kmeans(sample, min(nlist, len(sample)), seed=self.seed)
+            self.trained_on = n
+            self.assign = _nearest(self.vecs, self.centroids)
+            self._lists = None
+
+    def _list_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable")
+            ptr = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.assign, minlength=len(self.centroids)), out=ptr[1:])
+            self._lists = (ptr, order)
+        return self._lists
+
+    # ---- search ----
+    def search(self, q: np.ndarray, top_n: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(row ids, cosine) of approximately the top_n rows most similar to unit vector q."""
+        if not len(self.assign):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        q = np.asarray(q, dtype=np.float32)
+        if self.centroids is None:
+            cand = np.arange(len(self.assign))
+            sims = np.asarray(self.vecs, dtype=np.float32) @ q
+        else:
+            ptr, order = self._list_view()
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+            cand = np.concatenate([order[ptr[c]:ptr[c + 1]] for c in probe])
+            sims = np.asarray(self.vecs[cand], dtype=np.float32) @ q
+        n = min(int(top_n), len(cand))
+        if n <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-sims, n - 1)[:n] if n < len(cand) else np.arange(len(cand))
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return cand[top].astype(np.int64), sims[top].astype(np.float32)
@@ -1,13 +1,131 @@
+import threading
+import time
 import numpy as np
-from typing import List
-from sentence_transformers import SentenceTransformer
+from collections import deque
+from typing import Callable, Dict, List, Optional
 from ..core.config import settings
+from ..core.metrics import emit, stage
+from .models import load_sentence_transformer
+
+_EMBEDDER = None
+
 def _normalize(vectors: np.ndarray) -> np.ndarray:
     norms = np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
     return vectors / norms
+
+class _Pending:
+    __slots__ = ("texts", "done", "result", "error")
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+class MicroBatcher:
+    """
+    Coalesces concurrent encode calls into one forward pass.
+
+    Callers block in encode(); a single worker thread takes everything
+    queued (up to max_batch texts), runs encode_fn once and hands each
+    caller its rows. While a batch is being encoded new calls keep
+    queueing, so under load batches grow by themselves. Once the previous
+    batch merged several callers, the worker also waits up to max_wait_ms
+    for more; a lone caller at low load is never delayed.
+    """
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch: int = 32, max_wait_ms: float = 2.0):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "deque[_Pending]" = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.calls = 0
+        self.batches = 0
+        self.texts = 0
+        self._concurrent = False
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        req = _Pending(list(texts))
+        with self._cond:
+            self._queue.append(req)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _take(self) -> List[_Pending]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            batch, n = [], 0
+            deadline = time.perf_counter() + (self.max_wait if self._concurrent else 0.0)
+            while True:
+                while self._queue and n + len(self._queue[0].texts) <= self.max_batch:
+                    req = self._queue.popleft()
+                    batch.append(req)
+                    n += len(req.texts)
+                if not batch:  # a single call larger than max_batch goes alone
+                    batch.append(self._queue.popleft())
+                    break
+                left = deadline - time.perf_counter()
+                if n >= self.max_batch or left <= 0 or (self._queue and n + len(self._queue[0].texts) > self.max_batch):
+                    break
+                self._cond.wait(left)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            texts = [t for req in batch for t in req.texts]
+            start = time.perf_counter()
+            try:
+                vecs = self.encode_fn(texts)
+            except BaseException as e:
+                for req in batch:
+                    req.error = e
+                    req.done.set()
+                continue
+            i = 0
+            for req in batch:
+                req.result = vecs[i:i + len(req.texts)]
+                i += len(req.texts)
+                req.done.set()
+            self._concurrent = len(batch) > 1
+            self.calls += len(batch)
+            self.batches += 1
+            self.texts += len(texts)
+            emit("embed_batch", calls=len(batch), texts=len(texts), seconds=time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        return {"max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000, "calls": self.calls,
+                "batches": self.batches, "texts": self.texts,
+                "mean_batch_texts": round(self.texts / self.batches, 2) if self.batches else None}
+
 class EmbeddingModel:
     def __init__(self):
-        self.model = SentenceTransformer(settings.HF_EMBED_MODEL)
-    def encode(self, texts: List[str]) -> np.ndarray:
-        vecs = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=False)
+        self.model = load_sentence_transformer(settings.HF_EMBED_MODEL, settings.EMBED_BACKEND)
+        # small calls (queries) from concurrent requests share forward passes
+        self.batcher = MicroBatcher(self._encode, settings.EMBED_BATCH_MAX,
+                                    settings.EMBED_BATCH_WAIT_MS) if settings.EMBED_MICROBATCH else None
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        with stage("embed.forward"):  # one model call (a merged batch when micro-batching)
+            vecs = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=False)
         return _normalize(vecs.astype("float32"))
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with stage("embed"):  # caller's view, including any wait for a shared batch
+            if self.batcher is not None and len(texts) < self.batcher.max_batch:
+                return self.batcher.encode(texts)
+            return self._encode(texts)
+
+def get_embedder() -> EmbeddingModel:
+    """
+    Returns the process-wide embedding model (MiniLM is loaded only once).
+    """
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        _EMBEDDER = EmbeddingModel()
+    return _EMBEDDER
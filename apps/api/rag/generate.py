@@ -1,9 +1,29 @@
+from pathlib import Path
+import hashlib
+import json
 import time
 import re
-from typing import List
-from transformers import pipeline
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..core.cache import get_cache, make_key
+from ..core.config import settings
+from ..core.metrics import emit, stage
+from ..nlp.corpus import get_corpus
+from .models import load_summarization_pipeline
 
 _SUMMARIZER = None
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-12-6"  # faster, smaller
+GEN_PARAMS = {"max_length": 120, "min_length": 30, "do_sample": False}
+
+def _set_torch_threads() -> None:
+    n = settings.SUMMARY_TORCH_THREADS
+    if n > 0:
+        try:
+            import torch
+            torch.set_num_threads(n)
+        except ImportError:
+            pass
+
 
 def get_summarizer():
     """
@@ -13,11 +33,8 @@ def get_summarizer():
     global _SUMMARIZER
     if _SUMMARIZER is None:
         print("🔹 Loading summarizer model (DistilBART)...")
-        _SUMMARIZER = pipeline(
-            "summarization",
-            model="sshleifer/distilbart-cnn-12-6",  # faster, smaller
-            device=-1  # CPU only
-        )
+        _set_torch_threads()
+        _SUMMARIZER = load_summarization_pipeline(SUMMARIZER_MODEL, settings.SUMMARY_BACKEND)
     return _SUMMARIZER
 
 
@@ -29,27 +46,132 @@ def chunk_text(text: str, max_words: int = 600) -> List[str]:
     return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
 
 
-def summarize_text(text: str) -> str:
+def _count_tokens(summarizer, texts: List[str]) -> List[int]:
+    if not texts:
+        return []
+    tokenizer = getattr(summarizer, "tokenizer", None)
+    if tokenizer is None:
+        return [len(t.split()) for t in texts]
+    return [len(ids) for ids in tokenizer(texts, truncation=True)["input_ids"]]
+
+
+def _summarize_chunks(summarizer, chunks: List[str], batch_size: int) -> Tuple[List[Optional[str]], Dict]:
     """
-    Performs chunked summarization and concatenates results.
+    Summarizes chunks `batch_size` at a time; None marks a chunk that failed.
+    Chunks are grouped by token length so each batch pads to a similar size,
+    and a failing batch is retried chunk by chunk so one bad input does not
+    drop its neighbours.
     """
-    summarizer = get_summarizer()
-    chunks = chunk_text(text)
-    summaries = []
-    for i, chunk in enumerate(chunks):
-        start = time.time()
+    kwargs = dict(GEN_PARAMS, truncation=True)
+    start = time.perf_counter()
+    lengths = _count_tokens(summarizer, chunks)
+    order = sorted(range(len(chunks)), key=lambda i: -lengths[i])
+    out: List[Optional[str]] = [None] * len(chunks)
+    batches = failed = 0
+    for s in range(0, len(order), batch_size):
+        idx = order[s:s + batch_size]
+        batches += 1
         try:
-            result = summarizer(
-                chunk,
-                max_length=120,
-                min_length=30,
-                do_sample=False
-            )[0]["summary_text"]
-            summaries.append(result)
-            print(f"✅ Chunk {i+1}/{len(chunks)} summarized in {time.time()-start:.2f}s")
+            res = summarizer([chunks[i] for i in idx], batch_size=len(idx), **kwargs)
+            for i, r in zip(idx, res):
+                out[i] = r["summary_text"]
+            continue
         except Exception as e:
-            print(f"⚠ Chunk {i+1} failed: {e}")
-    return " ".join(summaries).strip()
+            if len(idx) == 1:
+                failed += 1
+                emit("summarize.error", error=f"{type(e).__name__}: {e}")
+                continue
+        for i in idx:
+            try:
+                out[i] = summarizer(chunks[i], **kwargs)[0]["summary_text"]
+            except Exception as e:
+                failed += 1
+                emit("summarize.error", error=f"{type(e).__name__}: {e}")
+    seconds = time.perf_counter() - start
+    in_tokens = sum(lengths)
+    out_tokens = sum(_count_tokens(summarizer, [o for o in out if o]))
+    stats = {"chunks": len(chunks), "batches": batches, "batch_size": batch_size, "failed": failed,
+             "input_tokens": in_tokens, "output_tokens": out_tokens, "seconds": seconds,
+             "tokens_per_second": (in_tokens + out_tokens) / seconds if seconds > 0 else 0.0}
+    return out, stats
+
+
+def _reduce(summarizer, parts: List[str], n_chunks: int, batch_size: int) -> Tuple[List[str], int]:
+    """
+    Map-reduce pass: re-summarizes joined summaries of long texts until they
+    fit one chunk. Returns the parts and how many chunks failed on the way.
+    """
+    failed = 0
+    while n_chunks >= settings.SUMMARY_REDUCE_MIN_CHUNKS and len(parts) > 1:
+        chunks = chunk_text(" ".join(parts), settings.SUMMARY_CHUNK_WORDS)
+        summaries, stats = _summarize_chunks(summarizer, chunks, batch_size)
+        emit("summarize", stage="reduce", **stats)
+        failed += stats["failed"]
+        reduced = [s for s in summaries if s]
+        if not reduced:
+            break  # keep the map summaries rather than nothing
+        parts, n_chunks = reduced, len(chunks)
+        if len(chunks) == 1:
+            break
+    return parts, failed
+
+
+def summarize_text(text: str, batch_size: Optional[int] = None, map_reduce: Optional[bool] = None,
+                   stats: Optional[Dict] = None) -> str:
+    """
+    Performs chunked summarization and concatenates results.
+    Chunks go through the pipeline in batches (SUMMARY_BATCH_SIZE). With
+    map_reduce (SUMMARY_MAP_REDUCE), the joined summaries of a text that
+    needed at least SUMMARY_REDUCE_MIN_CHUNKS chunks are summarized again,
+    until they fit one chunk. Throughput is reported via core.metrics.
+    stats, when given, gets "failed": chunks left out because the model failed.
+    """
+    summarizer = get_summarizer()
+    batch_size = max(1, batch_size or settings.SUMMARY_BATCH_SIZE)
+    map_reduce = settings.SUMMARY_MAP_REDUCE if map_reduce is None else map_reduce
+    chunks = chunk_text(text, settings.SUMMARY_CHUNK_WORDS)
+    with stage("summarize.map"):
+        summaries, map_stats = _summarize_chunks(summarizer, chunks, batch_size)
+    emit("summarize", stage="map", **map_stats)
+    parts = [s for s in summaries if s]
+    failed = map_stats["failed"]
+    if map_reduce:
+        with stage("summarize.reduce"):
+            parts, reduce_failed = _reduce(summarizer, parts, len(chunks), batch_size)
+        failed += reduce_failed
+    if stats is not None:
+        stats["failed"] = failed
+    return " ".join(parts).strip()
+
+
+def iter_summarize_text(text: str, batch_size: Optional[int] = None, stats: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Generator form of summarize_text's map stage: yields each chunk summary
+    in document order as soon as it is produced. The first chunk runs on
+    its own so something can be shown quickly; the rest go in batches.
+    stats, when given, gets the totals (with "failed") once it is exhausted.
+    """
+    summarizer = get_summarizer()
+    batch_size = max(1, batch_size or settings.SUMMARY_BATCH_SIZE)
+    chunks = chunk_text(text, settings.SUMMARY_CHUNK_WORDS)
+    totals: Dict = {}
+    start = 0
+    while start < len(chunks):
+        n = 1 if start == 0 else batch_size
+        with stage("summarize.map"):
+            summaries, chunk_stats = _summarize_chunks(summarizer, chunks[start:start + n], n)
+        for k in ("chunks", "batches", "failed", "input_tokens", "output_tokens", "seconds"):
+            totals[k] = totals.get(k, 0) + chunk_stats[k]
+        for summary in summaries:
+            if summary:
+                yield summary
+        start += n
+    if totals:
+        tokens = totals["input_tokens"] + totals["output_tokens"]
+        emit("summarize", stage="stream", batch_size=batch_size, **totals,
+             tokens_per_second=tokens / totals["seconds"] if totals["seconds"] > 0 else 0.0)
+    if stats is not None:
+        stats.update(totals, failed=totals.get("failed", 0))
 
 
 def clean_summary(text: str) -> str:
@@ -61,32 +183,176 @@ def clean_summary(text: str) -> str:
     return text.strip()
 
 
+def generation_signature() -> Dict:
+    """Everything besides the input text that changes the output; part of every cache key."""
+    return {"model": SUMMARIZER_MODEL, "backend": settings.SUMMARY_BACKEND, **GEN_PARAMS,
+            "chunk_words": settings.SUMMARY_CHUNK_WORDS, "map_reduce": settings.SUMMARY_MAP_REDUCE,
+            "reduce_min_chunks": settings.SUMMARY_REDUCE_MIN_CHUNKS}
+
+
+def _prompt(question: Optional[str]) -> str:
+    # If question provided, make the summary focused
+    if question:
+        return f"Summarize the following medical research text focusing on the question: '{question}'."
+    return "Summarize the following medical research text concisely and factually."
+
+
+def _generate(context: str, question: Optional[str], stats: Optional[Dict] = None) -> Optional[str]:
+    """Abstractive summary of context, or None if the model failed (stats: as for summarize_text)."""
+    start_time = time.time()
+    text_to_summarize = f"{_prompt(question)}\n\n{context}"
+
+    try:
+        summary = clean_summary(summarize_text(text_to_summarize, stats=stats))
+    except Exception as e:
+        print(f"Summarization failed, falling back to extractive summary: {e}")
+        return None
+    emit("summarize_paper", seconds=time.time() - start_time, question=bool(question))
+    return summary or None
+
+
 def summarize_paper(context: str, question: str = None) -> str:
     """
     Generates a concise answer or summary based on given context and question.
     """
-    start_time = time.time()
-    summarizer = get_summarizer()
-
     if not context or len(context.strip()) == 0:
         return "No context available for summarization."
+    return _generate(context, question) or extractive_summary_fallback(context)
 
-    # If question provided, make the summary focused
-    if question:
-        prompt = f"Summarize the following medical research text focusing on the question: '{question}'."
-    else:
-        prompt = "Summarize the following medical research text concisely and factually."
-
-    text_to_summarize = f"{prompt}\n\n{context}"
 
+def stream_summarize_paper(context: str, question: str = None) -> Iterator[Dict]:
+    """
+    Streaming summarize_paper. Yields {"event": "chunk", "index", "text"}
+    for each cleaned chunk summary as it is produced, then one
+    {"event": "done", "summary", "fallback", "complete", "seconds",
+    "time_to_first_chunk"}. "summary" is what summarize_paper returns for
+    the same input (after the map-reduce pass, when it applies), so clients
+    should show it in place of the chunks. "complete" is false when a chunk
+    failed or the stream stopped on an error, i.e. the summary is partial.
+    """
+    if not context or len(context.strip()) == 0:
+        yield {"event": "done", "summary": "No context available for summarization.", "fallback": True,
+               "complete": False, "seconds": 0.0, "time_to_first_chunk": None}
+        return
+    start = time.perf_counter()
+    first = None
+    text_to_summarize = f"{_prompt(question)}\n\n{context}"
+    parts: List[str] = []
+    sent = 0
+    stats: Dict = {}
+    complete = False
     try:
-        summary = summarize_text(text_to_summarize)
-        summary = clean_summary(summary)
-        print(f"Total summarization time: {time.time() - start_time:.2f}s")
-        return summary
+        for summary in iter_summarize_text(text_to_summarize, stats=stats):
+            parts.append(summary)
+            text = clean_summary(summary)
+            if not text:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            yield {"event": "chunk", "index": sent, "text": text}
+            sent += 1
+        if settings.SUMMARY_MAP_REDUCE:
+            n_chunks = len(chunk_text(text_to_summarize, settings.SUMMARY_CHUNK_WORDS))
+            with stage("summarize.reduce"):
+                parts, reduce_failed = _reduce(get_summarizer(), parts, n_chunks, max(1, settings.SUMMARY_BATCH_SIZE))
+            stats["failed"] += reduce_failed
+        complete = stats["failed"] == 0
     except Exception as e:
         print(f"Summarization failed, falling back to extractive summary: {e}")
-        return extractive_summary_fallback(context)
+    summary = clean_summary(" ".join(parts))
+    seconds = time.perf_counter() - start
+    emit("summarize_stream", seconds=seconds, time_to_first_chunk=first if first is not None else seconds,
+         chunks=sent, question=bool(question))
+    yield {"event": "done", "summary": summary or extractive_summary_fallback(context), "fallback": not summary,
+           "complete": complete and bool(summary), "seconds": round(seconds, 3),
+           "time_to_first_chunk": round(first, 3) if first is not None else None}
+
+
+def _cache_key(kind: str, content: bytes, query: str) -> str:
+    return make_key(kind, hashlib.sha256(content).hexdigest(), query, generation_signature())
+
+
+def _cached(kind: str, content: bytes, query: str, context: str, question: str) -> Tuple[str, bool]:
+    """
+    summarize_paper through the result cache: (text, cache hit). Only
+    complete abstractive output is stored (no chunk failed), so a fallback
+    or a partial summary is retried next time.
+    """
+    cache = get_cache()
+    if cache is None or not context.strip():
+        return summarize_paper(context, question), False
+    key = _cache_key(kind, content, query)
+    with stage("cache.get"):
+        hit = cache.get(key, kind)
+    if hit is not None:
+        return hit, True
+    stats: Dict = {}
+    summary = _generate(context, question, stats)
+    if summary is None:
+        return extractive_summary_fallback(context), False
+    if stats.get("failed", 0) == 0:
+        cache.put(key, summary, kind)
+    return summary, False
+
+
+def answer_from_context(question: str, contexts: List[Dict]) -> str:
+    """
+    Answers a question from retrieved contexts ({"text", "meta"} dicts).
+    Cached by question + context text, so a changed library re-generates.
+    """
+    context = " ".join(c["text"] for c in contexts if c.get("text"))
+    return _cached("answer", context.encode("utf-8"), question, context, question)[0]
+
+
+def _paper_context(raw: bytes, mode: str) -> Tuple[str, str]:
+    j = json.loads(raw)
+    context = " ".join(s["text"] for s in j.get("sections", []) if s.get("text"))
+    question = f"Summarize this paper for a {'researcher' if mode == 'expert' else 'patient'}."
+    return context, question
+
+
+def _paper_raw(paper_id: str, parsed_dir: Optional[Path]) -> bytes:
+    corpus = get_corpus(Path(parsed_dir) if parsed_dir else Path(settings.STORAGE_DIR) / "parsed")
+    raw = corpus.get_raw(paper_id)
+    if raw is None:
+        raise KeyError(f"paper {paper_id!r} not found")
+    return raw
+
+
+def summarize_parsed_paper(paper_id: str, mode: str = "expert", parsed_dir: Optional[Path] = None) -> Tuple[str, bool]:
+    """
+    Summary of one paper in the corpus for an audience mode ("expert" |
+    "patient"): (summary, cache hit). Cached by the paper's content hash +
+    mode. KeyError if the paper is not in the corpus.
+    """
+    raw = _paper_raw(paper_id, parsed_dir)
+    context, question = _paper_context(raw, mode)
+    return _cached("summary", raw, mode, context, question)
+
+
+def stream_summarize_parsed_paper(paper_id: str, mode: str = "expert",
+                                  parsed_dir: Optional[Path] = None) -> Iterator[Dict]:
+    """
+    Streaming summarize_parsed_paper: the events of stream_summarize_paper,
+    with "cached" on the final one. A cache hit is a single chunk + done;
+    a complete abstractive summary is stored like the non-streaming path.
+    """
+    raw = _paper_raw(paper_id, parsed_dir)
+    context, question = _paper_context(raw, mode)
+    cache = get_cache() if context.strip() else None
+    key = _cache_key("summary", raw, mode) if cache else None
+    hit = cache.get(key, "summary") if cache else None
+    if hit is not None:
+        yield {"event": "chunk", "index": 0, "text": hit}
+        yield {"event": "done", "summary": hit, "fallback": False, "complete": True, "cached": True,
+               "seconds": 0.0, "time_to_first_chunk": 0.0}
+        return
+    for ev in stream_summarize_paper(context, question):
+        if ev["event"] == "done":
+            if cache and ev["complete"]:
+                cache.put(key, ev["summary"], "summary")
+            ev = dict(ev, cached=False)
+        yield ev
 
 
 def extractive_summary_fallback(text: str, max_sentences: int = 4) -> str:
@@ -100,6 +366,8 @@ def extractive_summary_fallback(text: str, max_sentences: int = 4) -> str:
 
 # Example usage:
 if __name__ == "__main__":
+    from ..core.metrics import add_hook, print_hook
+    add_hook(print_hook)
     example_text = """
     Breast cancer remains a leading cause of death worldwide. Recent studies 
     indicate the potential of immunotherapy and targeted treatments. This study 
@@ -0,0 +1,112 @@
+"""
+Loading the two models, on a selectable CPU backend, plus the startup
+warm-up.
+
+torch, transformers and sentence-transformers are imported inside these
+functions, so importing the API (or a script that only parses or
+searches) does not pay for them. The cost moves to the first model use,
+or to startup when MODEL_WARMUP is on.
+
+Backends (EMBED_BACKEND / SUMMARY_BACKEND):
+- "torch": the model as published, in float32.
+- "int8": torch dynamic quantization, so the Linear layers run with int8 weights.
+  Smaller and usually faster on CPU, with slightly different outputs.
+- "onnx": ONNX Runtime on CPU. The embedder uses sentence-transformers'
+  onnx backend (>= 3.2, `pip install "sentence-transformers[onnx]"`).
+  The summarizer is exported once with optimum (`pip install
+  "optimum[onnxruntime]"`) and kept in data/models/.
+If a backend's packages are missing, the model loads on torch instead.
+"""
+from pathlib import Path
+import time
+from typing import Dict
+
+from ..core.config import settings
+from ..core.metrics import stage
+
+BACKENDS = ("torch", "int8", "onnx")
+WARMUP_TEXT = ("Patients with advanced disease were randomized to treatment or placebo; "
+               "median survival improved and adverse events were mild.")
+
+
+def _backend(name: str, setting: str) -> str:
+    name = (name or "torch").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"{setting}={name!r}: expected one of {', '.join(BACKENDS)}")
+    return name
+
+
+def quantize_int8(module):
+    """Dynamic int8 quantization of a torch module's Linear layers (weights int8, activations quantized per call)."""
+    import torch
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_sentence_transformer(name: str, backend: str = "torch"):
+    """The sentence embedding model on EMBED_BACKEND."""
+    backend = _backend(backend, "EMBED_BACKEND")
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        try:
+            return SentenceTransformer(name, backend="onnx")
+        except (ImportError, TypeError) as e:  # onnxruntime / optimum missing, or sentence-transformers < 3.2
+            print(f"⚠️ ONNX embedder unavailable ({e}); using torch")
+            return SentenceTransformer(name)
+    model = SentenceTransformer(name)
+    if backend == "int8":
+        try:
+            model = quantize_int8(model)
+        except ImportError as e:
+            print(f"⚠️ int8 embedder unavailable ({e}); using float32")
+    return model
+
+
+def _onnx_seq2seq(name: str):
+    """optimum's ONNX Runtime model, exported on first use and reloaded from data/models/ afterwards."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    out = Path(settings.STORAGE_DIR) / "models" / (name.replace("/", "--") + "-onnx")
+    if (out / "config.json").exists():
+        return ORTModelForSeq2SeqLM.from_pretrained(out)
+    print(f"🔹 Exporting {name} to ONNX (once)...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(name, export=True)
+    model.save_pretrained(out)
+    return model
+
+
+def load_summarization_pipeline(name: str, backend: str = "torch"):
+    """A CPU summarization pipeline for `name` on SUMMARY_BACKEND."""
+    backend = _backend(backend, "SUMMARY_BACKEND")
+    from transformers import pipeline
+    if backend == "onnx":
+        try:
+            from transformers import AutoTokenizer
+            return pipeline("summarization", model=_onnx_seq2seq(name), tokenizer=AutoTokenizer.from_pretrained(name),
+                            device=-1)
+        except ImportError as e:
+            print(f"⚠️ ONNX summarizer unavailable ({e}); using torch")
+    summarizer = pipeline("summarization", model=name, device=-1)  # CPU only
+    if backend == "int8":
+        try:
+            summarizer.model = quantize_int8(summarizer.model)
+        except ImportError as e:
+            print(f"⚠️ int8 summarizer unavailable ({e}); using float32")
+    return summarizer
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Loads the embedder and the summarizer and runs one short input through
+    each. Lazy initialisation inside the libraries and the first allocations
+    then happen here, before the first request. Returns seconds per model.
+    """
+    from .embed import get_embedder
+    from .generate import get_summarizer
+    out = {}
+    for name, run in (("embed", lambda: get_embedder().encode([WARMUP_TEXT])),
+                      ("summarize", lambda: get_summarizer()(WARMUP_TEXT, max_length=24, min_length=5, do_sample=False))):
+        t0 = time.perf_counter()
+        with stage(f"warmup.{name}"):
+            run()
+        out[name] = round(time.perf_counter() - t0, 3)
+    print(f"🔹 Models warm: {out}")
+    return out
@@ -1,10 +1,27 @@
+from contextlib import contextmanager
 from pathlib import Path
+import copy
 import json
-from typing import List, Dict
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Optional, Tuple, Union
 import numpy as np
-from rank_bm25 import BM25Okapi
 
-from .embed import EmbeddingModel
+from ..core.config import settings
+from ..core.metrics import stage
+from ..nlp.corpus import Corpus, get_corpus
+from .ann import IVFIndex
+from .embed import get_embedder
+from .table import SentenceTable
+from .vectors import (EmbeddingIndex, PaperVectors, load_paper_vectors, save_paper_vectors,
+                      vectors_dir_for, vectors_key)
+
+if TYPE_CHECKING:
+    from .shards import ShardedStore
 
 
 TOPN_SHORTLIST = 250          # how many sentences to shortlist from BM25 before dense scoring
@@ -12,6 +29,7 @@ BM25_WEIGHT = 0.7             # lexical weight in hybrid score
 COSINE_WEIGHT = 0.3           # semantic weight in hybrid score
 MMR_LAMBDA = 0.6              # 0..1 (higher = more relevance, lower = more diversity)
 MAX_SENT_PER_SECTION = 12     # cap sentences per section to keep index light
+SEARCH_BATCH_CHUNK = 64       # queries scored together by search_batch (bounds the padded MMR block)
 
 # Prefer results & conclusions for most clinical questions
 SECTION_WEIGHTS = {
@@ -46,111 +64,1007 @@ def _tokenize(s: str) -> List[str]:
     s = s.lower().strip()
     return [t for t in s.split() if any(ch.isalpha() for ch in t)]
 
+def paper_sentences(j: Dict) -> List[Tuple[str, str]]:
+    """(sentence, section) pairs of one parsed paper, in store order."""
+    out: List[Tuple[str, str]] = []
+    for sec in j.get("sections", []):
+        sec_name = str(sec.get("name", "")).lower()
+        for s in _sent_split(sec.get("text", ""))[:MAX_SENT_PER_SECTION]:
+            out.append((s, sec_name))
+    return out
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (0 if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux, bytes on macOS; peak rather than current
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(rss if sys.platform == "darwin" else rss * 1024)
+    except (ImportError, OSError):
+        return 0
+
 def _l2n(v: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(v, axis=-1, keepdims=True) + 1e-12
     return v / n
 
-def mmr(cands: np.ndarray, q: np.ndarray, k: int, lambda_: float = 0.6) -> List[int]:
-    """Maximal Marginal Relevance over L2-normalized vectors."""
-    n = cands.shape[0]
+def mmr(cands: np.ndarray, q: np.ndarray, k: int, lambda_: float = 0.6,
+        valid: Optional[np.ndarray] = None):
+    """
+    Maximal Marginal Relevance over L2-normalized vectors.
+    Keeps a running max-similarity-to-chosen vector, so each step is one
+    NumPy matrix-vector product plus an argmax (ties go to the lowest index).
+
+    q (d,) with cands (n, d) -> List[int].
+    q (B, d) with cands (n, d) shared or (B, n, d) per query -> List[List[int]];
+    valid (B, n) marks real rows when per-query candidate sets are padded.
+    """
+    if q.ndim == 1:
+        return _mmr_batch(cands, q[None], k, lambda_, None)[0]
+    return _mmr_batch(cands, q, k, lambda_, valid)
+
+def _sims(cands: np.ndarray, vecs: np.ndarray) -> np.ndarray:
+    """
+    (B, n) similarities of each query's candidates to vecs[b]. einsum runs
+    the same kernel for every row, so identical rows get identical scores
+    and ties resolve by index (BLAS gemv may differ in the last ulp).
+    """
+    if cands.ndim == 3:
+        return np.einsum("bnd,bd->bn", cands, vecs)
+    return np.einsum("nd,bd->bn", cands, vecs)
+
+def _mmr_batch(cands: np.ndarray, q: np.ndarray, k: int, lambda_: float,
+               valid: Optional[np.ndarray]) -> List[List[int]]:
+    B, n = q.shape[0], cands.shape[-2]
     if n == 0:
-        return []
-    rel = (cands @ q)  # (n,)
-    chosen = [int(np.argmax(rel))]
-    remaining = set(range(n)) - set(chosen)
-    while len(chosen) < min(k, n) and remaining:
-        best_i = None
-        best_score = -1e9
-        for i in remaining:
-            relevance = float(rel[i])
-            diversity = max(float(cands[i] @ cands[j]) for j in chosen)
-            score = lambda_ * relevance - (1.0 - lambda_) * diversity
-            if score > best_score:
-                best_score = score
-                best_i = i
-        chosen.append(int(best_i))
-        remaining.remove(int(best_i))
+        return [[] for _ in range(B)]
+    avail = np.ones((B, n), dtype=bool) if valid is None else np.array(valid, dtype=bool)
+    steps = np.minimum(int(k), avail.sum(axis=1))
+    rows = np.arange(B)
+    pick = (lambda idx: cands[rows, idx]) if cands.ndim == 3 else (lambda idx: cands[idx])
+
+    # relevance as the original (cands @ q); only max_sim needs per-row determinism
+    rel = ((cands @ q[0])[None] if cands.ndim == 2 and B == 1 else _sims(cands, q)).astype(np.float64)
+    first = np.argmax(np.where(avail, rel, -np.inf), axis=1)
+    chosen = [[int(first[b])] if avail[b].any() else [] for b in range(B)]
+    avail[rows, first] = False
+    max_sim = _sims(cands, pick(first)).astype(np.float64)    # running max over chosen
+
+    for step in range(1, int(steps.max(initial=0))):
+        score = lambda_ * rel - (1.0 - lambda_) * max_sim
+        score[~avail] = -np.inf
+        best = np.argmax(score, axis=1)
+        live = steps > step
+        for b in np.nonzero(live)[0]:
+            chosen[b].append(int(best[b]))
+        avail[rows[live], best[live]] = False
+        np.maximum(max_sim, _sims(cands, pick(best)), out=max_sim)
     return chosen
 
 
+# ======= BM25 =======
+def _top_n(scores: np.ndarray, n: int, tie_key: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> np.ndarray:
+    """
+    Indices of the n highest scores, best first. Ties: lower index first,
+    or lower tie_key(indices) first when given (a shard's corpus order).
+    """
+    n = min(int(n), len(scores))
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if n < len(scores):
+        part = np.argpartition(-scores, n - 1)[:n]
+        # argpartition picks arbitrary rows among ties at the cut; take the first ones
+        cut = scores[part].min()
+        above = part[scores[part] > cut]
+        tied = np.flatnonzero(scores == cut)
+        if tie_key is not None:
+            tied = tied[np.argsort(tie_key(tied), kind="stable")]
+        part = np.concatenate([above, tied[:n - len(above)]])
+    else:
+        part = np.arange(len(scores))
+    if tie_key is None:
+        return part[np.lexsort((part, -scores[part]))]
+    return part[np.lexsort((part, tie_key(part), -scores[part]))]
+
+
+def bm25_idf(df: np.ndarray, n_docs: int, epsilon: float) -> np.ndarray:
+    """
+    rank_bm25's IDF for document frequencies df (all > 0, in vocabulary
+    order): log((N - df + 0.5) / (df + 0.5)), negatives floored at
+    epsilon * average idf.
+    """
+    # math.log per distinct df (few) rather than np.log, to match rank_bm25 bit for bit
+    uniq, inv = np.unique(df, return_inverse=True)
+    idf_u = np.array([math.log(n_docs - int(d) + 0.5) - math.log(int(d) + 0.5) for d in uniq])
+    idf = idf_u[inv]
+    # rank_bm25 sums sequentially in first-occurrence order; cumsum does the same
+    average_idf = float(np.cumsum(idf)[-1]) / len(idf)
+    idf[idf < 0] = epsilon * average_idf
+    return idf
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a sparse term-document matrix.
+
+    Documents are stored doc-major (term ids + term frequencies per
+    sentence), which makes appending and slicing out papers cheap; a
+    term-major postings view (CSC) is rebuilt lazily before the next query.
+    A query only touches the postings of its own terms, and top-N uses
+    argpartition instead of a full sort.
+
+    Scores are identical to rank_bm25.BM25Okapi(k1=1.5, b=0.75,
+    epsilon=0.25) over the same tokenized corpus: same IDF (with the
+    epsilon * average_idf floor for negative IDFs), same per-term
+    expression, and repeated query terms counted each time.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.vocab: Dict[str, int] = {}            # term -> id, in first-occurrence order
+        self.term_ids = np.zeros(0, dtype=np.int32)  # doc-major nonzeros
+        self.tfs = np.zeros(0, dtype=np.int32)
+        self.doc_ptr = np.zeros(1, dtype=np.int64)   # doc i -> term_ids[doc_ptr[i]:doc_ptr[i+1]]
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []   # (token ids, doc lengths) not yet flushed
+        self._postings = None
+        self.commit()
+
+    def __len__(self) -> int:
+        return len(self.doc_len) + sum(len(n) for _, n in self._pending)
+
+    # ---- building ----
+    def add(self, docs: List[List[str]]) -> None:
+        """Appends tokenized documents; call commit() before scoring."""
+        vocab = self.vocab
+        intern = vocab.setdefault
+        lens = np.fromiter((len(d) for d in docs), dtype=np.int64, count=len(docs))
+        ids = np.fromiter((intern(w, len(vocab)) for d in docs for w in d), dtype=np.int64, count=int(lens.sum()))
+        self._pending.append((ids, lens))
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        ids = np.concatenate([i for i, _ in self._pending])
+        lens = np.concatenate([n for _, n in self._pending])
+        self._pending = []
+        # (doc, term) pairs -> per-document term frequencies in one sort
+        V = max(len(self.vocab), 1)
+        doc = np.repeat(np.arange(len(lens), dtype=np.int64), lens)
+        keys, counts = np.unique(doc * V + ids, return_counts=True)
+        nnz = np.bincount(keys // V, minlength=len(lens))
+        self.term_ids = np.concatenate([self.term_ids, (keys % V).astype(np.int32)])
+        self.tfs = np.concatenate([self.tfs, counts.astype(np.int32)])
+        self.doc_ptr = np.concatenate([self.doc_ptr, self.doc_ptr[-1] + np.cumsum(nnz)])
+        self.doc_len = np.concatenate([self.doc_len, lens.astype(np.int32)])
+
+    def remove(self, start: int, end: int) -> None:
+        """Drops documents [start, end); later documents shift down."""
+        self._flush()
+        a, b = int(self.doc_ptr[start]), int(self.doc_ptr[end])
+        self.term_ids = np.concatenate([self.term_ids[:a], self.term_ids[b:]])
+        self.tfs = np.concatenate([self.tfs[:a], self.tfs[b:]])
+        self.doc_ptr = np.concatenate([self.doc_ptr[:start], self.doc_ptr[end:] - (b - a)])
+        self.doc_len = np.concatenate([self.doc_len[:start], self.doc_len[end:]])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.term_ids, self.tfs, self.doc_ptr, self.doc_len, self.df, self.idf)
+        return sum(a.nbytes for a in arrays) + sys.getsizeof(self.vocab) + sum(sys.getsizeof(w) for w in self.vocab)
+
+    def commit(self) -> None:
+        """Recomputes avgdl, IDF and the postings view after add/remove."""
+        self._flush()
+        n_docs = len(self.doc_len)
+        self.df = np.bincount(self.term_ids, minlength=len(self.vocab)).astype(np.int64)
+        self.idf = np.zeros(len(self.vocab), dtype=np.float64)
+        self.avgdl = int(self.doc_len.sum()) / n_docs if n_docs else 0.0
+        present = np.flatnonzero(self.df)
+        if len(present):
+            self.idf[present] = bm25_idf(self.df[present], n_docs, self.epsilon)
+        self._norm = self._length_norm(self.avgdl) if n_docs else None
+        self._other_norm = None   # (avgdl, norm) for scoring with corpus-wide statistics
+        self._postings = None
+
+    def copy(self) -> "BM25Index":
+        """
+        The committed index as it is now, for saving while this one keeps
+        changing: arrays are shared (add / remove replace them), the
+        vocabulary is copied.
+        """
+        if self._pending:
+            self.commit()
+        idx = copy.copy(self)
+        idx.vocab = dict(self.vocab)
+        idx._pending = []
+        return idx
+
+    def _length_norm(self, avgdl: float) -> np.ndarray:
+        return self.k1 * (1 - self.b + self.b * self.doc_len.astype(np.float64) / avgdl)
+
+    def doc_stats(self) -> Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        What a sharded store merges into corpus-wide statistics: documents,
+        total length, and the ids of the terms present (ascending, i.e. in
+        vocabulary order) with their document frequencies and the first
+        document containing each.
+        """
+        if self._pending:
+            self.commit()
+        present = np.flatnonzero(self.df)
+        first = np.full(len(self.vocab), len(self.term_ids), dtype=np.int64)
+        np.minimum.at(first, self.term_ids, np.arange(len(self.term_ids)))   # doc-major: first nonzero = first doc
+        docs = np.searchsorted(self.doc_ptr, first[present], side="right") - 1
+        return len(self.doc_len), int(self.doc_len.sum()), present, self.df[present], docs.astype(np.int64)
+
+    def _postings_view(self):
+        if self._postings is None:
+            order = np.argsort(self.term_ids, kind="stable")
+            docs = np.repeat(np.arange(len(self.doc_len), dtype=np.int32), np.diff(self.doc_ptr))
+            ptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(self.df, out=ptr[1:])
+            self._postings = (ptr, docs[order], self.tfs[order].astype(np.float64))
+        return self._postings
+
+    # ---- scoring ----
+    def get_scores(self, query: List[str], idf: Optional[Dict[str, float]] = None,
+                   avgdl: Optional[float] = None) -> np.ndarray:
+        """
+        BM25 score of every document (float64), like BM25Okapi.get_scores.
+        idf (term -> IDF) and avgdl replace this index's own statistics:
+        a shard scoring with the whole corpus's gets the unsharded scores.
+        """
+        scores = np.zeros(len(self.doc_len), dtype=np.float64)
+        if not len(self.doc_len):
+            return scores
+        ptr, docs, tfs = self._postings_view()
+        k1 = self.k1
+        norm = self._norm
+        if avgdl is not None and avgdl != self.avgdl:
+            if self._other_norm is None or self._other_norm[0] != avgdl:
+                self._other_norm = (avgdl, self._length_norm(avgdl))
+            norm = self._other_norm[1]
+        for w in query:
+            t = self.vocab.get(w)
+            if t is None:
+                continue
+            w_idf = self.idf[t] if idf is None else idf.get(w, 0.0)
+            if not w_idf:
+                continue
+            lo, hi = ptr[t], ptr[t + 1]
+            d, tf = docs[lo:hi], tfs[lo:hi]
+            scores[d] += w_idf * (tf * (k1 + 1) / (tf + norm[d]))
+        return scores
+
+    def get_scores_batch(self, queries: List[List[str]]) -> Iterator[np.ndarray]:
+        """
+        get_scores for several queries, yielded one row at a time (memory
+        stays one score vector). Each distinct term's postings are scored
+        once for the whole batch; rows equal get_scores bit for bit.
+        """
+        if not len(self.doc_len):
+            for _ in queries:
+                yield np.zeros(0, dtype=np.float64)
+            return
+        ptr, docs, tfs = self._postings_view()
+        k1 = self.k1
+        contrib: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}   # term -> (docs, score terms)
+        for query in queries:
+            scores = np.zeros(len(self.doc_len), dtype=np.float64)
+            for w in query:
+                t = self.vocab.get(w)
+                if t is None or not self.idf[t]:
+                    continue
+                c = contrib.get(t)
+                if c is None:
+                    lo, hi = ptr[t], ptr[t + 1]
+                    d, tf = docs[lo:hi], tfs[lo:hi]
+                    c = contrib[t] = (d, self.idf[t] * (tf * (k1 + 1) / (tf + self._norm[d])))
+                scores[c[0]] += c[1]
+            yield scores
+
+    def top_n(self, query: List[str], n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, scores) of the n best documents, best first."""
+        scores = self.get_scores(query)
+        idx = _top_n(scores, n)
+        return idx, scores[idx]
+
+    # ---- persistence ----
+    def save(self, path: Path) -> None:
+        if self._pending:
+            self.commit()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("term_ids", "tfs", "doc_ptr", "doc_len"):
+            tmp = path / f"{name}.npy.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(tmp, path / f"{name}.npy")
+        meta = {"k1": self.k1, "b": self.b, "epsilon": self.epsilon, "vocab": list(self.vocab)}
+        (path / "bm25.json.tmp").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(path / "bm25.json.tmp", path / "bm25.json")
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "BM25Index":
+        path = Path(path)
+        meta = json.loads((path / "bm25.json").read_text(encoding="utf-8"))
+        idx = cls.__new__(cls)
+        idx.k1, idx.b, idx.epsilon = meta["k1"], meta["b"], meta["epsilon"]
+        idx.vocab = {w: i for i, w in enumerate(meta["vocab"])}
+        for name in ("term_ids", "tfs", "doc_ptr", "doc_len"):
+            setattr(idx, name, np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None))
+        idx._pending = []
+        idx._postings = None
+        idx.commit()
+        return idx
+
+
 # ======= store =======
+def _bm25_shortlist(scores: np.ndarray, rows: Optional[np.ndarray],
+                    tie_key: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    float32 BM25 scores (-inf outside `rows` when given) and the
+    TOPN_SHORTLIST best rows, best first (argpartition, no full sort).
+    """
+    scores = scores.astype(np.float32)
+    if rows is not None:
+        kept = np.full(len(scores), -np.inf, dtype=np.float32)
+        kept[rows] = scores[rows]
+        scores = kept
+    return scores, _top_n(scores, TOPN_SHORTLIST if rows is None else min(TOPN_SHORTLIST, len(rows)), tie_key)
+
+def _bm25_normalized(scores: np.ndarray, top: float) -> np.ndarray:
+    """BM25 scores scaled by the best one, so they are comparable with cosine."""
+    return scores / (top + 1e-12) if top > 0 else scores
+
+def _hybrid(cand_vecs: np.ndarray, q_vec: np.ndarray, bm25: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Hybrid score (BM25 + cosine) times the section boosts."""
+    cos_scores = (cand_vecs @ q_vec).astype(np.float32)
+    return (BM25_WEIGHT * bm25 + COSINE_WEIGHT * cos_scores) * weights
+
+class StoreLock:
+    """
+    Readers / writer lock of a store: searches share it, refresh() holds
+    it alone while it patches the index arrays in place. A waiting writer
+    blocks new readers, so a steady stream of searches cannot starve a
+    reload. Not reentrant: a reader must not take it again.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+SNAPSHOT_VERSION = 3
+
+def store_dir_for(parsed_dir: Path) -> Path:
+    """Store snapshots live next to the vector index, in data/index/store."""
+    return Path(parsed_dir).parent / "index" / "store"
+
+def shards_dir_for(parsed_dir: Path) -> Path:
+    """Sharded store snapshots (STORE_SHARDS > 1): data/index/shards/<shard>, plus shards.json."""
+    return Path(parsed_dir).parent / "index" / "shards"
+
+def _snapshot_signature() -> Dict:
+    """Settings baked into a snapshot; any change means a full rebuild."""
+    return {"version": SNAPSHOT_VERSION, "max_sent_per_section": MAX_SENT_PER_SECTION,
+            "embed_model": settings.HF_EMBED_MODEL, "embed_backend": settings.EMBED_BACKEND,
+            "vector_dtype": settings.EMBED_INDEX_DTYPE}
+
 class SimpleStore:
     """
     Sentence-level store.
     Pipeline:
-      1) BM25 shortlist (TOPN_SHORTLIST)
-      2) Dense encode shortlist only (MiniLM on CPU)
+      1) BM25 shortlist (TOPN_SHORTLIST), plus ANN_TOPN dense neighbours
+         from the IVF index when ANN_ENABLED
+      2) Dense vectors for the shortlist, sliced from the precomputed
+         per-paper index (only the query is encoded per search)
       3) Hybrid score (BM25 + cosine) + section weights
       4) MMR to pick diverse top-k sentences
+    Sentences and their paper / section / source live in a columnar
+    SentenceTable; save() / load() snapshot it with the BM25 index and all
+    sentence vectors in one matrix, so a restart memory-maps three files
+    instead of re-reading every parsed JSON and per-paper vector file.
+    Searches may run on several threads while refresh() patches the store:
+    they share self.lock, which refresh() only takes alone to apply the
+    papers it has already read, tokenized and embedded.
     """
-    def __init__(self, parsed_dir: Path):
-        self.sentences: List[str] = []
-        self.meta: List[Dict] = []
+    def __init__(self, parsed_dir: Path, vectors_dir: Optional[Path] = None,
+                 papers: Optional[Callable[[str], bool]] = None):
+        t0 = time.perf_counter()
+        rss0 = _rss_bytes()
+        self._setup(parsed_dir, vectors_dir, papers)
 
         # Load sections and turn into sentences
-        for jf in parsed_dir.glob("*.json"):
-            j = json.loads(jf.read_text(encoding="utf-8"))
-            pid = j.get("paper_id", jf.stem)
-            for sec in j.get("sections", []):
-                sec_name = str(sec.get("name", "")).lower()
-                sents = _sent_split(sec.get("text", ""))[:MAX_SENT_PER_SECTION]
-                for s in sents:
-                    self.sentences.append(s)
-                    self.meta.append({"paper_id": pid, "section": sec_name, "source": jf.name})
-
-        # BM25 over tokenized sentences (fast and memory-light)
-        self.corpus_tokens: List[List[str]] = [_tokenize(s) for s in self.sentences]
-        self.bm25 = BM25Okapi(self.corpus_tokens) if self.sentences else None
-
-        # Dense encoder (created once, used on shortlist per query)
-        self.emb = EmbeddingModel()
-
-    def search(self, query: str, top_k: int = 6) -> List[Dict]:
-        if not self.sentences or self.bm25 is None:
-            return []
-
-        # 1) BM25 scores for all sentences
-        q_tokens = _tokenize(query)
-        bm25_scores = np.array(self.bm25.get_scores(q_tokens), dtype=np.float32)
-        if float(bm25_scores.max()) > 0:
-            bm25_scores = bm25_scores / (float(bm25_scores.max()) + 1e-12)
-
-        # shortlist the top-N by BM25
-        N = min(TOPN_SHORTLIST, len(self.sentences))
-        short_idx = np.argsort(-bm25_scores)[:N]
-        short_texts = [self.sentences[i] for i in short_idx]
-
-        # 2) Dense encode ONLY shortlist + query
-        q_vec = self.emb.encode([query])[0]    # (d,)
-        q_vec = _l2n(q_vec)
-        cand_vecs = self.emb.encode(short_texts)
-        cand_vecs = _l2n(cand_vecs)            # (N, d)
-
-        cos_scores = (cand_vecs @ q_vec).astype(np.float32)
-
-        # 3) Hybrid score + section weighting
-        hybrid = BM25_WEIGHT * bm25_scores[short_idx] + COSINE_WEIGHT * cos_scores
-
-        # section boosts
-        boosts = np.ones_like(hybrid)
-        for i, idx in enumerate(short_idx):
-            sec = self.meta[int(idx)]["section"]
-            boosts[i] = SECTION_WEIGHTS.get(sec, 1.0)
-        hybrid = hybrid * boosts
-
-        # 4) MMR to diversify final k
-        chosen_local = mmr(cand_vecs, q_vec, k=int(top_k), lambda_=MMR_LAMBDA)
-        final_idx = [int(short_idx[i]) for i in chosen_local]
-
-        out: List[Dict] = []
-        for i in final_idx:
-            out.append({
-                "text": self.sentences[i],
-                "meta": self.meta[i],
-                "score": float(hybrid[np.where(short_idx == i)[0][0]])
-            })
+        current = self._current()
+        for pid in current:
+            paper = self._read_paper(pid)
+            if paper is not None:
+                self._append_paper(pid, paper)
+                self.fingerprint[pid] = current[pid]
+
+        # BM25 over tokenized sentences (sparse, memory-light)
+        self._commit()
+
+        self.build_seconds = time.perf_counter() - t0
+        self.build_rss_delta = max(0, _rss_bytes() - rss0)
+
+    def _setup(self, parsed_dir: Path, vectors_dir: Optional[Path], papers: Optional[Callable[[str], bool]]) -> None:
+        self.parsed_dir = Path(parsed_dir)
+        self.vectors_dir = Path(vectors_dir) if vectors_dir else vectors_dir_for(self.parsed_dir)
+        self.corpus: Corpus = get_corpus(self.parsed_dir)
+        self.papers = papers                    # which corpus papers belong here (None = all; a shard's subset)
+        self.fingerprint: Dict[str, str] = {}   # paper_id -> content hash, as in the corpus
+        self.table = SentenceTable()
+        self.bm25 = BM25Index()
+        self.vectors = EmbeddingIndex()
+        # optional dense candidate path over all sentences (unioned with the BM25 shortlist)
+        self.ann = IVFIndex(nlist=settings.ANN_NLIST, nprobe=settings.ANN_NPROBE, min_train=settings.ANN_MIN_TRAIN,
+                            dtype=np.float32 if settings.EMBED_INDEX_DTYPE == "float32" else np.float16
+                            ) if settings.ANN_ENABLED else None
+        # papers in row order: source names, sentence counts (rows are
+        # contiguous per paper), paper ids and vector keys
+        self._sources: List[str] = []
+        self._counts: List[int] = []
+        self._pids: List[str] = []
+        self._keys: List[str] = []
+        self.from_snapshot = False
+        self.generation: Optional[str] = None   # snapshot this store matches (None once changed since)
+        self.lock = StoreLock()
+        self._refreshing = threading.Lock()     # one refresh() at a time
+        self._saving = threading.Lock()         # one save() at a time
+        self._version = 0                       # bumped by every patch, so save() knows if its copy is current
+        self._emb = None
+
+    @property
+    def emb(self):
+        """Dense encoder (process-wide; queries, plus papers missing from the index), loaded on first use."""
+        if self._emb is None:
+            self._emb = get_embedder()
+        return self._emb
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _current(self, fingerprint: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """The corpus fingerprint (or the one given), restricted to this store's papers."""
+        fingerprint = self.corpus.fingerprint() if fingerprint is None else fingerprint
+        return fingerprint if self.papers is None else {p: fp for p, fp in fingerprint.items() if self.papers(p)}
+
+    def _read_paper(self, pid: str) -> Optional[Dict]:
+        """
+        Everything needed to append one parsed paper, without touching the
+        store: its sentences and sections, their tokens, and its vectors
+        (loaded, or encoded and saved). None when it left the corpus.
+        """
+        head, raw = self.corpus.header(pid), self.corpus.get_raw(pid)
+        if head is None or raw is None:  # removed between listing and reading
+            return None
+        pairs = paper_sentences(json.loads(raw.decode("utf-8")))
+        sentences = [s for s, _ in pairs]
+        key = vectors_key(raw, MAX_SENT_PER_SECTION)
+        return {"source": head["source"], "sentences": sentences, "sections": [sec for _, sec in pairs],
+                "tokens": [_tokenize(s) for s in sentences], "key": key,
+                "vectors": _paper_vectors(self.vectors_dir, pid, raw, sentences, lambda: self.emb, key)}
+
+    def _append_paper(self, pid: str, paper: Dict) -> None:
+        """Appends a paper from _read_paper() to the table, BM25 and vectors (caller commits)."""
+        self.bm25.add(paper["tokens"])
+        self.table.append(paper["sentences"], paper["sections"], pid, paper["source"])
+        self._append_vectors(paper["vectors"])
+        self._sources.append(paper["source"])
+        self._counts.append(len(paper["sentences"]))
+        self._pids.append(pid)
+        self._keys.append(paper["key"])
+
+    def _commit(self) -> None:
+        """Flushes appends and recomputes BM25 / ANN state, so searches only read."""
+        self.table.commit()
+        self.bm25.commit()
+        if self.ann is not None:
+            self.ann.commit()
+
+    def _append_vectors(self, pv: PaperVectors) -> None:
+        self.vectors.append(pv)
+        if self.ann is not None and len(pv):
+            self.ann.add(_l2n(pv.rows(np.arange(len(pv)))))
+
+    def _remove_paper(self, pid: str) -> None:
+        i = self._pids.index(pid)
+        start = sum(self._counts[:i])
+        end = start + self._counts[i]
+        self.table.remove(start, end)
+        self.bm25.remove(start, end)
+        self.vectors.remove(i)
+        if self.ann is not None:
+            self.ann.remove(start, end)
+        del self._sources[i]
+        del self._counts[i]
+        del self._pids[i]
+        del self._keys[i]
+
+    def refresh(self, fingerprint: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Patches the store to match the corpus: removed and modified papers
+        are dropped, new and modified ones appended. BM25 statistics and
+        vectors are updated in place instead of rebuilding the whole store.
+        New papers are read and embedded while searches go on; only the
+        patch itself holds the write lock.
+        fingerprint: the corpus fingerprint when the caller already has it.
+        """
+        with self._refreshing:
+            t0 = time.perf_counter()
+            plan = self.plan_refresh(fingerprint)
+            if plan is None:
+                return {"added": 0, "removed": 0, "seconds": 0.0}
+            with self.lock.write():
+                patch = self.apply_refresh(plan)
+            return dict(patch, seconds=round(time.perf_counter() - t0, 3))
+
+    def plan_refresh(self, fingerprint: Optional[Dict[str, str]] = None) -> Optional[Dict]:
+        """
+        The slow half of refresh(), which leaves the store untouched: papers
+        to drop, and the new or modified papers read by _read_paper().
+        None when the store already matches the corpus.
+        """
+        current = self._current(fingerprint)
+        stale = [p for p, fp in self.fingerprint.items() if current.get(p) != fp]
+        fresh = [p for p, fp in current.items() if self.fingerprint.get(p) != fp]
+        if not stale and not fresh:
+            return None
+        return {"stale": stale, "fresh": [(pid, current[pid], self._read_paper(pid)) for pid in fresh]}
+
+    def apply_refresh(self, plan: Dict) -> Dict:
+        """Applies a plan_refresh() patch; the caller holds self.lock for writing."""
+        for pid in plan["stale"]:
+            self._remove_paper(pid)
+            del self.fingerprint[pid]
+        for pid, fp, paper in plan["fresh"]:
+            if paper is not None:
+                self._append_paper(pid, paper)
+                self.fingerprint[pid] = fp
+        self._commit()
+        self.generation = None
+        self._version += 1
+        return {"added": len(plan["fresh"]), "removed": len(plan["stale"])}
+
+    def approx_nbytes(self) -> int:
+        """Rough footprint of the sentence table and the BM25 index."""
+        return self.table.nbytes + self.bm25.nbytes
+
+    # ---- snapshots ----
+    def save(self, store_dir: Path) -> None:
+        """
+        Writes the table, BM25 index and vectors as a new snapshot
+        generation, then points current.json at it and drops older
+        generations (open memory maps of those stay valid until released).
+        The lock is only held to copy the store, so searches and refresh()
+        go on while the files are written. Unless a refresh patched the
+        store meanwhile, the in-memory vectors are then swapped for the
+        saved, memory-mapped copy.
+        """
+        store_dir = Path(store_dir)
+        with self._saving:
+            gen = f"{time.time_ns():x}"
+            with self.lock.read():
+                version, counts = self._version, list(self._counts)
+                table, bm25, vectors = self.table.copy(), self.bm25.copy(), self.vectors.copy()
+                manifest = {"signature": _snapshot_signature(), "generation": gen,
+                            "fingerprint": dict(self.fingerprint),
+                            "files": [{"name": n, "paper_id": p, "key": k, "count": c}
+                                      for n, p, k, c in zip(self._sources, self._pids, self._keys, self._counts)]}
+            table.save(store_dir / gen / "table")
+            bm25.save(store_dir / gen / "bm25")
+            vectors.save(store_dir / gen / "vectors")
+            mapped = EmbeddingIndex.load(store_dir / gen / "vectors", counts)   # same rows
+            tmp = store_dir / "current.json.tmp"
+            tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, store_dir / "current.json")
+            with self.lock.write():
+                if self._version == version:
+                    self.vectors = mapped
+                    self.generation = gen
+            for old in store_dir.iterdir():
+                if old.is_dir() and old.name != gen:
+                    shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, parsed_dir: Path, store_dir: Path, vectors_dir: Optional[Path] = None,
+             papers: Optional[Callable[[str], bool]] = None) -> Optional["SimpleStore"]:
+        """
+        Opens a snapshot written by save(), memory-mapped; None when there is
+        none or it was built with other settings. Call refresh() afterwards
+        to pick up every paper changed since.
+        """
+        t0 = time.perf_counter()
+        rss0 = _rss_bytes()
+        store_dir = Path(store_dir)
+        try:
+            manifest = json.loads((store_dir / "current.json").read_text(encoding="utf-8"))
+            if manifest.get("signature") != _snapshot_signature():
+                return None
+            gen = store_dir / manifest["generation"]
+            store = cls.__new__(cls)
+            store._setup(parsed_dir, vectors_dir, papers)
+            store.table = SentenceTable.load(gen / "table")
+            store.bm25 = BM25Index.load(gen / "bm25")
+            files = manifest["files"]
+            if len(store.table) != len(store.bm25) or len(store.table) != sum(f["count"] for f in files):
+                return None
+            vectors = EmbeddingIndex.load(gen / "vectors", [f["count"] for f in files])
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        for f, pv in zip(files, vectors.parts):
+            store._append_vectors(pv)
+            store._sources.append(f["name"])
+            store._counts.append(f["count"])
+            store._pids.append(f["paper_id"])
+            store._keys.append(f["key"])
+        store.fingerprint = dict(manifest["fingerprint"])
+        store._commit()
+        store.from_snapshot = True
+        store.generation = manifest["generation"]
+        store.build_seconds = time.perf_counter() - t0
+        store.build_rss_delta = max(0, _rss_bytes() - rss0)
+        return store
+
+    def stats(self, detailed: bool = False) -> Dict:
+        out = {
+            "parsed_dir": str(self.parsed_dir),
+            "papers": len(self.fingerprint),
+            "sentences": len(self.table),
+            "vector_bytes": self.vectors.nbytes,
+            "ann_bytes": self.ann.nbytes if self.ann is not None else 0,
+            "vector_dtype": settings.EMBED_INDEX_DTYPE,
+            "build_seconds": round(self.build_seconds, 3),
+            "from_snapshot": self.from_snapshot,
+            "build_rss_delta_bytes": self.build_rss_delta,
+            "rss_bytes": _rss_bytes(),
+        }
+        if detailed:
+            out["approx_bytes"] = self.approx_nbytes()
         return out
 
+    # ---- search ----
+    def _rows(self, paper_ids: Optional[List[str]]) -> Optional[np.ndarray]:
+        return None if paper_ids is None else self.table.rows_of(paper_ids)
+
+    def _ann_candidates(self, q_vec: np.ndarray, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine) of the ANN_TOPN dense neighbours of q_vec, kept to `rows` when given."""
+        idx, sims = self.ann.search(q_vec, settings.ANN_TOPN)
+        if rows is not None:
+            keep = np.isin(idx, rows)
+            idx, sims = idx[keep], sims[keep]
+        return idx, sims
+
+    def section_weights(self, idx: np.ndarray) -> np.ndarray:
+        """SECTION_WEIGHTS boost of rows idx (one weight per interned section name)."""
+        weights = np.array([SECTION_WEIGHTS.get(sec, 1.0) for sec in self.table.sections.values], dtype=np.float32)
+        return weights[self.table.section_ids(idx)]
+
+    def hit(self, i: int, score: float) -> Dict:
+        return {"text": self.table.get_text(i), "meta": self.table.get_meta(i), "score": float(score)}
+
+    def search(self, query: str, top_k: int = 6, paper_ids: Optional[List[str]] = None,
+               q_vec: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Top-k sentences for query, only from the papers in paper_ids when
+        given; each step is timed as a "search.*" stage (core.metrics).
+        q_vec: the query's embedding when the caller already encoded it.
+        """
+        with self.lock.read():
+            rows = self._rows(paper_ids)
+            if not len(self.table) or (rows is not None and not len(rows)):
+                return []
+
+            # 1) BM25 scores (only postings of the query terms are touched), top-N shortlist
+            with stage("search.bm25"):
+                scores, short_idx = _bm25_shortlist(self.bm25.get_scores(_tokenize(query)), rows)
+
+            # 2) Encode ONLY the query; shortlist vectors come from the index
+            if q_vec is None:
+                with stage("search.embed_query"):
+                    q_vec = self.emb.encode([query])[0]
+            q_vec = _l2n(q_vec)    # (d,)
+            if self.ann is not None:
+                # semantic candidates with no lexical overlap join the shortlist (BM25 score 0)
+                with stage("search.ann"):
+                    ann_idx, _ = self._ann_candidates(q_vec, rows)
+                    short_idx = np.concatenate([short_idx, ann_idx[~np.isin(ann_idx, short_idx)]])
+
+            # 3) Hybrid score + section weighting
+            with stage("search.hybrid"):
+                cand_vecs = _l2n(self.vectors.take(short_idx))  # (N, d)
+                hybrid = _hybrid(cand_vecs, q_vec, _bm25_normalized(scores[short_idx], float(scores.max())),
+                                 self.section_weights(short_idx))
+
+            # 4) MMR to diversify final k
+            with stage("search.mmr"):
+                chosen_local = mmr(cand_vecs, q_vec, k=int(top_k), lambda_=MMR_LAMBDA)
+            return [self.hit(int(short_idx[li]), hybrid[li]) for li in chosen_local]
+
+    def search_batch(self, queries: List[str], top_k: int = 6,
+                     paper_ids: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        search() for many queries: one result list per query, same shape.
+        Shared work is done once per batch (SEARCH_BATCH_CHUNK queries):
+        BM25 term postings are scored once for every query that uses them,
+        the queries are encoded in one forward pass, the union of the
+        shortlists is read from the vector index once, and MMR runs for all
+        queries together on padded candidate sets.
+        """
+        with self.lock.read():
+            out: List[List[Dict]] = []
+            rows = self._rows(paper_ids)
+            for start in range(0, len(queries), SEARCH_BATCH_CHUNK):
+                out.extend(self._search_chunk(queries[start:start + SEARCH_BATCH_CHUNK], top_k, rows))
+            return out
+
+    def _search_chunk(self, queries: List[str], top_k: int, rows: Optional[np.ndarray]) -> List[List[Dict]]:
+        if not len(self.table) or not queries or (rows is not None and not len(rows)):
+            return [[] for _ in queries]
+
+        with stage("search.embed_query"):
+            q_vecs = _l2n(self.emb.encode(list(queries)))    # (B, d), one forward pass
+
+        # BM25 row by row (shared term scores); keep only the scores the shortlist needs
+        shorts, bm25_short = [], []
+        score_rows = self.bm25.get_scores_batch([_tokenize(q) for q in queries])
+        for b in range(len(queries)):
+            with stage("search.bm25"):
+                scores, short_idx = _bm25_shortlist(next(score_rows), rows)
+            if self.ann is not None:
+                with stage("search.ann"):
+                    ann_idx, _ = self._ann_candidates(q_vecs[b], rows)
+                    short_idx = np.concatenate([short_idx, ann_idx[~np.isin(ann_idx, short_idx)]])
+            shorts.append(short_idx)
+            bm25_short.append(_bm25_normalized(scores[short_idx], float(scores.max())))
+
+        with stage("search.hybrid"):
+            # overlapping shortlists share one read of the vector index
+            union, inv = np.unique(np.concatenate(shorts), return_inverse=True)
+            union_vecs = _l2n(self.vectors.take(union))
+            n_max = max(len(s) for s in shorts)
+            cands = np.zeros((len(queries), n_max, union_vecs.shape[1]), dtype=union_vecs.dtype)
+            valid = np.zeros((len(queries), n_max), dtype=bool)
+            hybrids, pos = [], 0
+            for b, short_idx in enumerate(shorts):
+                n = len(short_idx)
+                cands[b, :n] = union_vecs[inv[pos:pos + n]]
+                valid[b, :n] = True
+                pos += n
+                hybrids.append(_hybrid(cands[b, :n], q_vecs[b], bm25_short[b], self.section_weights(short_idx)))
+
+        with stage("search.mmr"):
+            chosen = mmr(cands, q_vecs, k=int(top_k), lambda_=MMR_LAMBDA, valid=valid)
+        return [[self.hit(int(short_idx[li]), hybrid[li]) for li in picked]
+                for short_idx, hybrid, picked in zip(shorts, hybrids, chosen)]
+
+    def shortlist(self, tokens: List[str], q_vec: np.ndarray, idf: Optional[Dict[str, float]] = None,
+                  avgdl: Optional[float] = None, paper_ids: Optional[List[str]] = None,
+                  paper_rank: Optional[np.ndarray] = None) -> Dict:
+        """
+        This store's part of a sharded search (shards.ShardedStore): the
+        raw float32 BM25 scores of its TOPN_SHORTLIST best rows, scored with
+        the corpus-wide idf / avgdl, plus (ANN_ENABLED) its ANN_TOPN dense
+        neighbours with their cosine and BM25 scores. Rows are local; ties
+        at the cut go to the papers first in paper_rank (per interned
+        paper id: the corpus order), as they would in one store.
+        """
+        with self.lock.read():
+            rows = self._rows(paper_ids)
+            empty = np.zeros(0, dtype=np.int64)
+            out = {"max": -np.inf, "rows": empty, "scores": np.zeros(0, dtype=np.float32)}
+            if self.ann is not None:
+                out.update(ann_rows=empty, ann_sims=np.zeros(0, dtype=np.float32),
+                           ann_scores=np.zeros(0, dtype=np.float32))
+            if not len(self.table) or (rows is not None and not len(rows)):
+                return out
+            tie_key = None if paper_rank is None else lambda idx: paper_rank[self.table.papers_of(idx)]
+            scores, short_idx = _bm25_shortlist(self.bm25.get_scores(tokens, idf, avgdl), rows, tie_key)
+            out.update(max=float(scores.max()), rows=short_idx, scores=scores[short_idx])
+            if self.ann is not None:
+                ann_idx, sims = self._ann_candidates(q_vec, rows)
+                out.update(ann_rows=ann_idx, ann_sims=sims, ann_scores=scores[ann_idx])
+            return out
+
+
+# ======= persisted embeddings =======
+def _paper_vectors(vec_dir: Path, pid: str, raw: bytes, sentences: List[str], emb: Callable[[], object],
+                   key: Optional[str] = None) -> PaperVectors:
+    """
+    Loads a paper's embeddings from the index, encoding and saving them if
+    missing or stale; emb() returns the encoder and is only called then.
+    """
+    key = key or vectors_key(raw, MAX_SENT_PER_SECTION)
+    pv = load_paper_vectors(vec_dir, pid, key)
+    if pv is None:
+        vecs = emb().encode(sentences) if sentences else np.zeros((0, 0), dtype=np.float32)
+        save_paper_vectors(vec_dir, pid, vecs, key)
+        pv = load_paper_vectors(vec_dir, pid, key)
+    return pv
+
+def index_paper(corpus: Corpus, paper_id: str, vectors_dir: Path) -> int:
+    """
+    Ingest-time hook: embeds one parsed paper into the vector index
+    (no-op when already current). Returns the number of sentences.
+    """
+    raw = corpus.get_raw(paper_id)
+    if raw is None:
+        raise KeyError(f"paper {paper_id!r} is not in the corpus")
+    sentences = [s for s, _ in paper_sentences(json.loads(raw.decode("utf-8")))]
+    _paper_vectors(Path(vectors_dir), paper_id, raw, sentences, get_embedder)
+    return len(sentences)
+
+
+# ======= process-wide store =======
+_STORE: Optional[Union[SimpleStore, "ShardedStore"]] = None
+_STORE_LOCK = threading.Lock()   # guards _STORE, the check clock and the refresher; never held while refreshing
+_STORE_CHECKED_AT = 0.0
+_REFRESHER: Optional[threading.Thread] = None
+
+def _snapshot_dir(parsed_dir: Path) -> Path:
+    return shards_dir_for(parsed_dir) if settings.STORE_SHARDS > 1 else store_dir_for(parsed_dir)
+
+def _open_store(parsed_dir: Path) -> Union[SimpleStore, "ShardedStore"]:
+    """Snapshot (patched to match the corpus) when STORE_SNAPSHOT is on, else a fresh build."""
+    if settings.STORE_SHARDS > 1:
+        from .shards import open_sharded_store   # shards builds on this module
+        return open_sharded_store(parsed_dir, settings.STORE_SHARDS, settings.STORE_SNAPSHOT)
+    store_dir = store_dir_for(parsed_dir)
+    store = SimpleStore.load(parsed_dir, store_dir) if settings.STORE_SNAPSHOT else None
+    if store is None:
+        store = SimpleStore(parsed_dir)
+        changed = True
+    else:
+        patch = store.refresh()
+        changed = bool(patch["added"] or patch["removed"])
+    if settings.STORE_SNAPSHOT and changed:
+        store.save(store_dir)
+    return store
+
+class SnapshotSaver:
+    """
+    Saves store snapshots on a background thread, coalescing patches: the
+    first unsaved change schedules a save `delay` seconds later, and every
+    patch until then is written by that one save. A save rewrites the
+    whole store, so this bounds snapshot I/O to one per window however
+    many papers arrive in it.
+    """
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._pending: Optional[Tuple[Union[SimpleStore, "ShardedStore"], Path]] = None
+        self._due = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, store: Union[SimpleStore, "ShardedStore"], snapshot_dir: Path) -> None:
+        with self._cond:
+            if self._pending is None:
+                self._due = time.monotonic() + self.delay
+            self._pending = (store, Path(snapshot_dir))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="store-snapshot", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None or time.monotonic() < self._due:
+                    self._cond.wait(None if self._pending is None else self._due - time.monotonic())
+                job, self._pending = self._pending, None
+            self._save(job)
+
+    def flush(self) -> None:
+        """Writes a scheduled snapshot now (at shutdown, so no patch is left unsaved)."""
+        with self._cond:
+            job, self._pending = self._pending, None
+        if job is not None:
+            self._save(job)
+
+    @staticmethod
+    def _save(job: Tuple[Union[SimpleStore, "ShardedStore"], Path]) -> None:
+        store, snapshot_dir = job
+        try:
+            with stage("store.save"):
+                store.save(snapshot_dir)
+        except Exception as e:  # the store is fine; the next patch schedules another save
+            print(f"⚠️ Store snapshot failed: {e!r}")
+
+_SNAPSHOTS = SnapshotSaver(settings.STORE_SNAPSHOT_DELAY_SECONDS)
+
+def flush_snapshots() -> None:
+    """Saves the shared store now if a coalesced snapshot is still pending."""
+    _SNAPSHOTS.flush()
+
+def _refresh_store(store: Union[SimpleStore, "ShardedStore"]) -> Dict:
+    """
+    Patches the shared store to match the corpus and schedules a snapshot
+    if that changed anything. Runs without _STORE_LOCK: searches only wait
+    for the store's own write lock while the patch is applied.
+    """
+    with stage("store.refresh"):
+        patch = store.refresh()
+    if patch["added"] or patch["removed"]:
+        if settings.STORE_SNAPSHOT:
+            _SNAPSHOTS.schedule(store, _snapshot_dir(store.parsed_dir))
+        print(f"🔹 Store patched: {patch}")
+    return patch
+
+def _background_refresh(store: Union[SimpleStore, "ShardedStore"]) -> None:
+    try:
+        _refresh_store(store)
+    except Exception as e:  # the next check tries again
+        print(f"⚠️ Store refresh failed: {e!r}")
+
+def get_store(parsed_dir: Optional[Path] = None, reload: Optional[bool] = None) -> Union[SimpleStore, "ShardedStore"]:
+    """
+    Returns the shared SimpleStore, opening it on first use (from the
+    snapshot in data/index/store when there is one); a ShardedStore,
+    with the same search API, when STORE_SHARDS > 1.
+    With hot reload on, the corpus is re-checked at most every
+    STORE_RELOAD_CHECK_SECONDS by a background thread, which patches in
+    changed papers while this call returns the store as it is.
+    reload=True refreshes in the calling thread and returns once done.
+    """
+    global _STORE, _STORE_CHECKED_AT, _REFRESHER
+    parsed_dir = Path(parsed_dir) if parsed_dir else Path(settings.STORAGE_DIR) / "parsed"
+    hot = settings.STORE_HOT_RELOAD if reload is None else reload
+    with _STORE_LOCK:
+        if _STORE is None or _STORE.parsed_dir != parsed_dir:
+            with stage("store.open"):
+                _STORE = _open_store(parsed_dir)
+            _STORE_CHECKED_AT = time.monotonic()
+            print(f"🔹 Store {'loaded' if _STORE.from_snapshot else 'built'}: {_STORE.stats()}")
+            return _STORE
+        store = _STORE
+        due = hot and (reload or time.monotonic() - _STORE_CHECKED_AT >= settings.STORE_RELOAD_CHECK_SECONDS)
+        if due:
+            _STORE_CHECKED_AT = time.monotonic()
+        if due and not reload and (_REFRESHER is None or not _REFRESHER.is_alive()):
+            _REFRESHER = threading.Thread(target=_background_refresh, args=(store,), name="store-refresh",
+                                          daemon=True)
+            _REFRESHER.start()
+    if due and reload:
+        _refresh_store(store)   # store.refresh() waits for a background one still running
+    return store
+
+def peek_store() -> Optional[Union[SimpleStore, "ShardedStore"]]:
+    """The shared store if it has been built, without triggering a build."""
+    return _STORE
 
 def demo_store() -> SimpleStore:
-    return SimpleStore(Path("data/parsed"))
\ No newline at end of file
+    return get_store()
\ No newline at end of file
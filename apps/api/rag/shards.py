@@ -0,0 +1,602 @@
+"""
+Sharded store: the sentence index split by paper into SimpleStore shards,
+each with its own table, BM25 index and snapshot, searched by fanning the
+query out to the shards and merging their shortlists.
+
+Scores match the unsharded store: every shard scores BM25 with the
+corpus-wide IDF and average length (GlobalStats) instead of its own, and
+the merged shortlist is cut, normalized and ranked exactly as SimpleStore
+does it (ties in corpus order). With ANN_ENABLED each shard has its own
+IVF index, so the dense candidates can differ slightly from one index
+over everything.
+
+Papers are placed on shards by STORE_SHARD_BY:
+- "paper": each new paper goes to the shard with the fewest papers; adding
+  or removing a shard moves only as many papers as it takes to rebalance.
+- "hash": crc32(paper_id) modulo the shard count (stateless; adding or
+  removing a shard reshuffles most papers).
+The placement is kept in data/index/shards/shards.json next to one
+snapshot directory per shard, so a shard is rebuilt or patched on its
+own. A paper_ids filter only runs on the shards holding those papers.
+
+With SHARD_WORKERS > 1 and snapshots on, the per-shard BM25 / ANN work
+runs in worker processes (spawn), each pinned to a fixed set of shards
+that it memory-maps from their snapshots; per query only query terms and
+shortlists cross the process boundary (a shard's paper ranks are sent
+once, and again after a refresh changes them).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import shutil
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import stage
+from ..nlp.corpus import get_corpus
+from .embed import get_embedder
+from .retrieve import (MMR_LAMBDA, TOPN_SHORTLIST, SimpleStore, StoreLock, _bm25_normalized, _hybrid, _l2n,
+                       _rss_bytes, _snapshot_signature, _tokenize, bm25_idf, mmr, shards_dir_for)
+
+SHARD_BY = ("paper", "hash")
+
+
+class GlobalStats:
+    """
+    Corpus-wide BM25 statistics merged from the shards' doc_stats(): what
+    one BM25Index over every sentence would compute. Terms are ordered by
+    first occurrence in corpus (paper_id) order, so the average IDF used
+    for the negative-IDF floor is summed in the unsharded order too
+    (exactly so while each shard's rows are in paper_id order).
+
+    Terms get corpus-wide ids; a shard's vocabulary only grows, so its
+    local -> global id map is extended rather than rebuilt, and update()
+    is array work instead of a pass over every term.
+    """
+    def __init__(self):
+        self.terms: Dict[str, int] = {}          # term -> global id
+        self.idf = np.zeros(0, dtype=np.float64)  # by global id (0 = absent)
+        self.avgdl, self.n_docs = 0.0, 0
+        self._maps: Dict[str, Tuple[object, np.ndarray]] = {}   # shard -> (its BM25Index, local -> global id)
+
+    def _global_ids(self, name: str, shard: SimpleStore) -> np.ndarray:
+        bm25 = shard.bm25
+        cached = self._maps.get(name)
+        ids = cached[1] if cached is not None and cached[0] is bm25 else np.zeros(0, dtype=np.int64)
+        if len(ids) < len(bm25.vocab):
+            intern = self.terms.setdefault
+            new = itertools.islice(bm25.vocab, len(ids), None)
+            ids = np.concatenate([ids, np.fromiter((intern(w, len(self.terms)) for w in new), dtype=np.int64,
+                                                   count=len(bm25.vocab) - len(ids))])
+        self._maps[name] = (bm25, ids)
+        return ids
+
+    def update(self, shards: Dict[str, SimpleStore], paper_rank: Dict[str, np.ndarray]) -> None:
+        """Recomputes from every shard; paper_rank: per shard, corpus position of each interned paper id."""
+        self._maps = {n: m for n, m in self._maps.items() if n in shards}
+        parts, total, self.n_docs, epsilon = [], 0, 0, 0.25
+        for name, shard in shards.items():
+            n, length, present, df, first_doc = shard.bm25.doc_stats()
+            ids = self._global_ids(name, shard)
+            self.n_docs += n
+            total += length
+            epsilon = shard.bm25.epsilon
+            parts.append((ids[present], df, paper_rank[name][shard.table.papers_of(first_doc)], present))
+        self.avgdl = total / self.n_docs if self.n_docs else 0.0
+        self.idf = np.zeros(len(self.terms), dtype=np.float64)
+        if not parts or not self.n_docs:
+            return
+        gid, df, rank, pos = (np.concatenate(cols) for cols in zip(*parts))
+        df_all = np.bincount(gid, weights=df, minlength=len(self.terms)).astype(np.int64)
+        # each term's first occurrence: earliest paper, then earliest in that paper's shard vocabulary
+        by_first = np.lexsort((pos, rank))
+        terms, at = np.unique(gid[by_first], return_index=True)
+        first = by_first[at]
+        order = terms[np.lexsort((pos[first], rank[first]))]
+        self.idf[order] = bm25_idf(df_all[order], self.n_docs, epsilon)
+
+    def idf_for(self, tokens: List[str]) -> Dict[str, float]:
+        """The IDF of a query's terms (all a shard needs to score it)."""
+        out = {}
+        for w in tokens:
+            t = self.terms.get(w)
+            if t is not None and t < len(self.idf):
+                out[w] = float(self.idf[t])
+        return out
+
+
+# ======= worker processes =======
+_WORKER_STORES: Dict[str, Tuple[str, SimpleStore]] = {}   # shard dir -> (generation, store), per worker process
+_WORKER_RANKS: Dict[str, Tuple[int, np.ndarray]] = {}      # shard dir -> (version, paper ranks), sent when they change
+
+def _worker_shard(parsed_dir: str, vectors_dir: str, shard_dir: str, generation: str,
+                  n_rows: int) -> Optional[SimpleStore]:
+    """The shard snapshot at shard_dir, opened once per generation; None if it is not `generation`."""
+    cached = _WORKER_STORES.get(shard_dir)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    store = SimpleStore.load(Path(parsed_dir), Path(shard_dir), Path(vectors_dir))
+    if store is None or store.generation != generation or len(store) != n_rows:
+        return None
+    _WORKER_STORES[shard_dir] = (generation, store)
+    return store
+
+def _shard_shortlists(parsed_dir: str, vectors_dir: str, specs: List[Tuple], jobs: List[Tuple],
+                      avgdl: float) -> Dict[str, Optional[List[Dict]]]:
+    """
+    Worker side of the fan-out. specs: (name, shard dir, generation, rows,
+    paper_ids, rank version, paper ranks or None when this worker already
+    has that version) per shard; jobs: (tokens, query vector, idf) per query.
+    Returns name -> one SimpleStore.shortlist() per query, or None for a
+    shard whose snapshot or ranks moved on (the coordinator then scores it itself).
+    """
+    out = {}
+    for name, shard_dir, generation, n_rows, paper_ids, version, rank in specs:
+        if rank is not None:
+            _WORKER_RANKS[shard_dir] = (version, rank)
+        ranks = _WORKER_RANKS.get(shard_dir)
+        if ranks is None or ranks[0] != version:
+            out[name] = None
+            continue
+        shard = _worker_shard(parsed_dir, vectors_dir, shard_dir, generation, n_rows)
+        out[name] = None if shard is None else [shard.shortlist(tokens, q_vec, idf, avgdl, paper_ids, ranks[1])
+                                                for tokens, q_vec, idf in jobs]
+    return out
+
+
+# ======= sharded store =======
+class ShardedStore:
+    """
+    The store split into SimpleStore shards by paper (see module docstring).
+    Same search / search_batch / refresh / stats surface as SimpleStore.
+    Searches share self.lock; refresh() reads the changed papers first and
+    takes it alone only to patch the shards and the corpus-wide statistics,
+    so a search never mixes shards of two corpus versions.
+    """
+    def __init__(self, parsed_dir: Path, n_shards: int, vectors_dir: Optional[Path] = None,
+                 by: Optional[str] = None):
+        t0 = time.perf_counter()
+        rss0 = _rss_bytes()
+        self._setup(parsed_dir, vectors_dir, by)
+        for _ in range(max(1, int(n_shards))):
+            self.names.append(self._new_name())
+        self._place(self._corpus_fingerprint())
+        self.shards = {name: self._build_shard(name) for name in self.names}
+        self._update_stats()
+        self.build_seconds = time.perf_counter() - t0
+        self.build_rss_delta = max(0, _rss_bytes() - rss0)
+
+    def _setup(self, parsed_dir: Path, vectors_dir: Optional[Path], by: Optional[str]) -> None:
+        self.parsed_dir = Path(parsed_dir)
+        self.vectors_dir = vectors_dir
+        self.by = (by or settings.STORE_SHARD_BY).lower()
+        if self.by not in SHARD_BY:
+            raise ValueError(f"STORE_SHARD_BY={self.by!r}: expected one of {', '.join(SHARD_BY)}")
+        self.names: List[str] = []
+        self.shards: Dict[str, SimpleStore] = {}
+        self.assignment: Dict[str, str] = {}     # paper_id -> shard name
+        self.stats_global = GlobalStats()
+        self.snapshot_dir: Optional[Path] = None  # where save() last wrote / load() read the shards
+        self.from_snapshot = False
+        self._pools: List[ProcessPoolExecutor] = []
+        self._ranks_sent: Dict[ProcessPoolExecutor, Dict[str, int]] = {}   # pool -> shard -> rank version it has
+        self._pool_lock = threading.Lock()
+        self._rank: Dict[str, np.ndarray] = {}
+        self._rank_version = 0                   # bumped whenever _update_stats() recomputes self._rank
+        self.lock = StoreLock()
+        self._refreshing = threading.Lock()      # one refresh / add_shard / remove_shard at a time
+        self._saving = threading.Lock()          # one save() at a time
+        self._workers = self._resolve_workers()
+
+    def _corpus_fingerprint(self) -> Dict[str, str]:
+        return get_corpus(self.parsed_dir).fingerprint()
+
+    def _new_name(self) -> str:
+        used = [int(n[1:]) for n in self.names]
+        return f"s{max(used, default=-1) + 1:02d}"
+
+    def _build_shard(self, name: str) -> SimpleStore:
+        return SimpleStore(self.parsed_dir, self.vectors_dir, papers=lambda p, n=name: self.assignment.get(p) == n)
+
+    # ---- placement ----
+    def _hashed(self, pid: str) -> str:
+        return self.names[zlib.crc32(pid.encode("utf-8")) % len(self.names)]
+
+    def _place(self, pids) -> None:
+        """Assigns shards to papers that have none yet (in the order given)."""
+        counts = {n: 0 for n in self.names}
+        for s in self.assignment.values():
+            counts[s] += 1
+        for pid in pids:
+            if pid not in self.assignment:
+                s = self.assignment[pid] = self._hashed(pid) if self.by == "hash" else min(self.names, key=counts.get)
+                counts[s] += 1
+
+    def _rebalance(self) -> None:
+        """Re-places papers after the shard list changed, moving as few as the policy allows."""
+        pids = sorted(self.assignment)
+        if self.by == "hash":
+            self.assignment = {p: self._hashed(p) for p in pids}
+            return
+        cap = -(-len(pids) // len(self.names))   # ceil: no shard keeps more than its share
+        counts = {n: 0 for n in self.names}
+        homeless = []
+        for p in pids:
+            s = self.assignment[p]
+            if s in counts and counts[s] < cap:
+                counts[s] += 1
+            else:
+                homeless.append(p)
+        for p in homeless:
+            s = self.assignment[p] = min(self.names, key=counts.__getitem__)
+            counts[s] += 1
+
+    # ---- corpus-wide statistics ----
+    def _update_stats(self) -> None:
+        rank = {p: i for i, p in enumerate(sorted(self.assignment))}   # corpus order (Corpus.fingerprint)
+        self._rank = {name: np.array([rank.get(p, -1) for p in shard.table.papers.values], dtype=np.int64)
+                      for name, shard in self.shards.items()}
+        self._rank_version += 1
+        self.stats_global.update({n: self.shards[n] for n in self.names}, self._rank)
+
+    @property
+    def fingerprint(self) -> Dict[str, str]:
+        """paper_id -> content hash over all shards."""
+        return {p: fp for shard in self.shards.values() for p, fp in shard.fingerprint.items()}
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    # ---- keeping up with the corpus ----
+    def _plan_shards(self, fingerprint: Dict[str, str]) -> Dict[str, Dict]:
+        """shard name -> its plan_refresh() against the placement, for the shards with something to do."""
+        plans = {}
+        for name in self.names:
+            plan = self.shards[name].plan_refresh(fingerprint)
+            if plan is not None:
+                plans[name] = plan
+        return plans
+
+    def _patch_shards(self, plans: Dict[str, Dict]) -> Dict:
+        """Applies the shard plans (caller holds self.lock for writing)."""
+        added = removed = 0
+        for name, plan in plans.items():
+            with self.shards[name].lock.write():
+                patch = self.shards[name].apply_refresh(plan)
+            added += patch["added"]
+            removed += patch["removed"]
+        return {"added": added, "removed": removed, "shards": list(plans)}
+
+    def refresh(self, fingerprint: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Patches the shards to match the corpus: new papers are placed, then
+        only the shards that gained, lost or changed papers are touched.
+        Papers that moved between shards count as removed and added.
+        """
+        with self._refreshing:
+            t0 = time.perf_counter()
+            current = self._corpus_fingerprint() if fingerprint is None else fingerprint
+            # placement only gains new papers and loses removed ones here, which no search can find yet / anymore
+            self.assignment = {p: s for p, s in self.assignment.items() if p in current}
+            self._place(current)
+            plans = self._plan_shards(current)
+            if not plans:
+                return {"added": 0, "removed": 0, "seconds": 0.0}
+            with self.lock.write():
+                patch = self._patch_shards(plans)
+                self._update_stats()
+            return dict(patch, seconds=round(time.perf_counter() - t0, 3))
+
+    def add_shard(self) -> Dict:
+        """Adds an empty shard and rebalances papers onto it. Returns the new name and the patch."""
+        with self._refreshing, self.lock.write():
+            t0 = time.perf_counter()
+            name = self._new_name()
+            self.names.append(name)
+            self.shards[name] = self._build_shard(name)
+            self._rebalance()
+            patch = self._patch_shards(self._plan_shards(self._corpus_fingerprint()))
+            self._update_stats()
+            self._reset_pools()
+            return dict(patch, shard=name, seconds=round(time.perf_counter() - t0, 3))
+
+    def remove_shard(self, name: str) -> Dict:
+        """Drops a shard; its papers are placed on the remaining shards."""
+        if name not in self.shards:
+            raise KeyError(f"no shard {name!r}")
+        if len(self.names) == 1:
+            raise ValueError("cannot remove the last shard")
+        with self._refreshing, self.lock.write():
+            t0 = time.perf_counter()
+            self.names.remove(name)
+            del self.shards[name]
+            self._rebalance()
+            patch = self._patch_shards(self._plan_shards(self._corpus_fingerprint()))
+            self._update_stats()
+            self._reset_pools()
+            return dict(patch, shard=name, seconds=round(time.perf_counter() - t0, 3))
+
+    # ---- snapshots ----
+    def save(self, shards_dir: Path) -> None:
+        """
+        Writes a snapshot for every shard changed since it was last saved
+        (one directory per shard), then shards.json with the placement, and
+        drops directories of removed shards. Like SimpleStore.save, the
+        lock is only held to read the shard list and placement; a shard
+        patched meanwhile is reconciled by refresh() after load().
+        """
+        shards_dir = Path(shards_dir)
+        with self._saving:
+            shards_dir.mkdir(parents=True, exist_ok=True)
+            with self.lock.read():
+                shards = {name: self.shards[name] for name in self.names}
+                moved = self.snapshot_dir != shards_dir
+                manifest = {"signature": _snapshot_signature(), "by": self.by, "shards": list(self.names),
+                            "assignment": dict(self.assignment)}
+            for name, shard in shards.items():
+                if shard.generation is None or moved:
+                    shard.save(shards_dir / name)
+            tmp = shards_dir / "shards.json.tmp"
+            tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, shards_dir / "shards.json")
+            self.snapshot_dir = shards_dir
+            for old in shards_dir.iterdir():
+                if old.is_dir() and old.name not in shards:
+                    shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, parsed_dir: Path, shards_dir: Path, vectors_dir: Optional[Path] = None,
+             by: Optional[str] = None) -> Optional["ShardedStore"]:
+        """
+        Opens the shards saved by save(), memory-mapped; None when there is
+        no snapshot or it was built with other settings. A shard whose own
+        snapshot is missing or stale is rebuilt alone. Placement keeps the
+        saved STORE_SHARD_BY unless `by` is given. Call refresh() after.
+        """
+        t0 = time.perf_counter()
+        rss0 = _rss_bytes()
+        shards_dir = Path(shards_dir)
+        try:
+            manifest = json.loads((shards_dir / "shards.json").read_text(encoding="utf-8"))
+            if manifest.get("signature") != _snapshot_signature() or not manifest["shards"]:
+                return None
+            store = cls.__new__(cls)
+            store._setup(parsed_dir, vectors_dir, by or manifest.get("by"))
+            store.names = list(manifest["shards"])
+            store.assignment = {p: s for p, s in manifest["assignment"].items() if s in store.names}
+        except (OSError, ValueError, KeyError):
+            return None
+        for name in store.names:
+            predicate = lambda p, n=name: store.assignment.get(p) == n
+            shard = SimpleStore.load(store.parsed_dir, shards_dir / name, vectors_dir, papers=predicate)
+            store.shards[name] = shard if shard is not None else store._build_shard(name)
+        store.snapshot_dir = shards_dir
+        store.from_snapshot = True
+        store._update_stats()
+        store.build_seconds = time.perf_counter() - t0
+        store.build_rss_delta = max(0, _rss_bytes() - rss0)
+        return store
+
+    def stats(self, detailed: bool = False) -> Dict:
+        per_shard = [dict(self.shards[n].stats(detailed), name=n) for n in self.names]
+        out = {
+            "parsed_dir": str(self.parsed_dir),
+            "papers": sum(s["papers"] for s in per_shard),
+            "sentences": len(self),
+            "vector_bytes": sum(s["vector_bytes"] for s in per_shard),
+            "ann_bytes": sum(s["ann_bytes"] for s in per_shard),
+            "vector_dtype": settings.EMBED_INDEX_DTYPE,
+            "build_seconds": round(self.build_seconds, 3),
+            "from_snapshot": self.from_snapshot,
+            "build_rss_delta_bytes": self.build_rss_delta,
+            "rss_bytes": _rss_bytes(),
+            "shards": len(self.names),
+            "shard_by": self.by,
+            "shard_workers": self._workers,
+        }
+        if detailed:
+            out["approx_bytes"] = sum(s["approx_bytes"] for s in per_shard)
+            out["per_shard"] = [{k: s[k] for k in ("name", "papers", "sentences", "from_snapshot", "approx_bytes")}
+                                for s in per_shard]
+        return out
+
+    # ---- fan-out ----
+    def _resolve_workers(self) -> int:
+        workers = settings.SHARD_WORKERS
+        return workers if workers > 0 else os.cpu_count() or 1
+
+    def _reset_pools(self) -> None:
+        """Shuts the worker processes down; they are restarted (with the new shard layout) on demand."""
+        with self._pool_lock:
+            pools, self._pools = self._pools, []
+            self._ranks_sent = {}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        self._reset_pools()
+
+    def _get_pools(self) -> List[ProcessPoolExecutor]:
+        with self._pool_lock:
+            if not self._pools:
+                # spawn: never fork a parent that may hold torch threads; one process per pool pins shards to it
+                ctx = multiprocessing.get_context("spawn")
+                self._pools = [ProcessPoolExecutor(max_workers=1, mp_context=ctx)
+                               for _ in range(min(self._workers, len(self.names)))]
+            return self._pools
+
+    def start_workers(self) -> None:
+        """Starts the worker processes and has them open their shards, so the first query does not wait."""
+        names = [n for n in self.names if len(self.shards[n])]
+        if self._parallel(names):
+            self._fan_out(names, [], {n: None for n in names})
+
+    def _parallel(self, names: List[str]) -> bool:
+        """Worker processes only pay off for several shards, and can only open saved, unchanged ones."""
+        return (self._workers > 1 and len(names) > 1 and self.snapshot_dir is not None
+                and all(self.shards[n].generation is not None for n in names))
+
+    def _fan_out(self, names: List[str], jobs: List[Tuple], filters: Dict[str, Optional[List[str]]]
+                 ) -> Dict[str, List[Dict]]:
+        """name -> one shortlist per job, from worker processes when possible, else in-process."""
+        avgdl = self.stats_global.avgdl
+        out: Dict[str, Optional[List[Dict]]] = {}
+        if self._parallel(names):
+            pools = self._get_pools()
+            specs: List[List[Tuple]] = [[] for _ in pools]
+            vectors_dir = str(self.shards[names[0]].vectors_dir)
+            try:
+                # paper ranks only go to a worker when it lacks their current version; one process per
+                # pool runs its calls in order, so a call sent after the one carrying them finds them
+                with self._pool_lock:
+                    for name in names:
+                        shard, p = self.shards[name], self.names.index(name) % len(pools)
+                        sent = self._ranks_sent.setdefault(pools[p], {})
+                        rank = None if sent.get(name) == self._rank_version else self._rank[name]
+                        sent[name] = self._rank_version
+                        specs[p].append((name, str(self.snapshot_dir / name), shard.generation, len(shard),
+                                         filters[name], self._rank_version, rank))
+                    futures = [pool.submit(_shard_shortlists, str(self.parsed_dir), vectors_dir, spec, jobs, avgdl)
+                               for pool, spec in zip(pools, specs) if spec]
+                for f in futures:
+                    out.update(f.result())
+            except Exception as e:  # a worker died or could not start: keep answering in-process
+                print(f"⚠️ Shard workers failed ({e!r}); searching shards in-process")
+                self._reset_pools()
+                self._workers = 1
+                out = {}
+        for name in names:
+            if out.get(name) is None:
+                shard = self.shards[name]
+                out[name] = [shard.shortlist(tokens, q_vec, idf, avgdl, filters[name], self._rank[name])
+                             for tokens, q_vec, idf in jobs]
+        return out
+
+    # ---- search ----
+    def _targets(self, paper_ids: Optional[List[str]]) -> Tuple[List[str], Dict[str, Optional[List[str]]]]:
+        """Non-empty shards a query has to visit, and the paper filter for each."""
+        if paper_ids is None:
+            names = [n for n in self.names if len(self.shards[n])]
+            return names, {n: None for n in names}
+        filters: Dict[str, Optional[List[str]]] = {}
+        for pid in paper_ids:
+            name = self.assignment.get(pid)
+            if name is not None and pid in self.shards[name].fingerprint:
+                filters.setdefault(name, []).append(pid)
+        return [n for n in self.names if n in filters], filters
+
+    def _merge(self, parts: Dict[str, Dict], q_vec: np.ndarray, top_k: int) -> List[Dict]:
+        """
+        SimpleStore.search steps 1-4 over the shards' shortlists: global
+        top TOPN_SHORTLIST (ties in corpus order), ANN candidates appended,
+        then hybrid score and MMR on vectors read from the owning shards.
+        """
+        if not parts:
+            return []
+        names = list(parts)
+        top = max(p["max"] for p in parts.values())
+        if top == -np.inf:
+            return []
+        shard_of = np.concatenate([np.full(len(parts[n]["rows"]), i, dtype=np.int64) for i, n in enumerate(names)])
+        rows = np.concatenate([parts[n]["rows"] for n in names]).astype(np.int64)
+        scores = np.concatenate([parts[n]["scores"] for n in names]).astype(np.float32)
+        ranks = np.concatenate([self._rank[n][self.shards[n].table.papers_of(parts[n]["rows"])] for n in names])
+        keep = np.lexsort((rows, ranks, -scores))[:TOPN_SHORTLIST]
+        shard_of, rows, scores = shard_of[keep], rows[keep], scores[keep]
+
+        if settings.ANN_ENABLED and "ann_rows" in parts[names[0]]:
+            a_shard = np.concatenate([np.full(len(parts[n]["ann_rows"]), i, dtype=np.int64)
+                                      for i, n in enumerate(names)])
+            a_rows = np.concatenate([parts[n]["ann_rows"] for n in names]).astype(np.int64)
+            a_sims = np.concatenate([parts[n]["ann_sims"] for n in names])
+            a_scores = np.concatenate([parts[n]["ann_scores"] for n in names]).astype(np.float32)
+            a_ranks = np.concatenate([self._rank[n][self.shards[n].table.papers_of(parts[n]["ann_rows"])]
+                                      for n in names])
+            best = np.lexsort((a_rows, a_ranks, -a_sims))[:settings.ANN_TOPN]
+            a_shard, a_rows, a_scores = a_shard[best], a_rows[best], a_scores[best]
+            new = ~np.isin(a_shard * (1 << 40) + a_rows, shard_of * (1 << 40) + rows)
+            shard_of = np.concatenate([shard_of, a_shard[new]])
+            rows = np.concatenate([rows, a_rows[new]])
+            scores = np.concatenate([scores, a_scores[new]])
+
+        cand_vecs, weights = None, np.ones(len(rows), dtype=np.float32)
+        for i, name in enumerate(names):
+            at = np.flatnonzero(shard_of == i)
+            if len(at):
+                shard = self.shards[name]
+                vecs = shard.vectors.take(rows[at])
+                if cand_vecs is None:
+                    cand_vecs = np.empty((len(rows), vecs.shape[1]), dtype=vecs.dtype)
+                cand_vecs[at] = vecs
+                weights[at] = shard.section_weights(rows[at])
+        cand_vecs = _l2n(cand_vecs)
+        hybrid = _hybrid(cand_vecs, q_vec, _bm25_normalized(scores, float(top)), weights)
+        chosen = mmr(cand_vecs, q_vec, k=int(top_k), lambda_=MMR_LAMBDA)
+        return [self.shards[names[shard_of[li]]].hit(int(rows[li]), hybrid[li]) for li in chosen]
+
+    def _search(self, queries: List[str], q_vecs: np.ndarray, top_k: int,
+                paper_ids: Optional[List[str]]) -> List[List[Dict]]:
+        with self.lock.read():
+            names, filters = self._targets(paper_ids)
+            if not names:
+                return [[] for _ in queries]
+            tokens = [_tokenize(q) for q in queries]
+            jobs = [(t, v, self.stats_global.idf_for(t)) for t, v in zip(tokens, q_vecs)]
+            with stage("search.shards"):
+                parts = self._fan_out(names, jobs, filters)
+            with stage("search.merge"):
+                return [self._merge({n: parts[n][b] for n in names}, q_vecs[b], top_k)
+                        for b in range(len(queries))]
+
+    def search(self, query: str, top_k: int = 6, paper_ids: Optional[List[str]] = None,
+               q_vec: Optional[np.ndarray] = None) -> List[Dict]:
+        """Top-k sentences for query over every shard (or only those holding paper_ids); q_vec as for SimpleStore."""
+        if not len(self):
+            return []
+        if q_vec is None:
+            with stage("search.embed_query"):
+                q_vec = get_embedder().encode([query])[0]
+        return self._search([query], _l2n(q_vec)[None, :], top_k, paper_ids)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 6,
+                     paper_ids: Optional[List[str]] = None) -> List[List[Dict]]:
+        """search() for many queries: one forward pass to encode them and one fan-out for all."""
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+        with stage("search.embed_query"):
+            q_vecs = _l2n(get_embedder().encode(list(queries)))
+        return self._search(list(queries), q_vecs, top_k, paper_ids)
+
+
+def open_sharded_store(parsed_dir: Path, n_shards: int, snapshot: bool) -> ShardedStore:
+    """
+    The sharded store for parsed_dir: from its snapshot when `snapshot`
+    (patched to the corpus, with shards added or removed to reach
+    n_shards), else freshly built. Saves what changed.
+    """
+    shards_dir = shards_dir_for(parsed_dir)
+    store = ShardedStore.load(parsed_dir, shards_dir) if snapshot else None
+    if store is None:
+        store = ShardedStore(parsed_dir, n_shards)
+        changed = True
+    else:
+        patch = store.refresh()
+        changed = bool(patch["added"] or patch["removed"])
+        while len(store.names) < n_shards:
+            store.add_shard()
+            changed = True
+        while len(store.names) > n_shards:
+            store.remove_shard(store.names[-1])
+            changed = True
+    if snapshot and changed:
+        store.save(shards_dir)
+    store.start_workers()
+    return store
@@ -0,0 +1,148 @@
+from pathlib import Path
+import copy
+import json
+import sys
+from typing import Dict, List, Optional
+import numpy as np
+
+COLUMNS = ("text", "offsets", "paper", "section", "source")
+
+
+class _Pool:
+    """Interned strings: value <-> small integer id."""
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self.ids: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def intern(self, value: str) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.values) + sys.getsizeof(self.ids) + sum(sys.getsizeof(v) for v in self.values)
+
+
+class SentenceTable:
+    """
+    Columnar sentence store: all text in one UTF-8 buffer addressed by
+    offsets, and paper / section / source as interned int32 ids, so a
+    sentence costs a few bytes of bookkeeping instead of a str plus a dict.
+
+    Rows are appended per paper and sliced out per paper (like BM25Index);
+    appends are buffered and concatenated by commit() (or before the next
+    read); a table shared with other threads must be committed first.
+    Saved columns are plain .npy files and load memory-mapped.
+    """
+    def __init__(self):
+        self.text = np.zeros(0, dtype=np.uint8)
+        self.offsets = np.zeros(1, dtype=np.int64)   # row i -> text[offsets[i]:offsets[i+1]]
+        self.paper = np.zeros(0, dtype=np.int32)
+        self.section = np.zeros(0, dtype=np.int32)
+        self.source = np.zeros(0, dtype=np.int32)
+        self.papers, self.sections, self.sources = _Pool(), _Pool(), _Pool()
+        self._pending: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.paper) + sum(len(p[2]) for p in self._pending)
+
+    # ---- building ----
+    def append(self, sentences: List[str], sections: List[str], paper_id: str, source: str) -> None:
+        """Appends one paper's sentences (with their section names)."""
+        encoded = [s.encode("utf-8") for s in sentences]
+        lens = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        sec = np.fromiter((self.sections.intern(s) for s in sections), dtype=np.int32, count=len(sections))
+        self._pending.append((b"".join(encoded), lens, sec, self.papers.intern(paper_id), self.sources.intern(source)))
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        lens = np.concatenate([p[1] for p in pending])
+        self.text = np.concatenate([self.text, np.frombuffer(b"".join(p[0] for p in pending), dtype=np.uint8)])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(lens)])
+        self.section = np.concatenate([self.section] + [p[2] for p in pending])
+        self.paper = np.concatenate([self.paper] + [np.full(len(p[1]), p[3], np.int32) for p in pending])
+        self.source = np.concatenate([self.source] + [np.full(len(p[1]), p[4], np.int32) for p in pending])
+
+    def commit(self) -> None:
+        """Concatenates buffered appends, so reads no longer modify the table."""
+        self._flush()
+
+    def copy(self) -> "SentenceTable":
+        """
+        The committed table as it is now, for saving while this one keeps
+        changing: columns are shared (append / remove replace them, never
+        write into them), the string pools are copied.
+        """
+        self._flush()
+        t = copy.copy(self)
+        t.papers, t.sections, t.sources = _Pool(self.papers.values), _Pool(self.sections.values), _Pool(self.sources.values)
+        t._pending = []
+        return t
+
+    def remove(self, start: int, end: int) -> None:
+        """Drops rows [start, end); later rows shift down."""
+        self._flush()
+        a, b = int(self.offsets[start]), int(self.offsets[end])
+        self.text = np.concatenate([self.text[:a], self.text[b:]])
+        self.offsets = np.concatenate([self.offsets[:start], self.offsets[end:] - (b - a)])
+        for name in ("paper", "section", "source"):
+            col = getattr(self, name)
+            setattr(self, name, np.concatenate([col[:start], col[end:]]))
+
+    # ---- reading ----
+    def get_text(self, i: int) -> str:
+        self._flush()
+        return self.text[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def get_meta(self, i: int) -> Dict:
+        self._flush()
+        return {"paper_id": self.papers.values[self.paper[i]],
+                "section": self.sections.values[self.section[i]],
+                "source": self.sources.values[self.source[i]]}
+
+    def section_ids(self, idx: np.ndarray) -> np.ndarray:
+        self._flush()
+        return self.section[idx]
+
+    def papers_of(self, idx: np.ndarray) -> np.ndarray:
+        """Interned paper ids of rows idx (the strings are self.papers.values)."""
+        self._flush()
+        return self.paper[idx]
+
+    def rows_of(self, paper_ids) -> np.ndarray:
+        """Rows of the given papers, ascending (papers not in the table have none)."""
+        self._flush()
+        ids = [self.papers.ids[p] for p in paper_ids if p in self.papers.ids]
+        return np.flatnonzero(np.isin(self.paper, ids))
+
+    @property
+    def nbytes(self) -> int:
+        self._flush()
+        cols = sum(getattr(self, c).nbytes for c in COLUMNS)
+        return cols + self.papers.nbytes + self.sections.nbytes + self.sources.nbytes
+
+    # ---- persistence ----
+    def save(self, path: Path) -> None:
+        self._flush()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in COLUMNS:
+            with open(path / f"{name}.npy", "wb") as f:
+                np.save(f, getattr(self, name))
+        pools = {"papers": self.papers.values, "sections": self.sections.values, "sources": self.sources.values}
+        (path / "pools.json").write_text(json.dumps(pools, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "SentenceTable":
+        path = Path(path)
+        t = cls()
+        for name in COLUMNS:
+            setattr(t, name, np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None))
+        pools = json.loads((path / "pools.json").read_text(encoding="utf-8"))
+        t.papers, t.sections, t.sources = _Pool(pools["papers"]), _Pool(pools["sections"]), _Pool(pools["sources"])
+        return t
@@ -0,0 +1,200 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+
+from ..core.config import settings
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+# ======= keys & paths =======
+def vectors_dir_for(parsed_dir: Path) -> Path:
+    """Embeddings live next to data/parsed, in data/index/vectors."""
+    return Path(parsed_dir).parent / "index" / "vectors"
+
+def vectors_key(parsed_bytes: bytes, max_sent_per_section: int) -> str:
+    """
+    Identifies one paper's embeddings: parsed JSON content + everything that
+    changes which sentences are embedded or how.
+    """
+    h = hashlib.sha256()
+    h.update(f"{settings.HF_EMBED_MODEL}|{settings.EMBED_BACKEND}|{settings.EMBED_INDEX_DTYPE}|"
+             f"{max_sent_per_section}|".encode())
+    h.update(parsed_bytes)
+    return h.hexdigest()
+
+def _paths(vec_dir: Path, paper_id: str) -> Tuple[Path, Path, Path]:
+    return vec_dir / f"{paper_id}.npy", vec_dir / f"{paper_id}.scale.npy", vec_dir / f"{paper_id}.meta.json"
+
+def _atomic_save(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+# ======= quantization =======
+def _quantize(vecs: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    if dtype == "float32":
+        return vecs.astype(np.float32), None
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype == "int8":
+        # symmetric per-row scale; rows are unit-norm so precision loss is small
+        scale = np.abs(vecs).max(axis=1) / 127.0 if len(vecs) else np.zeros(0, np.float32)
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        q = np.clip(np.rint(vecs / scale[:, None]), -127, 127).astype(np.int8)
+        return q, scale
+    raise ValueError(f"EMBED_INDEX_DTYPE must be one of {VECTOR_DTYPES}, got {dtype!r}")
+
+# ======= per-paper files =======
+class PaperVectors:
+    """
+    One paper's sentence embeddings, rows in SimpleStore order: read into
+    memory from its own file, or a slice of a store snapshot's memory-mapped
+    matrix (EmbeddingIndex.load).
+    """
+    def __init__(self, data: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.data = data
+        self.scale = scale
+
+    def __len__(self) -> int:
+        return int(self.data.shape[0])
+
+    def rows(self, idx: np.ndarray) -> np.ndarray:
+        block = np.asarray(self.data[idx], dtype=np.float32)
+        if self.scale is not None:
+            block *= self.scale[idx][:, None]
+        return block
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0))
+
+def save_paper_vectors(vec_dir: Path, paper_id: str, vecs: np.ndarray, key: str) -> None:
+    vec_dir.mkdir(parents=True, exist_ok=True)
+    data, scale = _quantize(np.asarray(vecs, dtype=np.float32), settings.EMBED_INDEX_DTYPE)
+    data_p, scale_p, meta_p = _paths(vec_dir, paper_id)
+    _atomic_save(data_p, data)
+    if scale is not None:
+        _atomic_save(scale_p, scale)
+    elif scale_p.exists():
+        scale_p.unlink()
+    # meta is written last: its key is what marks the pair as valid
+    meta = {"key": key, "n": int(data.shape[0]), "dtype": settings.EMBED_INDEX_DTYPE}
+    tmp = meta_p.with_name(meta_p.name + ".tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, meta_p)
+
+def load_paper_vectors(vec_dir: Path, paper_id: str, key: str) -> Optional[PaperVectors]:
+    """
+    Reads a paper's embeddings into memory (the files are closed again, so
+    a large corpus does not hold one descriptor and mapping per paper);
+    None if missing, unreadable as .npy or stale. Other I/O errors raise.
+    """
+    data_p, scale_p, meta_p = _paths(vec_dir, paper_id)
+    try:
+        meta = json.loads(meta_p.read_text(encoding="utf-8"))
+        if meta.get("key") != key:
+            return None
+        data = np.load(data_p)
+        scale = np.load(scale_p) if meta.get("dtype") == "int8" else None
+    except (FileNotFoundError, ValueError):
+        return None
+    if data.shape[0] != meta.get("n"):
+        return None
+    return PaperVectors(data, scale)
+
+def remove_paper_vectors(vec_dir: Path, paper_id: str) -> None:
+    for p in _paths(vec_dir, paper_id):
+        if p.exists():
+            p.unlink()
+
+# ======= corpus-wide view =======
+class EmbeddingIndex:
+    """
+    Concatenation of per-paper matrices addressed by global sentence row,
+    without copying them into one array. save() writes them as one matrix
+    (plus per-row scales for int8), which load() memory-maps and slices back
+    into papers: one mapping for the whole store instead of one per paper.
+    """
+    def __init__(self):
+        self.parts: List[PaperVectors] = []
+        self._starts: List[int] = [0]
+        self.dim = 0
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def append(self, pv: PaperVectors) -> None:
+        if len(pv) and self.dim == 0:
+            self.dim = int(pv.data.shape[1])
+        self.parts.append(pv)
+        self._starts.append(self._starts[-1] + len(pv))
+
+    def remove(self, i: int) -> None:
+        """Drops the i-th paper; later rows shift down."""
+        del self.parts[i]
+        self._starts = [0]
+        for pv in self.parts:
+            self._starts.append(self._starts[-1] + len(pv))
+
+    def copy(self) -> "EmbeddingIndex":
+        """Same papers (the matrices are shared), unaffected by later append / remove."""
+        idx = EmbeddingIndex()
+        idx.parts, idx._starts, idx.dim = list(self.parts), list(self._starts), self.dim
+        return idx
+
+    def take(self, idx: np.ndarray) -> np.ndarray:
+        """float32 rows for global sentence indices, in the given order."""
+        idx = np.asarray(idx, dtype=np.int64)
+        out = np.empty((len(idx), self.dim), dtype=np.float32)
+        if len(idx) == 0:
+            return out
+        starts = np.asarray(self._starts, dtype=np.int64)
+        part = np.searchsorted(starts, idx, side="right") - 1
+        for p in np.unique(part):
+            sel = np.nonzero(part == p)[0]
+            out[sel] = self.parts[int(p)].rows(idx[sel] - starts[p])
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(pv.nbytes for pv in self.parts)
+
+    # ---- persistence ----
+    def save(self, path: Path) -> None:
+        """Writes all rows to path/data.npy (and path/scale.npy for int8), paper after paper."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        filled = [pv for pv in self.parts if len(pv)]
+        dtype = filled[0].data.dtype if filled else np.dtype(np.float32)
+        scaled = bool(filled) and filled[0].scale is not None
+        files = [("data", (len(self), self.dim), dtype)] + ([("scale", (len(self),), np.float32)] if scaled else [])
+        for name, shape, dt in files:
+            tmp = path / f"{name}.npy.tmp"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dt, shape=shape)
+            for pv, start in zip(self.parts, self._starts):
+                if len(pv):
+                    out[start:start + len(pv)] = pv.data if name == "data" else pv.scale
+            out.flush()
+            del out
+            os.replace(tmp, path / f"{name}.npy")
+        if not scaled and (path / "scale.npy").exists():
+            (path / "scale.npy").unlink()
+
+    @classmethod
+    def load(cls, path: Path, counts: List[int]) -> "EmbeddingIndex":
+        """Memory-maps what save() wrote, split into papers of counts rows each."""
+        path = Path(path)
+        data = np.load(path / "data.npy", mmap_mode="r")
+        scale = np.load(path / "scale.npy", mmap_mode="r") if (path / "scale.npy").exists() else None
+        if data.shape[0] != sum(counts):
+            raise ValueError(f"{path}: {data.shape[0]} rows, expected {sum(counts)}")
+        idx = cls()
+        start = 0
+        for n in counts:
+            idx.append(PaperVectors(data[start:start + n], None if scale is None else scale[start:start + n]))
+            start += n
+        return idx
@@ -1,19 +1,93 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from ..rag.retrieve import demo_store
+import time
+from typing import List, Optional
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from ..core.config import settings
+from ..core.inference import ExecutorSaturated, get_executor, get_query_executor
+from ..core.metrics import collect_timings, get_slow_log, mark_startup, rounded, stage
+from ..rag.embed import get_embedder
+from ..rag.retrieve import get_store
 from ..rag.evidence import select_evidence
 from ..rag.generate import answer_from_context
 router = APIRouter()
 class AskReq(BaseModel):
     query: str
     top_k: int = 6
-@router.post("")
-def ask(req: AskReq):
-    store = demo_store()
-    contexts = store.search(req.query, top_k=req.top_k)
+    paper_ids: Optional[List[str]] = None  # only search these papers (with shards, only the shards holding them)
+    timings: bool = False  # add a per-stage breakdown (ms) to the response
+class AskBatchReq(BaseModel):
+    queries: List[str] = Field(max_length=settings.ASK_BATCH_MAX_QUERIES)  # more is rejected with 422
+    top_k: int = 6
+    paper_ids: Optional[List[str]] = None
+    timings: bool = False
+def _answer(query: str, contexts):
     if not contexts:
         return {"answer": "No relevant evidence found.", "citations": [], "evidence": []}
-    evidence = select_evidence(contexts)
-    answer = answer_from_context(req.query, contexts)
+    with stage("evidence"):
+        evidence = select_evidence(contexts)
+    with stage("answer"):
+        answer = answer_from_context(query, contexts)
     citations = [{"source": c["meta"]["source"], "section": c["meta"]["section"]} for c in contexts]
     return {"answer": answer, "citations": citations, "evidence": evidence}
+def _encode_query(query: str) -> np.ndarray:
+    with stage("search.embed_query"):
+        return get_embedder().encode([query])[0]
+def _ask(req: AskReq, q_vec: np.ndarray):
+    store = get_store()
+    with stage("search"):
+        contexts = store.search(req.query, top_k=req.top_k, paper_ids=req.paper_ids, q_vec=q_vec)
+    return _answer(req.query, contexts)
+def _search_batch(req: AskBatchReq):
+    store = get_store()
+    with stage("search"):
+        return store.search_batch(req.queries, top_k=req.top_k, paper_ids=req.paper_ids)
+@router.post("")
+async def ask(req: AskReq):
+    t0 = time.perf_counter()
+    with collect_timings() as timings:
+        try:
+            # its own admitted job: concurrent queries merge into one forward pass (embed.MicroBatcher)
+            # instead of at most INFERENCE_WORKERS of them
+            q_vec = await get_query_executor().run(_encode_query, req.query, name="ask.embed")
+            out = await get_executor().run(_ask, req, q_vec, name="ask")
+        except ExecutorSaturated as e:
+            raise HTTPException(status_code=503, detail=f"inference is busy: {e}", headers={"Retry-After": "1"})
+    seconds = time.perf_counter() - t0
+    mark_startup("first_ask")  # time to first answered /ask, see /health
+    get_slow_log().record("ask", seconds, {"query": req.query, "top_k": req.top_k}, timings)
+    if req.timings:
+        out = dict(out, timings=rounded(dict(timings, total=seconds)))
+    return out
+@router.post("/batch")
+async def ask_batch(req: AskBatchReq):
+    """
+    Answers for several questions in one call, in order; retrieval runs as
+    one search_batch, then every answer is its own executor job, so /ask and
+    /summarize requests queued meanwhile are served between them. If the
+    pool turns a job away partway, the answers so far are returned and the
+    rest carry the error ("complete": false) instead of discarding the batch.
+    """
+    t0 = time.perf_counter()
+    results, busy = [], None
+    with collect_timings() as timings:
+        try:
+            found = await get_executor().run(_search_batch, req, name="ask_batch")
+        except ExecutorSaturated as e:
+            raise HTTPException(status_code=503, detail=f"inference is busy: {e}", headers={"Retry-After": "1"})
+        for q, contexts in zip(req.queries, found):
+            if busy is None:
+                try:
+                    results.append(await get_executor().run(_answer, q, contexts, name="ask_batch"))
+                    continue
+                except ExecutorSaturated as e:
+                    busy = f"inference is busy: {e}"
+            results.append({"answer": None, "citations": [], "evidence": [], "error": busy})
+    out = {"results": results, "complete": busy is None}
+    if req.timings:  # not in the slow-query log: a batch is as slow as its size
+        out["timings"] = rounded(dict(timings, total=time.perf_counter() - t0))
+    return out
+
+@router.get("/store")
+def store_stats():
+    return get_store().stats(detailed=True)
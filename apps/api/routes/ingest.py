@@ -1,18 +1,43 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pathlib import Path
-import json
+from typing import Optional
 from ..core.config import settings
-from ..nlp.parse_pdf import parse_pdf_to_sections
+from ..core.jobs import JobManager, JobQueueFull
+from ..core.metrics import collect_timings, rounded, stage
+from ..nlp.ingest import ingest_pdfs
 router = APIRouter()
-@router.post("")
-def ingest_all():
+jobs = JobManager(maxsize=settings.INGEST_QUEUE_SIZE, history=settings.INGEST_JOB_HISTORY)
+
+def _run_ingest(update, force: bool, workers: Optional[int]):
+    from ..rag.retrieve import get_store, peek_store
     pdf_dir = Path(settings.STORAGE_DIR) / "pdfs"
     out_dir = Path(settings.STORAGE_DIR) / "parsed"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    count = 0
-    for pdf in pdf_dir.glob("*.pdf"):
-        parsed = parse_pdf_to_sections(pdf)
-        with open(out_dir / f"{pdf.stem}.json", "w", encoding="utf-8") as f:
-            json.dump(parsed, f, ensure_ascii=False)
-        count += 1
-    return {"ok": True, "parsed": count}
+    with collect_timings() as timings:
+        with stage("ingest"):
+            result = ingest_pdfs(pdf_dir, out_dir, force=force, workers=workers, progress=update)
+        if peek_store() is not None:
+            with stage("ingest.store_reload"):
+                get_store(reload=True)  # patch the live store now instead of on the next poll
+    return dict(result, timings=rounded(timings))
+
+@router.post("", status_code=202)
+def ingest_all(force: bool = False, workers: Optional[int] = None):
+    """Queues a background ingest of data/pdfs; poll GET /ingest/{job_id}."""
+    key = f"ingest|force={force}|workers={workers}"
+    try:
+        job, created = jobs.submit(key, lambda update: _run_ingest(update, force, workers),
+                                   params={"force": force, "workers": workers})
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"ingest queue is full: {e}")
+    return {"job_id": job["job_id"], "status": job["status"], "deduplicated": not created}
+
+@router.get("")
+def list_jobs():
+    return {"jobs": jobs.recent()}
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
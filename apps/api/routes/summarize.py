@@ -1,21 +1,64 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from pathlib import Path
 import json
+import time
+from ..core.cache import get_cache
 from ..core.config import settings
-from ..rag.generate import answer_from_context
+from ..core.inference import ExecutorSaturated, get_executor
+from ..core.metrics import collect_timings, get_slow_log, rounded
+from ..nlp.corpus import get_corpus
+from ..rag.generate import stream_summarize_parsed_paper, summarize_parsed_paper
 router = APIRouter()
 class SumReq(BaseModel):
     paper_id: str
     mode: str = "expert"
+    timings: bool = False  # add a per-stage breakdown (ms) to the response
 @router.post("")
-def summarize(req: SumReq):
-    parsed_file = Path(settings.STORAGE_DIR) / "parsed" / f"{req.paper_id}.json"
-    if not parsed_file.exists():
+async def summarize(req: SumReq):
+    if not get_corpus(Path(settings.STORAGE_DIR) / "parsed").has(req.paper_id):
         return {"error":"paper not found"}
-    j = json.loads(parsed_file.read_text(encoding="utf-8"))
-    sections = j.get("sections", [])
-    ctxs = [{"text": s["text"], "meta": {"source": parsed_file.name, "section": s["name"]}} for s in sections]
-    q = f"Summarize this paper for a {'researcher' if req.mode=='expert' else 'patient'}."
-    answer = answer_from_context(q, ctxs)
-    return {"summary": answer, "paper_id": req.paper_id, "mode": req.mode}
+    t0 = time.perf_counter()
+    with collect_timings() as timings:
+        try:
+            summary, cached = await get_executor().run(summarize_parsed_paper, req.paper_id, req.mode, name="summarize")
+        except ExecutorSaturated as e:
+            raise HTTPException(status_code=503, detail=f"inference is busy: {e}", headers={"Retry-After": "1"})
+    seconds = time.perf_counter() - t0
+    get_slow_log().record("summarize", seconds, {"paper_id": req.paper_id, "mode": req.mode, "cached": cached}, timings)
+    out = {"summary": summary, "paper_id": req.paper_id, "mode": req.mode, "cached": cached}
+    if req.timings:
+        out["timings"] = rounded(dict(timings, total=seconds))
+    return out
+@router.get("/stream")
+async def summarize_stream(paper_id: str, mode: str = "expert", timings: bool = False):
+    """
+    Server-sent events: one "chunk" event per chunk summary as it is produced,
+    then a "done" event whose "summary" is the final text (see stream_summarize_paper),
+    with a per-stage "timings" breakdown when asked for.
+    """
+    if not get_corpus(Path(settings.STORAGE_DIR) / "parsed").has(paper_id):
+        return {"error":"paper not found"}
+    t0 = time.perf_counter()
+    with collect_timings() as stages:  # the worker runs in a copy of this context
+        try:
+            stream = get_executor().stream(stream_summarize_parsed_paper, paper_id, mode, name="summarize_stream")
+        except ExecutorSaturated as e:
+            raise HTTPException(status_code=503, detail=f"inference is busy: {e}", headers={"Retry-After": "1"})
+    async def events():
+        async for ev in stream:
+            data = dict(ev, paper_id=paper_id, mode=mode)
+            if ev["event"] == "done":
+                seconds = time.perf_counter() - t0
+                get_slow_log().record("summarize_stream", seconds,
+                                      {"paper_id": paper_id, "mode": mode, "cached": ev.get("cached")}, stages)
+                if timings:
+                    data["timings"] = rounded(dict(stages, total=seconds))
+            yield f"event: {ev['event']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+@router.get("/cache")
+def cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
@@ -1,11 +1,44 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
+from typing import Dict, List
 from ..core.config import settings
+from ..core.metrics import stage
+from ..nlp.uploads import InvalidUploadName, PdfUpload, UploadTooLarge
 router = APIRouter()
+
+async def _store(file: UploadFile) -> Dict:
+    """Streams one upload to disk in UPLOAD_CHUNK_KB pieces; file I/O runs in the threadpool."""
+    up = await run_in_threadpool(PdfUpload, Path(settings.STORAGE_DIR) / "pdfs", Path(settings.STORAGE_DIR) / "parsed",
+                                 file.filename, int(settings.UPLOAD_MAX_MB * 2**20))
+    try:
+        with stage("upload.write"):
+            while chunk := await file.read(settings.UPLOAD_CHUNK_KB * 1024):
+                await run_in_threadpool(up.write, chunk)
+        with stage("upload.commit"):  # hash lookup for dedup + rename
+            return await run_in_threadpool(up.commit)
+    finally:
+        await run_in_threadpool(up.abort)
+
 @router.post("")
 async def upload_pdf(file: UploadFile = File(...)):
-    dest = Path(settings.STORAGE_DIR) / "pdfs" / file.filename
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with dest.open("wb") as f:
-        f.write(await file.read())
-    return {"ok": True, "stored_as": str(dest)}
+    try:
+        return await _store(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUploadName as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """Stores several PDFs; one result per file, a file over the limit or badly named does not fail the others."""
+    results = []
+    for file in files:
+        try:
+            results.append(await _store(file))
+        except (UploadTooLarge, InvalidUploadName) as e:
+            results.append({"ok": False, "filename": file.filename, "error": str(e)})
+    return {"ok": all(r["ok"] for r in results), "files": results,
+            "stored": sum(r["ok"] and r["duplicate_of"] is None for r in results),
+            "duplicates": sum(r["ok"] and r["duplicate_of"] is not None for r in results),
+            "rejected": sum(not r["ok"] for r in results)}
@@ -1,10 +1,12 @@
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
-import streamlit as st, json
-from apps.api.nlp.parse_pdf import parse_pdf_to_sections
-from apps.api.rag.retrieve import SimpleStore
-from apps.api.rag.generate import summarize_paper
+import streamlit as st
+from apps.api.nlp.ingest import ingest_pdfs
+from apps.api.nlp.uploads import InvalidUploadName, UploadTooLarge, store_pdf
+from apps.api.rag.retrieve import get_store, peek_store
+from apps.api.nlp.corpus import get_corpus
+from apps.api.rag.generate import stream_summarize_parsed_paper, answer_from_context
 from apps.api.core.config import settings
 
 st.set_page_config(page_title="Medical Research Summarizer (HF)", page_icon="🧪", layout="wide")
@@ -16,34 +18,43 @@ with st.sidebar:
     st.write("Embed model:", settings.HF_EMBED_MODEL)
     st.write("Summarizer model:", settings.HF_SUMMARIZER_MODEL)
     st.write("Storage:", settings.STORAGE_DIR)
+    store = peek_store()
+    if store:
+        s = store.stats()
+        st.caption(f"Store: {s['sentences']} sentences from {s['papers']} papers, "
+                   f"built in {s['build_seconds']}s, RSS {s['rss_bytes'] / 2**20:.0f} MiB")
 
 # Upload
 st.subheader("1) Upload PDFs")
 files = st.file_uploader("Drag & drop PDFs", type=["pdf"], accept_multiple_files=True)
 if files:
-    out_dir = Path(settings.STORAGE_DIR) / "pdfs"; out_dir.mkdir(parents=True, exist_ok=True)
-    for f in files: (out_dir / f.name).write_bytes(f.read())
-    st.success(f"Uploaded {len(files)} file(s).")
+    out_dir = Path(settings.STORAGE_DIR) / "pdfs"
+    chunk = settings.UPLOAD_CHUNK_KB * 1024
+    stored, dupes = 0, []
+    for f in files:
+        try:
+            r = store_pdf(iter(lambda: f.read(chunk), b""), f.name, out_dir, Path(settings.STORAGE_DIR) / "parsed",
+                          int(settings.UPLOAD_MAX_MB * 2**20))
+        except (UploadTooLarge, InvalidUploadName) as e:
+            st.error(str(e)); continue
+        if r["duplicate_of"] not in (None, f.name): dupes.append(f"{f.name} → {r['duplicate_of']}")
+        else: stored += 1
+    st.success(f"Uploaded {stored} file(s).")
+    if dupes: st.info("Already in the library (same content): " + ", ".join(dupes))
 
 # Ingest
 st.subheader("2) Parse / Refresh")
 if st.button("Parse now"):
-    pdf_dir = Path(settings.STORAGE_DIR) / "pdfs"
-    out_dir = Path(settings.STORAGE_DIR) / "parsed"; out_dir.mkdir(parents=True, exist_ok=True)
-    n=0
-    for pdf in pdf_dir.glob("*.pdf"):
-        parsed = parse_pdf_to_sections(pdf)
-        (out_dir / f"{pdf.stem}.json").write_text(json.dumps(parsed, ensure_ascii=False), encoding="utf-8"); n+=1
-    st.success(f"Ingested {n} file(s).")
+    rep = ingest_pdfs(Path(settings.STORAGE_DIR) / "pdfs", Path(settings.STORAGE_DIR) / "parsed")
+    st.success(f"Ingested {rep['parsed']} new/changed file(s), {rep['unchanged']} unchanged, {rep['removed']} removed, {rep['duplicates']} duplicate(s).")
 
 parsed_dir = Path(settings.STORAGE_DIR) / "parsed"
-papers = sorted(parsed_dir.glob("*.json"))
+papers = get_corpus(parsed_dir).list()  # headers only, no text
 with st.expander(" Library", expanded=True):
     if not papers: st.info("No parsed papers yet.")
     else:
         for p in papers:
-            j=json.loads(p.read_text(encoding="utf-8"))
-            st.markdown(f"- **{j.get('title', p.stem)}** — `paper_id`: `{j.get('paper_id', p.stem)}` — sections: {len(j.get('sections', []))}")
+            st.markdown(f"- **{p['title']}** — `paper_id`: `{p['paper_id']}` — sections: {p['n_sections']}")
 
 st.divider()
 
@@ -53,10 +64,10 @@ q = st.text_input("Your question", placeholder="What is the main conclusion?")
 k = st.slider("Max evidence chunks", 2, 10, 6)
 if st.button("Get answer", type="primary") and q:
     with st.status("Working...", expanded=True):
-        store = SimpleStore(parsed_dir); ctxs = store.search(q, top_k=k)
+        store = get_store(parsed_dir); ctxs = store.search(q, top_k=k)
         if not ctxs: st.error("No relevant evidence found.")
         else:
-            ans = summarize_paper(q, ctxs)
+            ans = answer_from_context(q, ctxs)
             st.markdown("###  Answer"); st.write(ans)
             with st.expander(" Evidence & Citations"):
                 for i,c in enumerate(ctxs,1):
@@ -67,15 +78,22 @@ st.divider()
 
 # Summarize
 st.subheader("4) Summarize a paper")
-ids=[p.stem for p in papers]
+ids=[p["paper_id"] for p in papers]
 if ids:
     chosen = st.selectbox("Choose paper_id", ids, index=0)
     mode = st.radio("Audience", ["expert","patient"], horizontal=True)
     if st.button("Summarize"):
-        j=json.loads((parsed_dir/f"{chosen}.json").read_text(encoding="utf-8"))
-        ctxs=[{"text":s["text"],"meta":{"source":f"{chosen}.json","section":s["name"]}} for s in j.get("sections",[])]
-        prompt=f"Summarize this paper for a {'researcher' if mode=='expert' else 'patient'}."
-        summ = summarize_paper(prompt, ctxs)
-        st.markdown("###  Summary"); st.write(summ)
+        st.markdown("###  Summary")
+        box, note = st.empty(), st.empty()
+        parts = []
+        with st.spinner("Summarizing..."):
+            for ev in stream_summarize_parsed_paper(chosen, mode, parsed_dir):
+                if ev["event"] == "chunk":
+                    parts.append(ev["text"]); box.markdown(" ".join(parts) + " ▌")
+                    note.caption(f"{len(parts)} chunk(s) so far")
+                else:
+                    box.markdown(ev["summary"])
+                    note.caption("From summary cache" if ev["cached"] else
+                                 f"First chunk in {ev['time_to_first_chunk']}s, done in {ev['seconds']}s")
 else:
     st.info("No papers to summarize yet.")
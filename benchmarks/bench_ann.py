@@ -0,0 +1,76 @@
+"""
+ANN benchmark: recall and latency of rag.ann.IVFIndex against exact
+(brute-force) cosine search over synthetic clustered unit vectors.
+
+    python -m benchmarks.bench_ann [--sizes 10000 100000] [--topn 100] [--nprobe 1 2 4 8 16 32]
+
+recall@topn = |IVF top-n ∩ exact top-n| / topn, averaged over queries.
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from apps.api.rag.ann import IVFIndex
+
+
+def clustered_vectors(n: int, dim: int = 384, clusters: int = 200, spread: float = 0.6, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    v = centres[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def run(sizes: List[int], topn: int = 100, nprobes: List[int] = (1, 2, 4, 8, 16, 32), n_queries: int = 50) -> List[dict]:
+    rows = []
+    for n in sizes:
+        x = clustered_vectors(n)
+        qs = clustered_vectors(n_queries, seed=1)
+        t0 = time.perf_counter()
+        ivf = IVFIndex(min_train=0)
+        ivf.add(x)
+        ivf.commit()
+        build_s = time.perf_counter() - t0
+
+        exact, t_exact = [], []
+        for q in qs:
+            t0 = time.perf_counter()
+            sims = x @ q
+            top = np.argpartition(-sims, topn - 1)[:topn]
+            t_exact.append(time.perf_counter() - t0)
+            exact.append(set(top.tolist()))
+        base = {"n": n, "nlist": len(ivf.centroids), "build_s": round(build_s, 3),
+                "exact_p50_ms": round(statistics.median(t_exact) * 1e3, 3)}
+        for nprobe in nprobes:
+            rec, t_ann = [], []
+            for q, ex in zip(qs, exact):
+                t0 = time.perf_counter()
+                ids, _ = ivf.search(q, topn, nprobe=nprobe)
+                t_ann.append(time.perf_counter() - t0)
+                rec.append(len(ex & set(ids.tolist())) / topn)
+            row = dict(base, nprobe=nprobe, recall=round(float(np.mean(rec)), 4),
+                       ivf_p50_ms=round(statistics.median(t_ann) * 1e3, 3))
+            rows.append(row)
+            print(row, flush=True)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--topn", type=int, default=100)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+    rows = run(args.sizes, args.topn, args.nprobe)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
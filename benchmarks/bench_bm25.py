@@ -0,0 +1,103 @@
+"""
+BM25 benchmark: retrieve.BM25Index vs rank_bm25.BM25Okapi on a synthetic
+Zipf-distributed sentence corpus.
+
+    python -m benchmarks.bench_bm25 [--sizes 10000 100000 1000000] [--queries 20]
+
+For each size: build time, top-250 query latency (p50), index save/load
+time, and whether all scores are bit-identical to rank_bm25.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from apps.api.rag.retrieve import BM25Index, TOPN_SHORTLIST, _top_n
+
+
+def synthetic_corpus(n_docs: int, vocab: int = 50000, mean_len: int = 18, seed: int = 0) -> List[List[str]]:
+    """Tokenized sentences with a Zipfian term distribution (like real text)."""
+    rng = np.random.default_rng(seed)
+    lens = np.clip(rng.poisson(mean_len, n_docs), 1, None)
+    ids = np.minimum(rng.zipf(1.2, int(lens.sum())), vocab) - 1
+    words = [f"w{i}" for i in range(vocab)]
+    out, pos = [], 0
+    for n in lens:
+        out.append([words[i] for i in ids[pos:pos + n]])
+        pos += n
+    return out
+
+
+def synthetic_queries(n: int, vocab: int = 50000, seed: int = 1) -> List[List[str]]:
+    rng = np.random.default_rng(seed)
+    return [[f"w{i}" for i in np.minimum(rng.zipf(1.1, rng.integers(2, 7)), vocab) - 1] for _ in range(n)]
+
+
+def _p50_ms(fn, queries) -> float:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    return round(statistics.median(times) * 1e3, 3)
+
+
+def run(sizes: List[int], n_queries: int = 20, reference_max: int = 1_000_000) -> List[dict]:
+    queries = synthetic_queries(n_queries)
+    rows = []
+    for n in sizes:
+        corpus = synthetic_corpus(n)
+        row = {"sentences": n}
+
+        t0 = time.perf_counter()
+        idx = BM25Index()
+        idx.add(corpus)
+        idx.commit()
+        idx._postings_view()
+        row["native_build_s"] = round(time.perf_counter() - t0, 3)
+        row["native_query_p50_ms"] = _p50_ms(lambda q: idx.top_n(q, TOPN_SHORTLIST), queries)
+        row["native_index_mb"] = round(idx.nbytes / 2**20, 1)
+
+        with tempfile.TemporaryDirectory() as d:
+            t0 = time.perf_counter()
+            idx.save(d)
+            row["save_s"] = round(time.perf_counter() - t0, 3)
+            t0 = time.perf_counter()
+            BM25Index.load(d)
+            row["load_s"] = round(time.perf_counter() - t0, 3)
+
+        if n <= reference_max:
+            from rank_bm25 import BM25Okapi
+            t0 = time.perf_counter()
+            ref = BM25Okapi(corpus)
+            row["rank_bm25_build_s"] = round(time.perf_counter() - t0, 3)
+            row["rank_bm25_query_p50_ms"] = _p50_ms(lambda q: np.argsort(-ref.get_scores(q))[:TOPN_SHORTLIST], queries)
+            row["identical_scores"] = all(np.array_equal(ref.get_scores(q), idx.get_scores(q)) for q in queries)
+            row["same_top_n"] = all(
+                set(_top_n(ref.get_scores(q), TOPN_SHORTLIST)) == set(idx.top_n(q, TOPN_SHORTLIST)[0]) for q in queries)
+            row["query_speedup"] = round(row["rank_bm25_query_p50_ms"] / max(row["native_query_p50_ms"], 1e-6), 1)
+        rows.append(row)
+        print(row, flush=True)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--reference-max", type=int, default=1_000_000,
+                    help="skip rank_bm25 above this many sentences (it is slow and memory hungry)")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+    rows = run(args.sizes, args.queries, args.reference_max)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cold start: time from a fresh Python process to the first answered /ask,
+for each model backend, with and without the startup warm-up.
+
+    python -m benchmarks.bench_cold_start [--backends torch int8 onnx] [--papers 200] [--repeat 3]
+
+Every run is a new interpreter (nothing cached in memory, the OS file
+cache warm after the first). It imports apps.api.main, starts the app
+(the lifespan runs warm-up and store preload), then sends two /ask
+requests. The corpus is synthetic (benchmarks.synthetic) and the models
+are the real ones from settings, so they have to be downloaded already.
+Reported per configuration (medians):
+
+    import_s       importing apps.api.main, and which heavy modules it pulled in
+    startup_s      lifespan: warm-up + store build
+    first_ask_s    the first /ask request itself
+    second_ask_s   the next one, for comparison
+    to_first_ask_s import start -> first answer (what a user waits after a deploy)
+    process_s      the whole child process, interpreter start-up included
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .synthetic import SyntheticCorpus, write_corpus
+
+HEAVY = ("torch", "transformers", "sentence_transformers", "fitz")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from apps.api.main import app
+t_import = time.perf_counter()
+heavy = [m for m in %(heavy)r if m in sys.modules]
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    t_ready = time.perf_counter()
+    r1 = client.post("/ask", json={"query": %(query)r})
+    t_first = time.perf_counter()
+    r2 = client.post("/ask", json={"query": %(query)r + " outcome"})
+    t_second = time.perf_counter()
+print(json.dumps({"import_s": t_import - t0, "startup_s": t_ready - t_import, "first_ask_s": t_first - t_ready,
+                  "second_ask_s": t_second - t_first, "status": [r1.status_code, r2.status_code],
+                  "heavy_at_import": heavy, "startup": client.get("/health").json().get("startup")}))
+"""
+
+
+def cold_start(storage: Path, backend: str, warmup: bool, query: str) -> Dict:
+    """One fresh process: EMBED_BACKEND = SUMMARY_BACKEND = backend."""
+    env = dict(os.environ, STORAGE_DIR=str(storage), EMBED_BACKEND=backend, SUMMARY_BACKEND=backend,
+               MODEL_WARMUP=str(warmup).lower(), STORE_SNAPSHOT="false", SUMMARY_CACHE_ENABLED="false")
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", CHILD % {"heavy": HEAVY, "query": query}], env=env,
+                          capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} run failed:\n{proc.stderr[-2000:]}")
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["process_s"] = wall  # includes interpreter start-up and shutdown, which the child's clock does not
+    out["to_first_ask_s"] = out["import_s"] + out["startup_s"] + out["first_ask_s"]
+    return out
+
+
+def run(backends: List[str], papers: int = 200, repeat: int = 3, storage: Optional[str] = None) -> Dict:
+    tmp = None
+    if storage is None:
+        tmp = tempfile.TemporaryDirectory()
+        storage = tmp.name
+        write_corpus(Path(storage) / "parsed", papers)
+    query = SyntheticCorpus().queries(papers, 1)[0][0]
+    results = {}
+    try:
+        for backend in backends:
+            for warmup in (False, True):
+                runs = [cold_start(Path(storage), backend, warmup, query) for _ in range(repeat)]
+                keys = ("import_s", "startup_s", "first_ask_s", "second_ask_s", "to_first_ask_s", "process_s")
+                results[f"{backend}{'+warmup' if warmup else ''}"] = dict(
+                    {k: round(float(np.median([r[k] for r in runs])), 3) for k in keys},
+                    heavy_at_import=runs[0]["heavy_at_import"], status=runs[0]["status"])
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    return {"papers": papers, "repeat": repeat, "results": results}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    ap.add_argument("--papers", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--storage", help="use this STORAGE_DIR instead of a synthetic corpus")
+    ap.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = ap.parse_args()
+    out = run(args.backends, args.papers, args.repeat, args.storage)
+    if args.json:
+        print(json.dumps(out, indent=2))
+        return
+    print(f"{'config':<16}{'import':>9}{'startup':>9}{'1st ask':>9}{'2nd ask':>9}{'to 1st':>9}  heavy at import")
+    for name, r in out["results"].items():
+        print(f"{name:<16}{r['import_s']:>9.3f}{r['startup_s']:>9.3f}{r['first_ask_s']:>9.3f}"
+              f"{r['second_ask_s']:>9.3f}{r['to_first_ask_s']:>9.3f}  {','.join(r['heavy_at_import']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Load test for query-embedding micro-batching: C concurrent clients each
+encode one query at a time, with every call going straight to the model
+vs through embed.MicroBatcher.
+
+    python -m benchmarks.bench_embed_batching [--clients 1 4 16 64] [--requests 400] [--model]
+
+Without --model a simulated encoder is used: one forward pass at a time
+(a CPU-bound model already uses every core), costing a fixed overhead
+plus a per-text cost; --overhead-ms / --per-text-ms set them. With
+--model the real MiniLM from settings is loaded. Prints throughput,
+latency percentiles and the mean batch size.
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+
+from apps.api.rag.embed import MicroBatcher
+
+
+class SimulatedEncoder:
+    """Stand-in for a CPU model: serial forward passes, overhead + per-text cost (GIL released)."""
+    def __init__(self, overhead_ms: float = 8.0, per_text_ms: float = 0.4, dim: int = 384):
+        self.overhead = overhead_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            time.sleep(self.overhead + self.per_text * len(texts))
+        return np.ones((len(texts), self.dim), dtype=np.float32)
+
+
+def _load(encode: Callable[[List[str]], np.ndarray], clients: int, requests: int) -> dict:
+    queries = [f"what is the effect of treatment {i} on survival?" for i in range(requests)]
+    lat = np.zeros(requests)
+
+    def one(i):
+        t0 = time.perf_counter()
+        out = encode([queries[i]])
+        lat[i] = time.perf_counter() - t0
+        assert out.shape[0] == 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    return {"qps": round(requests / wall, 1), "p50_ms": round(float(np.percentile(lat, 50)) * 1e3, 2),
+            "p95_ms": round(float(np.percentile(lat, 95)) * 1e3, 2)}
+
+
+def run(clients: List[int], requests: int, encode_fn: Callable, max_batch: int = 32, max_wait_ms: float = 2.0) -> List[dict]:
+    rows = []
+    for c in clients:
+        direct = _load(encode_fn, c, requests)
+        batcher = MicroBatcher(encode_fn, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        batched = _load(batcher.encode, c, requests)
+        rows.append({"clients": c, "requests": requests,
+                     "direct_qps": direct["qps"], "direct_p50_ms": direct["p50_ms"], "direct_p95_ms": direct["p95_ms"],
+                     "batched_qps": batched["qps"], "batched_p50_ms": batched["p50_ms"],
+                     "batched_p95_ms": batched["p95_ms"], "mean_batch": batcher.stats()["mean_batch_texts"],
+                     "throughput_gain": round(batched["qps"] / direct["qps"], 2)})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--max-batch", type=int, default=32)
+    ap.add_argument("--max-wait-ms", type=float, default=2.0)
+    ap.add_argument("--model", action="store_true", help="use the real embedding model")
+    ap.add_argument("--overhead-ms", type=float, default=8.0)
+    ap.add_argument("--per-text-ms", type=float, default=0.4)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+    if args.model:
+        from apps.api.rag.embed import EmbeddingModel
+        encode_fn = EmbeddingModel()._encode
+        encode_fn(["warm-up"])
+    else:
+        encode_fn = SimulatedEncoder(args.overhead_ms, args.per_text_ms)
+    rows = run(args.clients, args.requests, encode_fn, args.max_batch, args.max_wait_ms)
+    for r in rows:
+        print(r)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+PDF parsing benchmark: parse_pdf.parse_pdf_to_sections (page-streaming;
+"streaming" with section-name headings, the default, and "layout" with
+PARSE_LAYOUT_HEADINGS font-based headings) vs the previous whole-document
+get_text() parser, on synthetic papers generated with PyMuPDF.
+
+    python -m benchmarks.bench_parse_pdf [--pages 4 40 400] [--total-pages 800]
+
+For each document length, about --total-pages pages are generated. Those
+pages are split into papers with bold / larger headings, some of which are
+not standard section names and some ALL-CAPS. Each parser runs in a fresh process and reports
+pages per second, peak Python heap for one document (tracemalloc), and
+the process's peak RSS. "headings" is the share of generated sections that
+were found.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import re
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from apps.api.nlp.parse_pdf import parse_pdf_to_sections
+
+HEADINGS = ["Abstract", "Introduction", "PATIENTS AND METHODS", "Patient Characteristics", "Methods",
+            "Statistical Analysis", "Results", "Adverse Events", "Discussion", "Conclusion", "REFERENCES"]
+WORDS = ("patients trial randomized placebo dose survival tumour response cohort median months "
+         "hazard ratio interval outcome treatment therapy baseline adverse events analysis").split()
+
+
+def synthetic_pdf(path: Path, pages: int, seed: int = 0) -> int:
+    """Writes a paper of `pages` pages; returns how many headed sections it has."""
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    n_sections = 0
+    for p in range(pages):
+        page = doc.new_page()
+        y = 60
+        page.insert_text((72, 40), "Indian Journal of Synthetic Medicine, doi: 10.0000/x", fontsize=8)
+        for _ in range(2):
+            heading = HEADINGS[n_sections % len(HEADINGS)]
+            page.insert_text((72, y), heading, fontsize=13, fontname="hebo")
+            n_sections += 1
+            y += 20
+            for _ in range(14):
+                words = rng.choice(WORDS, size=int(rng.integers(9, 13)))
+                page.insert_text((72, y), " ".join(words).capitalize() + ".", fontsize=10, fontname="helv")
+                y += 13
+            y += 12
+    doc.save(path)
+    doc.close()
+    return n_sections
+
+
+def _legacy_parse(pdf_path: Path) -> dict:
+    """The parser before page streaming: every line of the document in one list, heuristics on strings."""
+    hints = ["abstract", "introduction", "background", "methods", "materials",
+             "results", "discussion", "conclusion", "limitations", "summary"]
+    boiler = re.compile(r"\bindian journal of\b|\bdoi:\b", re.IGNORECASE)
+
+    def clean(line):
+        line = line.strip()
+        if not line or boiler.search(line):
+            return ""
+        return re.sub(r"\s+", " ", line)
+
+    def heading(line):
+        low = line.strip().lower()
+        return low in hints or any(low.startswith(h) for h in hints) or (len(line) <= 60 and line.isupper())
+
+    doc = fitz.open(pdf_path)
+    lines = []
+    for page in doc:
+        lines.extend(page.get_text().splitlines())
+    sections, name, buf = [], "unknown", []
+    for raw in lines:
+        line = clean(raw)
+        if not line:
+            continue
+        if heading(line):
+            if buf:
+                sections.append({"name": name, "text": " ".join(buf)})
+                buf = []
+            name = line.lower()
+        else:
+            buf.append(line)
+    if buf:
+        sections.append({"name": name, "text": " ".join(buf)})
+    if not sections:
+        sections = [{"name": "full_text", "text": " ".join(clean(l) for l in lines if clean(l))}]
+    return {"paper_id": pdf_path.stem, "pages": doc.page_count, "sections": sections}
+
+
+PARSERS = {"legacy": _legacy_parse,
+           "streaming": lambda p: parse_pdf_to_sections(p, layout=False),
+           "layout": lambda p: parse_pdf_to_sections(p, layout=True)}
+
+
+def _measure(parser: str, files: List[str], out) -> None:
+    """Child process: timed pass, then a tracemalloc pass on the longest file."""
+    fn = PARSERS[parser]
+    t0 = time.perf_counter()
+    pages = sections = 0
+    for f in files:
+        doc = fn(Path(f))
+        pages += doc["pages"]
+        sections += len(doc["sections"])
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(Path(files[0]))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    out.put({"pages_per_second": round(pages / seconds, 1), "sections": sections,
+             "peak_py_mb": round(peak / 2**20, 2),
+             "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)})
+
+
+def run(page_counts: List[int], total_pages: int = 800) -> List[dict]:
+    ctx = mp.get_context("spawn")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in page_counts:
+            files, expected = [], 0
+            for i in range(max(1, total_pages // pages)):
+                path = Path(tmp) / f"p{pages}_{i}.pdf"
+                expected += synthetic_pdf(path, pages, seed=i)
+                files.append(str(path))
+            row = {"pages_per_doc": pages, "docs": len(files)}
+            for name in PARSERS:
+                out = ctx.Queue()
+                proc = ctx.Process(target=_measure, args=(name, files, out))
+                proc.start()
+                res = out.get()
+                proc.join()
+                found = res.pop("sections")
+                row.update({f"{name}_{k}": v for k, v in res.items()})
+                row[f"{name}_headings"] = round(min(found, expected) / expected, 3)
+            for name in ("streaming", "layout"):
+                row[f"{name}_speedup"] = round(row[f"{name}_pages_per_second"] / row["legacy_pages_per_second"], 2)
+            rows.append(row)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--pages", type=int, nargs="+", default=[4, 40, 400], help="pages per synthetic paper")
+    ap.add_argument("--total-pages", type=int, default=800, help="pages generated per document length")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+    rows = run(args.pages, args.total_pages)
+    for r in rows:
+        print(r)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
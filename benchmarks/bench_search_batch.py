@@ -0,0 +1,81 @@
+"""
+Batch search throughput: SimpleStore.search called once per query vs
+SimpleStore.search_batch over the same queries, at several batch sizes.
+
+    python -m benchmarks.bench_search_batch [--papers 2000] [--queries 512] [--batch 1 8 32 128] [--model]
+
+The corpus and queries are synthetic (benchmarks.synthetic). Without
+--model, query encoding uses the hashing stand-in with a simulated cost
+of --call-ms per forward pass plus --text-ms per query. That is roughly
+MiniLM on a few CPU cores, and it is the part batching saves most on.
+With --model the real embedder from settings is used. Prints queries/s
+per mode and the share of queries whose results equal search()'s.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from apps.api.rag.retrieve import SimpleStore
+
+from .standins import HashingEmbedder, install
+from .synthetic import SyntheticCorpus, write_corpus
+
+
+def _same(a: List[Dict], b: List[Dict]) -> bool:
+    return [(r["text"], r["score"]) for r in a] == [(r["text"], r["score"]) for r in b]
+
+
+def run(papers: int = 2000, n_queries: int = 512, batches=(1, 8, 32, 128), top_k: int = 6,
+        call_ms: float = 8.0, text_ms: float = 0.4, use_model: bool = False) -> Dict:
+    emb = None if use_model else HashingEmbedder(per_text_ms=text_ms, per_call_ms=call_ms)
+    with install(emb), tempfile.TemporaryDirectory() as tmp:
+        parsed = Path(tmp) / "parsed"
+        write_corpus(parsed, papers)
+        store = SimpleStore(parsed)
+        queries = [q for q, _ in SyntheticCorpus().queries(papers, n_queries)]
+        store.search(queries[0])  # first call pays for lazy views
+
+        t0 = time.perf_counter()
+        single = [store.search(q, top_k=top_k) for q in queries]
+        loop_s = time.perf_counter() - t0
+        out = {"papers": papers, "sentences": len(store.table), "queries": n_queries, "top_k": top_k,
+               "embedder": "model" if use_model else f"stand-in ({call_ms} ms/call + {text_ms} ms/query)",
+               "search": {"qps": round(n_queries / loop_s, 1)}, "search_batch": {}}
+        for size in batches:
+            t0 = time.perf_counter()
+            got = []
+            for i in range(0, n_queries, size):
+                got.extend(store.search_batch(queries[i:i + size], top_k=top_k))
+            secs = time.perf_counter() - t0
+            out["search_batch"][size] = {"qps": round(n_queries / secs, 1), "speedup": round(loop_s / secs, 2),
+                                         "identical": round(sum(map(_same, single, got)) / n_queries, 3)}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--papers", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=512)
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32, 128])
+    ap.add_argument("--top-k", type=int, default=6)
+    ap.add_argument("--call-ms", type=float, default=8.0, help="simulated cost per forward pass")
+    ap.add_argument("--text-ms", type=float, default=0.4, help="simulated cost per query")
+    ap.add_argument("--model", action="store_true", help="use the real embedder")
+    ap.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = ap.parse_args()
+    out = run(args.papers, args.queries, args.batch, args.top_k, args.call_ms, args.text_ms, args.model)
+    if args.json:
+        print(json.dumps(out, indent=2))
+        return
+    print(f"{out['papers']} papers, {out['sentences']} sentences, {out['queries']} queries, embedder: {out['embedder']}")
+    print(f"{'mode':<18}{'qps':>9}{'speedup':>9}{'identical':>11}")
+    print(f"{'search (loop)':<18}{out['search']['qps']:>9.1f}{1.0:>9.2f}{'':>11}")
+    for size, r in out["search_batch"].items():
+        print(f"{'search_batch/' + str(size):<18}{r['qps']:>9.1f}{r['speedup']:>9.2f}{r['identical']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Sharded store vs one SimpleStore over the same synthetic corpus, for
+several shard counts.
+
+    python -m benchmarks.bench_shards [--papers 2000] [--queries 200] [--shards 2 4 8] [--workers 0]
+
+Per configuration:
+    build_s        fresh build (vectors already in the index)
+    identical      share of queries whose results (texts and scores) equal the unsharded store's
+    qps            search() in-process (SHARD_WORKERS=1) and with worker processes
+    filtered_ms    mean latency of a query restricted to --filter-papers papers
+    refresh_s      refresh() after one paper is added to the corpus (only its shard is recommitted)
+    largest_shard  sentences in the biggest shard (the memory / latency unit of one worker)
+
+The embedder is the hashing stand-in (benchmarks.standins); worker
+processes need snapshots, so every store is saved to a temporary
+directory first. Speedups from processes need as many free cores as
+workers.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from apps.api.core.config import settings
+from apps.api.nlp.corpus import get_corpus
+from apps.api.rag.retrieve import SimpleStore
+from apps.api.rag.shards import ShardedStore
+
+from .standins import HashingEmbedder, install
+from .synthetic import SyntheticCorpus, write_corpus
+
+
+def _key(results: List[Dict]):
+    return [(r["text"], r["score"]) for r in results]
+
+
+def _qps(store, queries: List[str]) -> float:
+    t0 = time.perf_counter()
+    for q in queries:
+        store.search(q)
+    return round(len(queries) / (time.perf_counter() - t0), 1)
+
+
+def _filtered_ms(store, queries: List[str], paper_ids: List[str]) -> float:
+    t0 = time.perf_counter()
+    for q in queries:
+        store.search(q, paper_ids=paper_ids)
+    return round((time.perf_counter() - t0) / len(queries) * 1000, 2)
+
+
+def _refresh_s(store, parsed: Path, new_id: str) -> float:
+    corpus = get_corpus(parsed)
+    doc = json.loads(corpus.get_raw(sorted(corpus.fingerprint())[0]).decode("utf-8"))
+    corpus.put(dict(doc, paper_id=new_id))
+    try:
+        t0 = time.perf_counter()
+        store.refresh()
+        return round(time.perf_counter() - t0, 4)
+    finally:
+        corpus.remove(new_id)
+        store.refresh()
+
+
+def run(papers: int = 2000, n_queries: int = 200, shard_counts=(2, 4, 8), workers: int = 0,
+        filter_papers: int = 3) -> Dict:
+    workers = workers or os.cpu_count() or 1
+    saved = settings.SHARD_WORKERS
+    with install(HashingEmbedder()), tempfile.TemporaryDirectory() as tmp:
+        parsed = Path(tmp) / "parsed"
+        write_corpus(parsed, papers)
+        queries = [q for q, _ in SyntheticCorpus().queries(papers, n_queries)]
+        pids = sorted(get_corpus(parsed).fingerprint())[::max(1, papers // filter_papers)][:filter_papers]
+
+        SimpleStore(parsed)   # embeds every paper into the vector index once
+        t0 = time.perf_counter()
+        base = SimpleStore(parsed)
+        build_s = time.perf_counter() - t0
+        expected = [_key(base.search(q)) for q in queries]
+        out = {"papers": papers, "sentences": len(base), "queries": n_queries, "workers": workers,
+               "filter_papers": filter_papers,
+               "unsharded": {"build_s": round(build_s, 3), "qps": _qps(base, queries),
+                             "filtered_ms": _filtered_ms(base, queries, pids),
+                             "refresh_s": _refresh_s(base, parsed, "zz-bench-new")},
+               "sharded": {}}
+        for n in shard_counts:
+            settings.SHARD_WORKERS = 1
+            t0 = time.perf_counter()
+            store = ShardedStore(parsed, n)
+            build_s = time.perf_counter() - t0
+            same = sum(_key(store.search(q)) == e for q, e in zip(queries, expected)) / n_queries
+            r = {"build_s": round(build_s, 3), "identical": round(same, 3),
+                 "largest_shard": max(len(s) for s in store.shards.values()),
+                 "qps_in_process": _qps(store, queries),
+                 "filtered_ms": _filtered_ms(store, queries, pids),
+                 "refresh_s": _refresh_s(store, parsed, "zz-bench-new")}
+            store.save(Path(tmp) / f"shards-{n}")
+            store._workers = workers
+            store.start_workers()   # workers open their shards before timing
+            r["qps_processes"] = _qps(store, queries)
+            store.close()
+            out["sharded"][n] = r
+    settings.SHARD_WORKERS = saved
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--papers", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--shards", type=int, nargs="+", default=[2, 4, 8])
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (0 = one per CPU core)")
+    ap.add_argument("--filter-papers", type=int, default=3, help="papers in the filtered queries")
+    ap.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = ap.parse_args()
+    out = run(args.papers, args.queries, args.shards, args.workers, args.filter_papers)
+    if args.json:
+        print(json.dumps(out, indent=2))
+        return
+    u = out["unsharded"]
+    print(f"{out['papers']} papers, {out['sentences']} sentences, {out['queries']} queries, "
+          f"{out['workers']} worker process(es), filter = {out['filter_papers']} papers")
+    print(f"{'store':<12}{'build s':>9}{'identical':>11}{'qps':>9}{'qps procs':>11}{'filtered ms':>13}"
+          f"{'refresh s':>11}{'largest':>9}")
+    print(f"{'unsharded':<12}{u['build_s']:>9.3f}{'':>11}{u['qps']:>9.1f}{'':>11}{u['filtered_ms']:>13.2f}"
+          f"{u['refresh_s']:>11.4f}{out['sentences']:>9}")
+    for n, r in out["sharded"].items():
+        print(f"{str(n) + ' shards':<12}{r['build_s']:>9.3f}{r['identical']:>11.3f}{r['qps_in_process']:>9.1f}"
+              f"{r['qps_processes']:>11.1f}{r['filtered_ms']:>13.2f}{r['refresh_s']:>11.4f}{r['largest_shard']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Small local stand-ins for the heavy models, so the benchmark suite runs
+offline and quickly: a hashing bag-of-words embedder in place of MiniLM
+and an extractive "summarizer" in place of the DistilBART pipeline. Both
+expose the interface the app calls, and both can simulate a CPU cost, so
+batching and concurrency behave roughly as they would with the real models.
+
+install() swaps them into the process-wide singletons (embed.get_embedder,
+generate.get_summarizer) and restores the previous ones afterwards.
+"""
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+TOKEN_RATIO = 1.3  # subword tokens per whitespace word, roughly, for English text
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of lower-cased words into `dim` buckets, L2
+    normalized: texts sharing words get similar vectors. encode() / _encode()
+    match EmbeddingModel. per_text_ms / per_call_ms add a simulated model
+    cost per text and per forward pass.
+    """
+    def __init__(self, dim: int = 384, per_text_ms: float = 0.0, per_call_ms: float = 0.0):
+        self.dim = dim
+        self.per_text = per_text_ms / 1000.0
+        self.per_call = per_call_ms / 1000.0
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+        self.texts = 0
+
+    def _bucket(self, word: str) -> Tuple[int, float]:
+        b = self._buckets.get(word)
+        if b is None:
+            h = zlib.crc32(word.encode("utf-8"))
+            b = self._buckets[word] = (h % self.dim, 1.0 if h & 1 << 31 else -1.0)
+        return b
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        rows, cols, vals = [], [], []
+        for r, t in enumerate(texts):
+            for w in t.lower().split():
+                c, v = self._bucket(w.strip(".,;:()"))
+                rows.append(r)
+                cols.append(c)
+                vals.append(v)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), vals)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        if self.per_text or self.per_call:
+            time.sleep(self.per_call + self.per_text * len(texts))
+        self.texts += len(texts)
+        return out
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._encode(texts)
+
+
+class _WordTokenizer:
+    """Counts ~TOKEN_RATIO tokens per word, truncated like the real tokenizer."""
+    def __init__(self, max_tokens: int = 1024):
+        self.max_tokens = max_tokens
+
+    def __call__(self, texts: Union[str, List[str]], truncation: bool = True, **_):
+        texts = [texts] if isinstance(texts, str) else texts
+        n = [int(len(t.split()) * TOKEN_RATIO) for t in texts]
+        return {"input_ids": [[0] * (min(k, self.max_tokens) if truncation else k) for k in n]}
+
+
+class ExtractiveSummarizer:
+    """
+    Pipeline-shaped stand-in: returns the leading words of each input as its
+    "summary" (about max_length tokens). The simulated cost follows an
+    encoder-decoder: a fixed overhead per call, encoder time for every
+    padded input token, and one decoder step per output token that is
+    shared by the whole batch. That is why length-sorted batching pays off.
+    One call runs at a time, like a CPU model using every core.
+    """
+    def __init__(self, overhead_ms: float = 5.0, encode_ms_per_token: float = 0.02, decode_ms_per_step: float = 1.0):
+        self.tokenizer = _WordTokenizer()
+        self.overhead = overhead_ms / 1000.0
+        self.enc = encode_ms_per_token / 1000.0
+        self.dec = decode_ms_per_step / 1000.0
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, inputs: Union[str, List[str]], batch_size: int = 1, max_length: int = 120,
+                 min_length: int = 30, **_) -> List[Dict]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        lens = [len(ids) for ids in self.tokenizer(texts)["input_ids"]]
+        outs = [" ".join(t.split()[:max(min_length, int(max_length / TOKEN_RATIO))]) for t in texts]
+        steps = max(int(len(o.split()) * TOKEN_RATIO) for o in outs) if outs else 0
+        with self._lock:
+            self.calls += 1
+            time.sleep(self.overhead + self.enc * max(lens, default=0) * len(texts) + self.dec * steps)
+        return [{"summary_text": o} for o in outs]
+
+
+@contextmanager
+def install(embedder=None, summarizer=None):
+    """Temporarily makes these the process-wide embedder / summarizer (None leaves one as is)."""
+    from apps.api.rag import embed, generate
+    saved = embed._EMBEDDER, generate._SUMMARIZER
+    if embedder is not None:
+        embed._EMBEDDER = embedder
+    if summarizer is not None:
+        generate._SUMMARIZER = summarizer
+    try:
+        yield
+    finally:
+        embed._EMBEDDER, generate._SUMMARIZER = saved
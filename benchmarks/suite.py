@@ -0,0 +1,283 @@
+"""
+End-to-end benchmark suite on synthetic parsed-paper corpora: store build
+(cold with embedding, warm from the vector index, snapshot save/load),
+search latency p50/p95/p99 and recall, MMR, embedding throughput and
+summarization throughput.
+
+    python -m benchmarks.suite [--scales 100 1000 10000] [--queries 200] [--out results.json]
+    python -m benchmarks.suite --scales 1000 --sweep            # TOPN_SHORTLIST / weights / MMR_LAMBDA grid
+    python -m benchmarks.suite --compare before.json after.json  # regressions between two runs
+
+Models are replaced by the local stand-ins in benchmarks/standins.py
+unless --models is given, so the suite runs offline. Their simulated
+costs (--embed-ms-per-text, --summary-*) default to zero and light values
+respectively. recall@k is the share of queries whose source paper is among
+the top-k results (queries come from benchmarks/synthetic.py). Results
+carry the git commit and the retrieval settings so JSON files from
+different commits can be compared.
+
+Scales are limited by memory, not open files: a freshly built store keeps
+its vectors in memory (about 90 KB per synthetic paper with float32) until
+its snapshot is saved and memory-mapped, so --scales goes up to MAX_SCALE:
+20000 papers peak at about 4.5 GB RSS, 100k would need over 20 GB.
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from apps.api.core import metrics
+from apps.api.core.config import settings
+from apps.api.rag import retrieve
+from apps.api.rag.retrieve import SimpleStore, mmr, store_dir_for
+
+from benchmarks.standins import ExtractiveSummarizer, HashingEmbedder, install
+from benchmarks.synthetic import SyntheticCorpus, write_corpus
+
+MAX_SCALE = 20000   # papers; see the module docstring
+
+# metric -> True when higher is better (used by --compare)
+HIGHER_IS_BETTER = {"sentences_per_second": True, "tokens_per_second": True, "papers_per_second": True,
+                    "recall_at_k": True, "qps": True}
+
+
+def _pct(values: List[float]) -> Dict:
+    v = np.asarray(values) * 1e3
+    return {"p50_ms": round(float(np.percentile(v, 50)), 3), "p95_ms": round(float(np.percentile(v, 95)), 3),
+            "p99_ms": round(float(np.percentile(v, 99)), 3)}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _retrieval_params() -> Dict:
+    return {"TOPN_SHORTLIST": retrieve.TOPN_SHORTLIST, "BM25_WEIGHT": retrieve.BM25_WEIGHT,
+            "COSINE_WEIGHT": retrieve.COSINE_WEIGHT, "MMR_LAMBDA": retrieve.MMR_LAMBDA,
+            "MAX_SENT_PER_SECTION": retrieve.MAX_SENT_PER_SECTION, "ANN_ENABLED": settings.ANN_ENABLED,
+            "EMBED_INDEX_DTYPE": settings.EMBED_INDEX_DTYPE}
+
+
+# ---- stages ----
+def bench_search(store: SimpleStore, queries, top_k: int = 6) -> Dict:
+    lat, hits = [], 0
+    for q, pid in queries:
+        t0 = time.perf_counter()
+        res = store.search(q, top_k=top_k)
+        lat.append(time.perf_counter() - t0)
+        hits += any(r["meta"]["paper_id"] == pid for r in res)
+    return {"queries": len(queries), "top_k": top_k, **_pct(lat),
+            "qps": round(len(lat) / sum(lat), 1), "recall_at_k": round(hits / len(queries), 3)}
+
+
+def bench_mmr(store: SimpleStore, repeats: int = 200, k: int = 6, seed: int = 0) -> Dict:
+    """MMR alone, on shortlist-sized candidate sets drawn from the store's vectors."""
+    rng = np.random.default_rng(seed)
+    n = min(retrieve.TOPN_SHORTLIST, len(store.table))
+    lat = []
+    for _ in range(repeats):
+        idx = np.sort(rng.choice(len(store.table), n, replace=False))
+        cands = retrieve._l2n(store.vectors.take(idx))
+        q = cands[int(rng.integers(0, n))]
+        t0 = time.perf_counter()
+        mmr(cands, q, k=k, lambda_=retrieve.MMR_LAMBDA)
+        lat.append(time.perf_counter() - t0)
+    return {"candidates": n, "k": k, **_pct(lat)}
+
+
+def bench_embed(emb, texts: List[str], batch: int = 64) -> Dict:
+    t0 = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        emb.encode(texts[i:i + batch])
+    s = time.perf_counter() - t0
+    return {"sentences": len(texts), "batch": batch, "seconds": round(s, 3),
+            "sentences_per_second": round(len(texts) / s, 1)}
+
+
+def bench_summarize(docs: List[Dict]) -> Dict:
+    """summarize_text over whole papers; token counts come from the "summarize" metrics events."""
+    from apps.api.rag.generate import summarize_text
+    events = []
+    hook = lambda event, fields: events.append(fields) if event == "summarize" else None
+    metrics.add_hook(hook)
+    try:
+        t0 = time.perf_counter()
+        for d in docs:
+            summarize_text(" ".join(s["text"] for s in d["sections"]))
+        s = time.perf_counter() - t0
+    finally:
+        metrics.remove_hook(hook)
+    tokens = sum(e["input_tokens"] + e["output_tokens"] for e in events)
+    return {"papers": len(docs), "chunks": sum(e["chunks"] for e in events),
+            "batch_size": settings.SUMMARY_BATCH_SIZE, "seconds": round(s, 3),
+            "papers_per_second": round(len(docs) / s, 2), "tokens_per_second": round(tokens / s, 1)}
+
+
+def bench_scale(root: Path, n_papers: int, n_queries: int, seed: int = 0) -> Dict:
+    parsed = root / f"n{n_papers}" / "parsed"
+    gen = SyntheticCorpus(seed)
+    row = {"papers": n_papers, "corpus": write_corpus(parsed, n_papers, seed)}
+
+    t0 = time.perf_counter()
+    store = SimpleStore(parsed)   # cold: every paper is embedded into the vector index
+    row["build_cold_seconds"] = round(time.perf_counter() - t0, 3)
+    row["sentences"] = len(store.table)
+    del store                     # its vectors are in memory until a snapshot is saved
+    t0 = time.perf_counter()
+    store = SimpleStore(parsed)   # warm: vectors come from the index
+    row["build_warm_seconds"] = round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
+    store.save(store_dir_for(parsed))
+    row["snapshot_save_seconds"] = round(time.perf_counter() - t0, 3)
+    t0 = time.perf_counter()
+    loaded = SimpleStore.load(parsed, store_dir_for(parsed))
+    row["snapshot_load_seconds"] = round(time.perf_counter() - t0, 3)
+    row["store_bytes"] = store.approx_nbytes() + store.vectors.nbytes
+    del loaded
+
+    queries = gen.queries(n_papers, n_queries)
+    store.search(queries[0][0])  # first call pays for lazy views
+    row["search"] = bench_search(store, queries)
+    row["mmr"] = bench_mmr(store)
+    return row
+
+
+def run(scales: List[int], n_queries: int = 200, n_summaries: int = 10, embed_texts: int = 4096,
+        use_models: bool = False, embed_ms_per_text: float = 0.0, summary_costs=(5.0, 0.02, 1.0)) -> Dict:
+    emb = summ = None
+    if not use_models:
+        emb, summ = HashingEmbedder(per_text_ms=embed_ms_per_text), ExtractiveSummarizer(*summary_costs)
+    out = {"meta": {"commit": _git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                    "models": "real" if use_models else "stand-ins", "params": _retrieval_params(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+           "scales": []}
+    with install(emb, summ), tempfile.TemporaryDirectory() as tmp:
+        from apps.api.rag.embed import get_embedder
+        gen = SyntheticCorpus()
+        texts = [s for d in gen.papers(max(1, embed_texts // 60)) for s, _ in retrieve.paper_sentences(d)]
+        out["embed"] = bench_embed(get_embedder(), texts[:embed_texts])
+        out["summarize"] = bench_summarize(list(gen.papers(n_summaries)))
+        for n in scales:
+            row = bench_scale(Path(tmp), n, n_queries)
+            print(json.dumps(row), file=sys.stderr)
+            out["scales"].append(row)
+    return out
+
+
+def sweep(n_papers: int, n_queries: int = 200, shortlists=(100, 250, 500),
+          weights=((0.7, 0.3), (0.5, 0.5), (0.3, 0.7)), lambdas=(0.4, 0.6, 0.8)) -> List[Dict]:
+    """Recall and latency over a grid of the retrieval constants (restored afterwards)."""
+    saved = _retrieval_params()
+    rows = []
+    with install(HashingEmbedder()), tempfile.TemporaryDirectory() as tmp:
+        parsed = Path(tmp) / "parsed"
+        write_corpus(parsed, n_papers)
+        store = SimpleStore(parsed)
+        queries = SyntheticCorpus().queries(n_papers, n_queries)
+        try:
+            for topn, (wb, wc), lam in itertools.product(shortlists, weights, lambdas):
+                retrieve.TOPN_SHORTLIST, retrieve.BM25_WEIGHT, retrieve.COSINE_WEIGHT, retrieve.MMR_LAMBDA = topn, wb, wc, lam
+                r = bench_search(store, queries)
+                rows.append({"TOPN_SHORTLIST": topn, "BM25_WEIGHT": wb, "COSINE_WEIGHT": wc, "MMR_LAMBDA": lam,
+                             "recall_at_k": r["recall_at_k"], "p50_ms": r["p50_ms"]})
+        finally:
+            for k in ("TOPN_SHORTLIST", "BM25_WEIGHT", "COSINE_WEIGHT", "MMR_LAMBDA"):
+                setattr(retrieve, k, saved[k])
+    return rows
+
+
+# ---- comparing runs ----
+def _flatten(d: Dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[f"{prefix}{k}"] = v
+    return out
+
+
+def compare(before: Dict, after: Dict, threshold: float = 0.10, min_delta_ms: float = 1.0) -> List[Dict]:
+    """
+    Per-metric ratio after/before; a change worse than threshold is flagged
+    as a regression, except timings that moved by less than min_delta_ms.
+    """
+    rows = []
+    a_scales = {s["papers"]: s for s in after.get("scales", [])}
+    pairs = [(f"{k}.", before.get(k), after.get(k)) for k in ("embed", "summarize")]
+    pairs += [(f"n{s['papers']}.", s, a_scales.get(s["papers"])) for s in before.get("scales", [])]
+    for prefix, b, a in pairs:
+        if not b or not a:
+            continue
+        fb, fa = _flatten(b), _flatten(a)
+        for k in sorted(fb.keys() & fa.keys()):
+            leaf = k.rsplit(".", 1)[-1]
+            if not (leaf.endswith("seconds") or leaf.endswith("_ms") or leaf in HIGHER_IS_BETTER) or not fb[k]:
+                continue
+            ratio = fa[k] / fb[k]
+            if HIGHER_IS_BETTER.get(leaf):
+                worse = ratio < 1 - threshold
+            else:
+                delta_ms = (fa[k] - fb[k]) * (1 if leaf.endswith("_ms") else 1000)
+                worse = ratio > 1 + threshold and delta_ms >= min_delta_ms
+            rows.append({"metric": prefix + k, "before": fb[k], "after": fa[k], "ratio": round(ratio, 3),
+                         "regression": worse})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--scales", type=int, nargs="+", default=[100, 1000, 10000], help=f"papers per corpus (up to {MAX_SCALE})")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--summaries", type=int, default=10, help="papers summarized for summarization throughput")
+    ap.add_argument("--models", action="store_true", help="use the real embedding / summarization models")
+    ap.add_argument("--embed-ms-per-text", type=float, default=0.0, help="simulated embedding cost (stand-in)")
+    ap.add_argument("--summary-overhead-ms", type=float, default=5.0)
+    ap.add_argument("--summary-encode-ms-per-token", type=float, default=0.02)
+    ap.add_argument("--summary-decode-ms-per-step", type=float, default=1.0)
+    ap.add_argument("--sweep", action="store_true", help="grid over retrieval constants at the first scale")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="smaller timing changes are noise")
+    ap.add_argument("--out", "--json", dest="out", help="also write results to this file")
+    args = ap.parse_args()
+    if args.scales and max(args.scales) > MAX_SCALE:
+        ap.error(f"--scales: at most {MAX_SCALE} papers (vectors of a fresh build are held in memory)")
+
+    if args.compare:
+        before, after = (json.loads(Path(p).read_text()) for p in args.compare)
+        rows = compare(before, after, args.threshold, args.min_delta_ms)
+        for r in rows:
+            print(("REGRESSION " if r["regression"] else "           ") +
+                  f"{r['metric']}: {r['before']} -> {r['after']} (x{r['ratio']})")
+        sys.exit(1 if any(r["regression"] for r in rows) else 0)
+
+    if args.sweep:
+        result = {"meta": {"commit": _git_commit(), "params": _retrieval_params()},
+                  "sweep": sweep(args.scales[0], args.queries)}
+        for r in result["sweep"]:
+            print(r)
+    else:
+        result = run(args.scales, args.queries, args.summaries, use_models=args.models,
+                     embed_ms_per_text=args.embed_ms_per_text,
+                     summary_costs=(args.summary_overhead_ms, args.summary_encode_ms_per_token,
+                                    args.summary_decode_ms_per_step))
+        print(json.dumps(result, indent=1))
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=1))
+
+
+if __name__ == "__main__":
+    main()
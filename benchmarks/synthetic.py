@@ -0,0 +1,102 @@
+"""
+Synthetic parsed-paper corpora for the benchmarks: papers shaped like
+parse_pdf output (abstract ... conclusion sections of sentences), written
+straight into a data/parsed/corpus.sqlite, plus queries with a known
+source paper so retrieval quality can be scored.
+
+    python -m benchmarks.synthetic --papers 1000 --out /tmp/bench_data
+
+Words follow a Zipf distribution over a shared vocabulary, and every paper
+also draws from its own topic's terms, so BM25 and the embedding stand-in
+both have something to find.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from apps.api.nlp.corpus import Corpus, corpus_path_for
+
+SECTIONS = ["Abstract", "Introduction", "Methods", "Results", "Discussion", "Conclusion"]
+COMMON = ("patients trial randomized placebo dose survival tumour response cohort median months hazard ratio "
+          "interval outcome treatment therapy baseline adverse events analysis risk mortality clinical study "
+          "group control primary secondary endpoint significant reduced increased associated").split()
+
+
+class SyntheticCorpus:
+    """Deterministic generator: the same (seed, papers) always gives the same corpus and queries."""
+    def __init__(self, seed: int = 0, vocab: int = 20000, topics: int = 200, topic_terms: int = 40,
+                 topic_share: float = 0.25, mean_sentence_words: int = 18, sentences_per_section: Tuple[int, int] = (6, 16)):
+        self.seed = seed
+        self.words = COMMON + [f"w{i}" for i in range(vocab - len(COMMON))]
+        self.topics = topics
+        self.topic_terms = [[f"t{t}x{i}" for i in range(topic_terms)] for t in range(topics)]
+        self.topic_share = topic_share
+        self.mean_words = mean_sentence_words
+        self.sent_range = sentences_per_section
+
+    def _rng(self, i: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, i])
+
+    def paper(self, i: int) -> Dict:
+        rng = self._rng(i)
+        topic = self.topic_terms[i % self.topics]
+        sections = []
+        for name in SECTIONS:
+            n_sent = int(rng.integers(*self.sent_range))
+            lens = np.clip(rng.poisson(self.mean_words, n_sent), 4, None)
+            ids = np.minimum(rng.zipf(1.25, int(lens.sum())), len(self.words)) - 1
+            from_topic = rng.random(int(lens.sum())) < self.topic_share
+            picks = rng.integers(0, len(topic), int(lens.sum()))
+            tokens = [topic[p] if t else self.words[w] for w, t, p in zip(ids, from_topic, picks)]
+            sents, pos = [], 0
+            for n in lens:
+                sents.append(" ".join(tokens[pos:pos + n]).capitalize() + ".")
+                pos += n
+            sections.append({"name": name.lower(), "text": " ".join(sents)})
+        return {"paper_id": f"paper{i:06d}", "title": f"Synthetic paper {i}", "pages": len(SECTIONS),
+                "sections": sections}
+
+    def papers(self, n: int) -> Iterator[Dict]:
+        for i in range(n):
+            yield self.paper(i)
+
+    def queries(self, n_papers: int, n: int, words: Tuple[int, int] = (3, 7)) -> List[Tuple[str, str]]:
+        """(query, source paper_id): a few words of one sentence of a random paper, rarest first."""
+        rng = np.random.default_rng([self.seed, 10**9])
+        out = []
+        for _ in range(n):
+            i = int(rng.integers(0, n_papers))
+            doc = self.paper(i)
+            sec = doc["sections"][int(rng.integers(0, len(SECTIONS)))]
+            sentences = [s for s in sec["text"].split(". ") if s]
+            toks = sorted(set(sentences[int(rng.integers(0, len(sentences)))].rstrip(".").lower().split()),
+                          key=lambda w: (w in COMMON, -len(w)))
+            out.append((" ".join(toks[:int(rng.integers(*words))]), doc["paper_id"]))
+        return out
+
+
+def write_corpus(parsed_dir: Path, n_papers: int, seed: int = 0, batch: int = 1000) -> Dict:
+    """Fills parsed_dir/corpus.sqlite with n_papers synthetic papers."""
+    gen = SyntheticCorpus(seed)
+    corpus = Corpus(corpus_path_for(parsed_dir))
+    t0 = time.perf_counter()
+    for start in range(0, n_papers, batch):
+        corpus.put_many(gen.paper(i) for i in range(start, min(n_papers, start + batch)))
+    return {"papers": len(corpus), "seconds": round(time.perf_counter() - t0, 3),
+            "bytes": corpus.path.stat().st_size}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--papers", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True, help="storage dir; papers go to OUT/parsed/corpus.sqlite")
+    args = ap.parse_args()
+    print(write_corpus(Path(args.out) / "parsed", args.papers, args.seed))
+
+
+if __name__ == "__main__":
+    main()
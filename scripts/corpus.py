@@ -0,0 +1,37 @@
+from pathlib import Path
+import argparse
+from apps.api.nlp.corpus import Corpus, corpus_path_for
+
+def main():
+    ap = argparse.ArgumentParser(description="Manage the parsed-paper corpus (data/parsed/corpus.sqlite).")
+    ap.add_argument("--parsed", default="data/parsed")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="import data/parsed/*.json (the previous per-paper format)")
+    mig.add_argument("--replace", action="store_true", help="overwrite papers already in the corpus")
+    mig.add_argument("--delete-json", action="store_true", help="remove each JSON file once imported")
+    exp = sub.add_parser("export", help="write papers back out as <paper_id>.json")
+    exp.add_argument("--out", required=True)
+    exp.add_argument("paper_ids", nargs="*", help="default: all papers")
+    sub.add_parser("list", help="print paper headers")
+    args = ap.parse_args()
+
+    parsed = Path(args.parsed)
+    corpus = Corpus(corpus_path_for(parsed))
+    if args.cmd == "migrate":
+        rep = corpus.import_json_dir(parsed, replace=args.replace)
+        print(f"{rep['imported']} imported, {rep['skipped']} already present, {len(rep['failed'])} failed")
+        for name, err in rep["failed"].items():
+            print(f"failed: {name}: {err}")
+        if args.delete_json:
+            for jf in sorted(parsed.glob("*.json")):
+                if jf.name not in rep["failed"]:
+                    jf.unlink()
+    elif args.cmd == "export":
+        n = corpus.export_json(Path(args.out), args.paper_ids or None)
+        print(f"{n} paper(s) exported to {args.out}")
+    else:
+        for h in corpus.list():
+            print(f"{h['paper_id']}\t{h['title']}\t{h['n_sections']} sections\t{h['pages']} pages\t{h['size']} bytes")
+
+if __name__ == "__main__":
+    main()
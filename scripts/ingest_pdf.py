@@ -1,8 +1,24 @@
-from pathlib import Path, PurePath
-import json
-from apps.api.nlp.parse_pdf import parse_pdf_to_sections
-SRC=Path("data/pdfs"); OUT=Path("data/parsed"); OUT.mkdir(parents=True, exist_ok=True)
-for pdf in SRC.glob("*.pdf"):
-    parsed = parse_pdf_to_sections(pdf)
-    (OUT / f"{pdf.stem}.json").write_text(json.dumps(parsed, ensure_ascii=False), encoding="utf-8")
-    print("parsed:", pdf.name)
+from pathlib import Path
+import argparse
+from apps.api.nlp.ingest import ingest_pdfs
+
+def main():
+    ap = argparse.ArgumentParser(description="Parse data/pdfs into data/parsed (only new or modified PDFs).")
+    ap.add_argument("--src", default="data/pdfs")
+    ap.add_argument("--out", default="data/parsed")
+    ap.add_argument("--force", action="store_true", help="re-parse every PDF")
+    ap.add_argument("--workers", type=int, default=None, help="parser processes (default INGEST_WORKERS, 0 = all cores)")
+    args = ap.parse_args()
+
+    def progress(name, status, info):
+        if status == "failed":
+            print(f"failed: {name}: {info['error']}")
+        elif status != "unchanged":
+            print(f"{status}:", name)
+
+    report = ingest_pdfs(Path(args.src), Path(args.out), force=args.force, workers=args.workers, progress=progress)
+    print(f"{report['parsed']} parsed, {report['unchanged']} unchanged, {report['removed']} removed, "
+          f"{len(report['failed'])} failed in {report['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from pathlib import Path
+import argparse
+import time
+from apps.api.core.cache import get_cache
+from apps.api.nlp.corpus import get_corpus
+from apps.api.rag.generate import summarize_parsed_paper
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize every parsed paper ahead of time into the summary cache.")
+    ap.add_argument("--parsed", default="data/parsed")
+    ap.add_argument("--modes", nargs="+", default=["expert", "patient"], choices=["expert", "patient"])
+    args = ap.parse_args()
+
+    cache = get_cache()
+    if cache is None:
+        raise SystemExit("SUMMARY_CACHE_ENABLED is off; nothing to pre-warm.")
+    t0 = time.perf_counter()
+    papers = [h["paper_id"] for h in get_corpus(Path(args.parsed)).list()]
+    generated = 0
+    for i, pid in enumerate(papers, 1):
+        for mode in args.modes:
+            start = time.perf_counter()
+            _, cached = summarize_parsed_paper(pid, mode, parsed_dir=Path(args.parsed))
+            generated += not cached
+            print(f"[{i}/{len(papers)}] {pid} ({mode}): {'cached' if cached else f'{time.perf_counter() - start:.1f}s'}")
+    s = cache.stats()
+    print(f"{generated} summaries generated, {len(papers) * len(args.modes) - generated} already cached "
+          f"in {time.perf_counter() - t0:.1f}s; cache holds {s['entries']} entries ({s['bytes'] / 2**20:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()